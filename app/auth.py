@@ -1,3 +1,4 @@
+import os
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -13,6 +14,12 @@ SECRET_KEY = "tu-secret-key-super-secreta-cambiar-en-produccion"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Usuarios con acceso a los endpoints /v1/admin/* (separados por coma; por defecto el
+# usuario admin que se crea al iniciar)
+ADMIN_USERNAMES = frozenset(
+    name.strip() for name in os.getenv("ADMIN_USERNAMES", "admin").split(",") if name.strip()
+)
+
 # Contexto para hashing de contraseñas
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -81,6 +88,12 @@ def verify_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_
         raise credentials_exception
     return username
 
+def verify_admin(username: str = Depends(verify_token)) -> str:
+    """Como verify_token, pero sólo deja pasar a los usuarios de ADMIN_USERNAMES"""
+    if username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return username
+
 def create_user(db: Session, username: str, email: str, password: str) -> User:
     """Crea un nuevo usuario"""
     hashed_password = get_password_hash(password)
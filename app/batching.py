@@ -0,0 +1,88 @@
+"""
+Agrupador de envíos en lotes (coalescer)
+========================================
+
+Qué es este archivo:
+- Algunos envíos salen mejor juntos (p. ej. los pushes con el mismo texto comparten el
+  token OAuth2 de FCM y salen en paralelo; un relay SMTP reutiliza la sesión), pero el
+  worker recibe un mensaje por destinatario.
+- `Coalescer` junta los envíos que llegan dentro de una ventana corta (unos ms) y que
+  comparten clave de grupo (mismo título y cuerpo, por ejemplo) y los despacha juntos
+  con una sola llamada a `flush`. Cada llamador recibe su propio resultado.
+- Un lote sale cuando pasa la ventana desde su primer elemento o cuando alcanza
+  `max_batch`, lo que ocurra primero.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+from app.worker_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# flush(clave, items) -> un resultado por item, en el mismo orden
+FlushFn = Callable[[Hashable, List[Any]], Awaitable[List[Any]]]
+
+
+class Coalescer:
+    def __init__(self, flush: FlushFn, max_batch: int = 500, window: float = 0.02, name: str = "batch"):
+        self._flush = flush
+        self.max_batch = max_batch
+        self.window = window
+        self.name = name
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, group_key: Hashable, item: Any) -> Any:
+        """Agrega `item` al lote de `group_key` y espera su resultado individual"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._pending.setdefault(group_key, [])
+        batch.append((item, future))
+        if len(batch) >= self.max_batch:
+            self._dispatch(group_key)
+        elif len(batch) == 1:
+            self._timers[group_key] = loop.call_later(self.window, self._dispatch, group_key)
+        return await future
+
+    def _dispatch(self, group_key: Hashable) -> None:
+        timer = self._timers.pop(group_key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(group_key, None)
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(group_key, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, group_key: Hashable, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        metrics.inc(f"{self.name}_batches_total")
+        metrics.inc(f"{self.name}_batched_items_total", len(batch))
+        try:
+            results = await self._flush(group_key, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"flush retornó {len(results)} resultados para {len(batch)} elementos")
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as exc:
+            # Un fallo del lote completo se reporta a cada llamador
+            logger.error(f"Error despachando lote {self.name} ({len(batch)} elementos): {exc}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self) -> None:
+        """Despacha lo pendiente y espera a que terminen los lotes en curso"""
+        for group_key in list(self._pending):
+            self._dispatch(group_key)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
@@ -0,0 +1,242 @@
+"""
+Claim-check: cuerpos grandes fuera del broker
+=============================================
+
+Qué es este archivo:
+- Los emails con mucho HTML (o adjuntos embebidos) ocupan memoria de RabbitMQ y se copian
+  en cada cola de reintento. Con el patrón claim-check el API guarda el texto del mensaje
+  (`message`, o cada `message.<canal>` en el formato multi-canal) en un almacén de blobs
+  y en ese campo deja sólo una referencia pequeña; el resto del payload (destino,
+  user_id, prioridad...) sigue en línea:
+      {"channel": "email", "destination": "a@example.com",
+       "message": {"$claim_check": "<sha256>", "size": 183421}}
+- El worker descarga el texto recién cuando procesa el mensaje. Los reintentos viajan
+  con la referencia, no con el texto.
+- El almacén es direccionado por contenido (la clave es el sha256 de los bytes): como
+  sólo se guarda el texto, el mismo HTML de una campaña enviado a miles de destinatarios
+  se guarda una sola vez.
+- Cada mensaje que usa un blob registra una referencia (su message_id). Cuando el mensaje
+  llega a un estado terminal (enviado, DLQ o cuarentena) el worker la libera; el blob se
+  borra al liberar la última. La DLQ y la cuarentena reciben el texto completo, así un
+  replay no depende del blob; si lo que falló fue justamente la descarga (almacén caído
+  en todos los intentos) la DLQ recibe las referencias y el blob no se libera.
+
+Backends:
+- `FileSystemBlobStore` (por defecto): un directorio compartido entre API y worker
+  (volumen). Escrituras atómicas (archivo temporal + rename).
+- Otro backend (S3, Redis...) se enchufa con `BLOB_STORE_BACKEND=paquete.modulo:Clase`
+  (subclase de `BlobStore`) o con `set_blob_store()`.
+
+Variables:
+- CLAIM_CHECK_THRESHOLD_BYTES: tamaño a partir del cual se usa claim-check (0 = apagado,
+  por defecto; requiere almacenamiento compartido entre API y worker). Se compara con lo
+  que el texto ocuparía en el broker, es decir ya comprimido si AMQP_COMPRESSION está
+  activa: un HTML repetitivo que comprime por debajo del umbral sigue viajando en línea. Un worker anterior
+  no reconoce la referencia `$claim_check`: activarlo sólo con todos los workers ya
+  actualizados (primero workers, después el API).
+- BLOB_STORE_DIR: directorio del backend de archivos.
+- BLOB_STORE_BACKEND: `fs` o ruta `modulo:Clase` de otro backend.
+"""
+
+import os
+import hashlib
+import importlib
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.codec import encode_body
+
+logger = logging.getLogger(__name__)
+
+CLAIM_CHECK_KEY = "$claim_check"
+CLAIM_CHECK_THRESHOLD = int(os.getenv("CLAIM_CHECK_THRESHOLD_BYTES", "0"))
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "/var/lib/notifications/blobs")
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "fs")
+
+
+class BlobNotFoundError(KeyError):
+    """La referencia apunta a un blob que ya no existe"""
+
+
+class BlobStore(ABC):
+    """Almacén direccionado por contenido con conteo de referencias por dueño"""
+
+    @staticmethod
+    def key_for(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @abstractmethod
+    def put(self, data: bytes, owner: str) -> str:
+        """Guarda `data` (si no existía) y registra a `owner` como referencia. Retorna la clave."""
+
+    @abstractmethod
+    def get(self, key: str) -> bytes:
+        """Bytes del blob; lanza BlobNotFoundError si no existe"""
+
+    @abstractmethod
+    def release(self, key: str, owner: str) -> bool:
+        """Quita la referencia de `owner`; borra el blob si era la última. True si se borró."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+
+class FileSystemBlobStore(BlobStore):
+    """Blobs en `<root>/<ab>/<sha256>` y referencias en `<root>/refs/<sha256>/<owner>`"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _blob_path(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _refs_dir(self, key: str) -> Path:
+        return self.root / "refs" / key
+
+    def put(self, data: bytes, owner: str) -> str:
+        key = self.key_for(data)
+        # Primero la referencia y después el blob: un `release` concurrente de otro dueño
+        # ve la referencia nueva y no borra el blob
+        refs = self._refs_dir(key)
+        refs.mkdir(parents=True, exist_ok=True)
+        (refs / _safe_name(owner)).touch()
+        path = self._blob_path(key)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return key
+
+    def get(self, key: str) -> bytes:
+        try:
+            return self._blob_path(key).read_bytes()
+        except FileNotFoundError:
+            raise BlobNotFoundError(key) from None
+
+    def release(self, key: str, owner: str) -> bool:
+        refs = self._refs_dir(key)
+        try:
+            (refs / _safe_name(owner)).unlink()
+        except FileNotFoundError:
+            pass
+        try:
+            refs.rmdir()  # falla si quedan otras referencias
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        if refs.exists():
+            return False  # otro mensaje volvió a referenciarlo mientras tanto
+        try:
+            self._blob_path(key).unlink()
+        except FileNotFoundError:
+            return False
+        return True
+
+    def exists(self, key: str) -> bool:
+        return self._blob_path(key).exists()
+
+
+def _safe_name(owner: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in owner) or "_"
+
+
+_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        if BLOB_STORE_BACKEND in ("fs", "filesystem"):
+            _store = FileSystemBlobStore(BLOB_STORE_DIR)
+        else:
+            module_name, _, class_name = BLOB_STORE_BACKEND.partition(":")
+            _store = getattr(importlib.import_module(module_name), class_name)()
+    return _store
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    """Reemplaza el backend (tests o backends configurados por código)"""
+    global _store
+    _store = store
+
+
+def check_in(data: bytes, owner: str, threshold: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """Si `data` supera el umbral lo guarda y retorna la referencia a publicar; si no, None"""
+    threshold = CLAIM_CHECK_THRESHOLD if threshold is None else threshold
+    # Sólo se comprime (para medir) lo que ya sin comprimir supera el umbral
+    if threshold <= 0 or len(data) < threshold or len(encode_body(data)[0]) < threshold:
+        return None
+    key = get_blob_store().put(data, owner)
+    return {CLAIM_CHECK_KEY: key, "size": len(data)}
+
+
+def is_reference(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get(CLAIM_CHECK_KEY), str)
+
+
+def check_out(reference: Dict[str, Any]) -> bytes:
+    """Bytes originales del texto referenciado"""
+    return get_blob_store().get(reference[CLAIM_CHECK_KEY])
+
+
+def release(reference: Dict[str, Any], owner: str) -> None:
+    """Libera la referencia de un mensaje terminado; nunca interrumpe el procesamiento"""
+    try:
+        get_blob_store().release(reference[CLAIM_CHECK_KEY], owner)
+    except Exception as exc:
+        logger.warning(f"No se pudo liberar el blob {reference.get(CLAIM_CHECK_KEY)}: {exc}")
+
+
+def _message_fields(payload: Dict[str, Any]) -> List[Tuple[Dict[str, Any], str]]:
+    """(contenedor, clave) de cada texto de mensaje: `message` o cada `message.<canal>`"""
+    message = payload.get("message")
+    if isinstance(message, dict) and not is_reference(message):
+        return [(message, channel) for channel in message]
+    return [(payload, "message")] if "message" in payload else []
+
+
+def _copy(payload: Dict[str, Any]) -> Dict[str, Any]:
+    result = dict(payload)
+    if isinstance(result.get("message"), dict) and not is_reference(result["message"]):
+        result["message"] = dict(result["message"])
+    return result
+
+
+def check_in_payload(payload: Dict[str, Any], owner: str, threshold: Optional[int] = None) -> Dict[str, Any]:
+    """Copia de `payload` con los textos que superan el umbral reemplazados por referencias"""
+    result = _copy(payload)
+    for container, field in _message_fields(result):
+        value = container[field]
+        if isinstance(value, str):
+            reference = check_in(value.encode("utf-8"), owner, threshold)
+            if reference is not None:
+                container[field] = reference
+    return result
+
+
+def references(payload: Any) -> List[Dict[str, Any]]:
+    """Referencias de claim-check que trae el payload (vacía si viaja completo)"""
+    if not isinstance(payload, dict):
+        return []
+    return [container[field] for container, field in _message_fields(payload) if is_reference(container[field])]
+
+
+def check_out_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia de `payload` con cada referencia reemplazada por el texto descargado"""
+    result = _copy(payload)
+    for container, field in _message_fields(result):
+        if is_reference(container[field]):
+            container[field] = check_out(container[field]).decode("utf-8")
+    return result
+
+
+def release_payload(payload: Any, owner: str) -> None:
+    """Libera las referencias de `owner` a todos los blobs que usa el payload"""
+    for reference in references(payload):
+        release(reference, owner)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Optional
+from .sms_segments import MessageEstimate
 
 class Channel(ABC):
     name: str #Esto sirve para identificar el canal
@@ -19,6 +20,13 @@ class Channel(ABC):
         """
         return
 
+    def estimate(self, message: str) -> Optional[MessageEstimate]:
+        """
+        Codificacion, segmentos y costo estimado del mensaje (SMS/WhatsApp)
+        Implementacion base: None, el canal no cobra ni limita por segmento.
+        """
+        return None
+
     #Metodo solo para debug que retorna el nombre del canal
     def __str__(self) -> str:
         return f"{self.__class__.__name__}(name={self.name})"
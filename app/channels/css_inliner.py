@@ -0,0 +1,348 @@
+"""
+CSS inline y minificado de las plantillas de email
+==================================================
+
+Qué es este archivo:
+- Gmail, Outlook y otros clientes ignoran (o recortan) los bloques `<style>`: para que el
+  email se vea igual en todos, cada regla tiene que ir en el atributo `style` de los
+  elementos. Hacerlo en cada envío obliga a parsear el HTML completo por email.
+- `inline_css` procesa la *fuente* de una plantilla Jinja, una vez por versión de la
+  plantilla (ver `email_templates`): copia las reglas de los `<style>` a los elementos,
+  minifica el HTML y el resultado es lo que Jinja compila. Cada envío sólo sustituye
+  variables sobre un HTML ya inlineado.
+
+Qué se inlinea y qué no:
+- Selectores de tipo, `.clase`, `#id`, `*`, compuestos (`div.box`) y combinadores
+  descendiente (`.header h1`) e hijo (`ul > li`). Se respeta la especificidad, el orden
+  y `!important`; el `style` que ya traía el elemento gana sobre las reglas normales.
+- Quedan en un `<style>` residual: pseudo-clases y pseudo-elementos (`:hover`,
+  `:before`), selectores de atributo o de hermanos, `@media` y demás @-reglas, y las
+  reglas que pueden aplicar a clases generadas por Jinja (`class="status-{{status}}"`
+  conserva `.status-ok`, `.status-error`...).
+- Las expresiones y bloques Jinja (`{{ }}`, `{% %}`, `{# #}`) se copian sin tocar.
+"""
+
+import re
+from html.parser import HTMLParser
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Elementos sin etiqueta de cierre
+_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+# Elementos que no reciben estilos inline
+_NO_STYLE = {"html", "head", "title", "meta", "link", "style", "script", "base"}
+# Contenido donde los espacios importan
+_PRESERVE = {"pre", "textarea", "script"}
+
+_JINJA = re.compile(r"(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})", re.S)
+_STYLE_BLOCK = re.compile(r"<style\b[^>]*>(.*?)</style\s*>", re.S | re.I)
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_COMPOUND = re.compile(r"^(\*|[a-zA-Z][\w-]*)?((?:[.#][\w-]+)*)$")
+_STYLE_ATTR = re.compile(r"""\sstyle\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""", re.I)
+_RESIDUAL_MARKER = "<!--css-inliner:residual-->"
+
+
+class _Compound(NamedTuple):
+    tag: Optional[str]
+    classes: Tuple[str, ...]
+    id: Optional[str]
+
+
+class _Element(NamedTuple):
+    tag: str
+    classes: Set[str]
+    id: Optional[str]
+
+
+class _Rule(NamedTuple):
+    text: str                                 # regla original (para el <style> residual)
+    steps: List[Tuple[str, _Compound]]        # (combinador con el paso anterior, compuesto)
+    specificity: Tuple[int, int, int]
+    order: int
+    declarations: List[Tuple[str, str, bool]]  # (propiedad, valor, important)
+
+
+def _split_top_level(text: str, separator: str) -> List[str]:
+    """Divide por `separator` fuera de comillas y paréntesis (url(...), data URIs)"""
+    parts, depth, quote, current = [], 0, None, []
+    for char in text:
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif char == separator and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def _parse_declarations(text: str) -> List[Tuple[str, str, bool]]:
+    declarations = []
+    for item in _split_top_level(text, ";"):
+        name, colon, value = item.partition(":")
+        name, value = name.strip().lower(), " ".join(value.split())
+        if not colon or not name or not value:
+            continue
+        important = value.lower().endswith("!important")
+        if important:
+            value = value[: -len("!important")].rstrip()
+        declarations.append((name, value, important))
+    return declarations
+
+
+def _parse_selector(text: str) -> Optional[List[Tuple[str, _Compound]]]:
+    """Pasos del selector, o None si no se puede inlinear"""
+    if not text or any(char in text for char in ":[+~"):
+        return None
+    steps, combinator = [], " "
+    for token in re.sub(r"\s*>\s*", " > ", text.strip()).split():
+        if token == ">":
+            if not steps:
+                return None
+            combinator = ">"
+            continue
+        match = _COMPOUND.match(token)
+        if not match:
+            return None
+        tag, rest = match.group(1), match.group(2)
+        classes = tuple(re.findall(r"\.([\w-]+)", rest))
+        ids = re.findall(r"#([\w-]+)", rest)
+        if len(ids) > 1:
+            return None
+        steps.append((combinator, _Compound(None if tag in (None, "*") else tag.lower(), classes, ids[0] if ids else None)))
+        combinator = " "
+    return steps or None
+
+
+def _specificity(steps: List[Tuple[str, _Compound]]) -> Tuple[int, int, int]:
+    return (
+        sum(1 for _, c in steps if c.id),
+        sum(len(c.classes) for _, c in steps),
+        sum(1 for _, c in steps if c.tag),
+    )
+
+
+def _parse_stylesheet(css: str) -> Tuple[List[_Rule], List[str]]:
+    """Reglas inlineables y texto de las que deben quedar en el <style> residual"""
+    css = _CSS_COMMENT.sub("", css)
+    rules: List[_Rule] = []
+    residual: List[str] = []
+    index = 0
+    while index < len(css):
+        start = css.find("{", index)
+        if start < 0:
+            break
+        prelude = css[index:start].strip()
+        # Bloque balanceado (las @-reglas como @media tienen bloques anidados)
+        depth, end = 0, start
+        while end < len(css):
+            if css[end] == "{":
+                depth += 1
+            elif css[end] == "}":
+                depth -= 1
+                if depth == 0:
+                    break
+            end += 1
+        body = css[start + 1:end]
+        index = end + 1
+        text = _minify_css(f"{prelude}{{{body}}}")
+        if prelude.startswith("@"):
+            residual.append(text)
+            continue
+        declarations = _parse_declarations(body)
+        for selector in prelude.split(","):
+            selector = " ".join(selector.split())
+            steps = _parse_selector(selector)
+            if steps is None:
+                residual.append(_minify_css(f"{selector}{{{body}}}"))
+                continue
+            rules.append(_Rule(f"{selector}{{{_format_declarations(declarations)}}}", steps, _specificity(steps), len(rules), declarations))
+    return rules, residual
+
+
+def _minify_css(css: str) -> str:
+    css = " ".join(_CSS_COMMENT.sub("", css).split())
+    return re.sub(r"\s*([{};,>])\s*", r"\1", css).replace(";}", "}")
+
+
+def _format_declarations(declarations: List[Tuple[str, str, bool]]) -> str:
+    return ";".join(f"{name}:{value}{' !important' if important else ''}" for name, value, important in declarations)
+
+
+def _compound_matches(compound: _Compound, element: _Element) -> bool:
+    return (
+        (compound.tag is None or compound.tag == element.tag)
+        and (compound.id is None or compound.id == element.id)
+        and all(cls in element.classes for cls in compound.classes)
+    )
+
+
+def _matches(steps: List[Tuple[str, _Compound]], stack: List[_Element], index: int) -> bool:
+    combinator, compound = steps[-1]
+    if not _compound_matches(compound, stack[index]):
+        return False
+    if len(steps) == 1:
+        return True
+    if combinator == ">":
+        return index > 0 and _matches(steps[:-1], stack, index - 1)
+    return any(_matches(steps[:-1], stack, i) for i in range(index - 1, -1, -1))
+
+
+def _static_tokens(value: Optional[str], dynamic: Set[str]) -> Set[str]:
+    """Tokens fijos de un atributo class/id; de los generados por Jinja guarda el prefijo fijo"""
+    tokens = set()
+    for token in _JINJA.sub(lambda m: "\0", value or "").split():
+        if "\0" in token:
+            dynamic.add(token.split("\0", 1)[0])
+        else:
+            tokens.add(token)
+    return tokens
+
+
+def _collapse(text: str) -> str:
+    """Colapsa espacios fuera de las expresiones Jinja"""
+    parts = _JINJA.split(text)
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts))
+
+
+class _Inliner(HTMLParser):
+    def __init__(self, rules: List[_Rule], minify: bool):
+        super().__init__(convert_charrefs=False)
+        self.rules = rules
+        self.minify = minify
+        self.out: List[str] = []
+        self.stack: List[_Element] = []
+        self.dynamic: Set[str] = set()
+        self.matched: Set[int] = set()
+        self.residual_at: Optional[int] = None
+        self.preserve = 0
+
+    # --- etiquetas ---
+
+    def _element(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> _Element:
+        values = dict(attrs)
+        classes = _static_tokens(values.get("class"), self.dynamic)
+        ids = _static_tokens(values.get("id"), self.dynamic)
+        return _Element(tag, classes, next(iter(ids)) if len(ids) == 1 else None)
+
+    def _styled(self, raw: str, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> str:
+        if tag in _NO_STYLE:
+            return raw
+        matched = [rule for rule in self.rules if _matches(rule.steps, self.stack, len(self.stack) - 1)]
+        if not matched:
+            return raw
+        self.matched.update(rule.order for rule in matched)
+        matched.sort(key=lambda rule: (rule.specificity, rule.order))
+        inline = _parse_declarations(dict(attrs).get("style") or "")
+        merged: Dict[str, str] = {}
+        # Cascada: reglas normales < style del elemento < reglas !important < style !important
+        for layer in (
+            [d for rule in matched for d in rule.declarations if not d[2]],
+            [d for d in inline if not d[2]],
+            [d for rule in matched for d in rule.declarations if d[2]],
+            [d for d in inline if d[2]],
+        ):
+            for name, value, _ in layer:
+                merged.pop(name, None)
+                merged[name] = value
+        style = ";".join(f"{name}:{value}" for name, value in merged.items()).replace('"', "&quot;")
+        raw = _STYLE_ATTR.sub("", raw)
+        closing = "/>" if raw.endswith("/>") else ">"
+        return f'{raw[: -len(closing)].rstrip()} style="{style}"{closing}'
+
+    def handle_starttag(self, tag, attrs):
+        raw = self.get_starttag_text()
+        if tag in _VOID:
+            self.stack.append(self._element(tag, attrs))
+            self.out.append(self._styled(raw, tag, attrs))
+            self.stack.pop()
+            return
+        self.stack.append(self._element(tag, attrs))
+        self.out.append(self._styled(raw, tag, attrs))
+        if tag in _PRESERVE:
+            self.preserve += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self.stack.append(self._element(tag, attrs))
+        self.out.append(self._styled(self.get_starttag_text(), tag, attrs))
+        self.stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag in _PRESERVE and self.preserve:
+            self.preserve -= 1
+        # Tolerante a etiquetas desbalanceadas (p. ej. ramas {% if %} con aperturas distintas)
+        for position in range(len(self.stack) - 1, -1, -1):
+            if self.stack[position].tag == tag:
+                del self.stack[position:]
+                break
+        self.out.append(f"</{tag}>")
+
+    # --- contenido ---
+
+    def handle_data(self, data):
+        self.out.append(_collapse(data) if self.minify and not self.preserve else data)
+
+    def handle_entityref(self, name):
+        self.out.append(f"&{name};")
+
+    def handle_charref(self, name):
+        self.out.append(f"&#{name};")
+
+    def handle_comment(self, data):
+        if f"<!--{data}-->" == _RESIDUAL_MARKER:
+            self.residual_at = len(self.out)
+            self.out.append("")
+        elif not self.minify or data.startswith("[if"):
+            self.out.append(f"<!--{data}-->")  # los condicionales de Outlook se conservan
+
+    def handle_decl(self, decl):
+        self.out.append(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self.out.append(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        self.out.append(f"<![{data}]>")
+
+
+def _maybe_dynamic(rule: _Rule, dynamic: Set[str]) -> bool:
+    """La regla podría aplicar a una clase/id generada por Jinja (no se puede resolver ahora)"""
+    names = [name for _, c in rule.steps for name in c.classes + ((c.id,) if c.id else ())]
+    return any(name.startswith(prefix) for name in names for prefix in dynamic)
+
+
+def inline_css(html: str, minify: bool = True) -> str:
+    """Copia las reglas de los `<style>` a los atributos `style` y (opcional) minifica.
+
+    Pensado para la fuente de una plantilla: se ejecuta una vez por versión, no por envío.
+    """
+    blocks = _STYLE_BLOCK.findall(html)
+    if not blocks and not minify:
+        return html
+    rules, residual = _parse_stylesheet("\n".join(blocks))
+    marked = [False]
+
+    def _replace(_match):
+        if marked[0]:
+            return ""
+        marked[0] = True
+        return _RESIDUAL_MARKER
+
+    parser = _Inliner(rules, minify)
+    parser.feed(_STYLE_BLOCK.sub(_replace, html))
+    parser.close()
+
+    kept = residual + [
+        rule.text for rule in rules
+        if rule.order not in parser.matched or _maybe_dynamic(rule, parser.dynamic)
+    ]
+    if parser.residual_at is not None and kept:
+        parser.out[parser.residual_at] = f"<style>{''.join(kept)}</style>"
+    output = "".join(parser.out)
+    return output.strip() if minify else output
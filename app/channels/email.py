@@ -1,10 +1,33 @@
 
-from typing import Any, Optional, Dict
+from typing import Any, Optional, Dict, List, Sequence, Tuple
+from dataclasses import dataclass
 from .base import Channel
+from .smtp_pool import SMTPPool, get_smtp_pool, is_broken_session
+from . import email_templates, mime_cache, validation
+from app.rate_limiter import TokenBucket
+import asyncio
+import smtplib
 import logging
-import re
 import json
 
+
+@dataclass
+class EmailResult:
+    """Resultado del envío a un destinatario dentro de un lote"""
+    destination: str
+    success: bool
+    error: Optional[str] = None
+    permanent: bool = False
+
+    def raise_for_error(self) -> None:
+        """Lanza ValueError (rechazo 5xx o destino inválido) o ConnectionError (transitorio)"""
+        if self.success:
+            return
+        if self.permanent:
+            raise ValueError(f"Email rechazado para {self.destination}: {self.error}")
+        raise ConnectionError(f"Email no entregado a {self.destination}: {self.error}")
+
+
 class EmailChannel(Channel):
     name = "email"
 
@@ -18,8 +41,16 @@ class EmailChannel(Channel):
                 - smtp_port: Puerto de SMTP
                 - smtp_user: Usuario de SMTP
                 - smtp_password: Password de SMTP
+                - smtp_starttls: Usar STARTTLS (por defecto True)
+                - smtp_pool_size: Sesiones SMTP reutilizables (por defecto 5)
+                - smtp_max_age: Segundos antes de reciclar una sesion (por defecto 300)
+                - smtp_max_messages: Emails por sesion antes de reciclarla (por defecto 100)
+                - smtp_batch_session_size: Emails de un lote por sesion (por defecto 50)
+                - smtp_domain_concurrency: Sesiones simultaneas por dominio destino (por defecto 2)
+                - smtp_domain_rate: Emails por segundo por dominio destino (0 = sin limite)
                 - from_email: Email de remitente
                 - from_name: Nombre de remitente
+                - template_dir: Directorio de plantillas HTML (por defecto app/templates)
         """
         self.config = config or {}
         self.logger = logging.getLogger(__name__)
@@ -28,72 +59,155 @@ class EmailChannel(Channel):
         #Configuraciones por defecto
         self.from_email = self.config.get("from_email", "noreply@tudominio.com")
         self.from_name = self.config.get("from_name", "Notifications Service")
+        self.template_dir = self.config.get("template_dir") or email_templates.TEMPLATE_DIR
+
+        #Envio en lotes (campanas): agrupado por dominio de destino
+        self.batch_session_size = int(self.config.get("smtp_batch_session_size", 50))
+        self.domain_concurrency = int(self.config.get("smtp_domain_concurrency", 2))
+        self.domain_rate = float(self.config.get("smtp_domain_rate") or 0)
 
         #Validar configuracion requerida
         if not self.config.get("smtp_host"):
             self.logger.warning("SMTP esta configurado, pero sin host")
 
     
-    def validate_destination(self, destination: str) -> None:
+    def validate_destination(self, destination: str) -> str:
         """
-        Valida que el email de destino tenga el formato correcto
+        Valida que el email de destino tenga el formato correcto y lo retorna normalizado
         """
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(pattern, destination):
+        normalized = validation.normalize_email(destination)
+        if normalized is None:
             raise ValueError(f"Email invalido: {destination}")
+        return normalized
 
     async def send(self, destination: str, message: str, subject: Optional[str] = None) -> None:
         """Envia el email a la direccion de destino usando SMTP"""
-        self.validate_destination(destination)
+        destination = self.validate_destination(destination)
         await self.send_with_smtp(destination, message, subject)
     
     
+    def relay_key(self) -> Tuple[str, int, Optional[str]]:
+        """Identifica el relay SMTP: los emails con el mismo relay pueden ir en un lote"""
+        return (self.config.get("smtp_host", "smtp.gmail.com"), int(self.config.get("smtp_port", 587)), self.config.get("smtp_user"))
+
+    def _smtp_pool(self) -> SMTPPool:
+        """Pool compartido de sesiones autenticadas para este servidor/usuario"""
+        return get_smtp_pool(
+            self.config.get("smtp_host", "smtp.gmail.com"),
+            self.config.get("smtp_port", 587),
+            self.config.get("smtp_user"),
+            self.config.get("smtp_password"),
+            starttls=_as_bool(self.config.get("smtp_starttls", True)),
+            max_size=int(self.config.get("smtp_pool_size", 5)),
+            max_age=float(self.config.get("smtp_max_age", 300)),
+            max_messages=int(self.config.get("smtp_max_messages", 100)),
+        )
+
+    def _build_message(self, destination: str, message: str, subject: Optional[str] = None) -> bytes:
+        """Bytes del mensaje MIME (HTML) listos para enviar.
+
+        El cuerpo y las cabeceras comunes se serializan una vez por (asunto, HTML) y se
+        reutilizan entre destinatarios; por email sólo se agregan To y Message-ID.
+        """
+        prepared = mime_cache.get_prepared(
+            f"{self.from_name} <{self.from_email}>",
+            subject or "Notificacion",
+            message,
+            msgid_domain=self.from_email.rpartition("@")[2] or None,
+        )
+        return prepared.for_recipient(destination)
+
     async def send_with_smtp(self, destination: str, message: str, subject: str = None) -> None:
-        """Envia el email a la direccion de destino usando SMTP"""
+        """Envia el email a la direccion de destino usando una sesion SMTP del pool"""
         try:
-            import smtplib
-            from email.mime.text import MIMEText
-            from email.mime.multipart import MIMEMultipart
-        
-            #Confiracion SMTP
-            smtp_host = self.config.get("smtp_host", "smtp.gmail.com")
-            smtp_port = self.config.get("smtp_port", 587)
-            smtp_user = self.config.get("smtp_user")
-            smtp_password = self.config.get("smtp_password")
-
-            #Crear mensaje
-            msg = MIMEMultipart()
-            msg["From"] = f"{self.from_name} <{self.from_email}>"
-            msg["To"] = destination
-            msg["Subject"] = subject or "Notificacion"
-
-            #Agregar contenido
-            msg.attach(MIMEText(message, "html"))
-
-            #Enviar
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                server.starttls()
-                if smtp_user and smtp_password:
-                    server.login(smtp_user, smtp_password)
-                server.send_message(msg)
-            
+            data = self._build_message(destination, message, subject)
+            await self._smtp_pool().sendmail(self.from_email, [destination], data)
+
             self.logger.info(f"Email enviado a {destination} con asunto {subject} via SMTP")
 
         except Exception as e:
             self.logger.error(f"Error al enviar email via SMTP: {str(e)}")
             raise
 
+    async def send_batch(self, emails: Sequence[Tuple[str, str, Optional[str]]]) -> List[EmailResult]:
+        """Envia muchos emails (destino, html, asunto) agrupados por dominio de destino.
+
+        Cada grupo viaja en pocas sesiones SMTP (varios emails por sesion), respetando la
+        concurrencia y el ritmo por dominio. Retorna un EmailResult por email, en orden.
+        """
+        results: List[Optional[EmailResult]] = [None] * len(emails)
+        by_domain: Dict[str, List[int]] = {}
+        normalized = validation.validate_batch("email", [destination for destination, _, _ in emails])
+        emails = [(valid or destination, html, subject) for valid, (destination, html, subject) in zip(normalized, emails)]
+        for index, valid in enumerate(normalized):
+            if valid is None:
+                results[index] = EmailResult(emails[index][0], False, f"Email invalido: {emails[index][0]}", permanent=True)
+                continue
+            by_domain.setdefault(valid.rsplit("@", 1)[1], []).append(index)
+
+        pool = self._smtp_pool()
+        per_session = max(1, min(self.batch_session_size, pool.max_messages))
+        jobs = []
+        for domain, indexes in by_domain.items():
+            slots, bucket = pool.domain_limits(domain, self.domain_concurrency, self.domain_rate)
+            for start in range(0, len(indexes), per_session):
+                jobs.append(self._send_chunk(pool, slots, bucket, emails, indexes[start:start + per_session], results))
+        await asyncio.gather(*jobs)
+
+        sent = sum(1 for result in results if result.success)
+        self.logger.info(f"Lote de {len(emails)} emails a {len(by_domain)} dominio(s): {sent} enviados")
+        return results
+
+    async def _send_chunk(
+        self,
+        pool: SMTPPool,
+        slots: asyncio.Semaphore,
+        bucket: Optional[TokenBucket],
+        emails: Sequence[Tuple[str, str, Optional[str]]],
+        indexes: List[int],
+        results: List[Optional[EmailResult]],
+    ) -> None:
+        """Envia un grupo del mismo dominio por una sesion; si el servidor la corta, sigue en otra"""
+        pending = list(indexes)
+        async with slots:
+            for attempt in (1, 2):
+                try:
+                    async with pool.session() as session:
+                        while pending:
+                            index = pending[0]
+                            if bucket is not None:
+                                await bucket.acquire()
+                            results[index] = await self._send_on_session(session, *emails[index])
+                            session.messages += 1
+                            pending.pop(0)
+                    return
+                except Exception as exc:
+                    if attempt == 2 or not is_broken_session(exc):
+                        for index in pending:
+                            results[index] = EmailResult(emails[index][0], False, str(exc))
+                        return
+                    self.logger.info(f"Sesion SMTP cortada con {len(pending)} email(s) pendientes; se reintenta")
+
+    async def _send_on_session(self, session: Any, destination: str, message: str, subject: Optional[str]) -> EmailResult:
+        try:
+            data = self._build_message(destination, message, subject)
+        except ValueError as exc:
+            return EmailResult(destination, False, str(exc), permanent=True)
+        try:
+            await asyncio.to_thread(session.smtp.sendmail, self.from_email, [destination], data)
+        except smtplib.SMTPRecipientsRefused as exc:
+            code, reason = next(iter(exc.recipients.values()), (0, b""))
+            return EmailResult(destination, False, f"{code} {reason!r}", permanent=code >= 500)
+        except smtplib.SMTPResponseException as exc:
+            # Remitente o contenido rechazado; smtplib ya hizo RSET y la sesion sigue usable
+            return EmailResult(destination, False, f"{exc.smtp_code} {exc.smtp_error!r}", permanent=exc.smtp_code >= 500)
+        return EmailResult(destination, True)
+
     def _render_template(self, template_name: str, context: Dict[str, Any]) -> str:
         """Renderiza una plantilla HTML con el contexto proporcionado"""
         try:
-            from jinja2 import Environment, FileSystemLoader
-
-            #Directorio de plantillas
-            env = Environment(loader=FileSystemLoader(self.template_dir))
-
-            #Cargar y renderizar la plantilla
-            template = env.get_template(f"{template_name}.html")
-            return template.render(**context)
+            #Environment compartido: la plantilla se compila una sola vez por proceso
+            return email_templates.render(template_name, context, self.template_dir)
 
         except Exception as e:
             self.logger.error(f"Error al renderizar plantilla {template_name}: {str(e)}")
@@ -109,3 +223,9 @@ class EmailChannel(Channel):
         #Envia usando el metodo normal
         await self.send(destination, html_content, subject)
 
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "off", "")
+    return bool(value)
+
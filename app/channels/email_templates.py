@@ -0,0 +1,176 @@
+"""
+Plantillas HTML de email (Jinja2) compiladas una sola vez
+=========================================================
+
+Antes `EmailChannel._render_template` creaba un `Environment` nuevo en cada llamada: cada
+email volvía a leer la plantilla del disco, parsearla y compilarla a Python.
+
+Aquí hay un `Environment` compartido por directorio de plantillas:
+- Las plantillas compiladas quedan en memoria; renderizar es sólo ejecutar el código ya
+  compilado con el contexto.
+- Bytecode cache en disco (`FileSystemBytecodeCache`): los demás procesos worker (y los
+  reinicios) cargan el código compilado en vez de recompilar.
+- El worker precompila todas las plantillas al arrancar (`precompile`), así el primer
+  email no paga la compilación.
+- `auto_reload` (revisar si el archivo cambió en cada `get_template`) sólo en desarrollo.
+- Build de plantillas: antes de compilar, la fuente pasa por `css_inliner.inline_css`
+  (CSS de los `<style>` a atributos `style` + HTML minificado). Se hace una vez por
+  versión de la plantilla (cache por contenido de la fuente); cada envío sólo sustituye
+  variables.
+- `render_cached`: en campañas miles de mensajes llegan con la misma plantilla y el mismo
+  contexto; el HTML se renderiza una vez y se reutiliza (LRU por plantilla + contexto).
+
+Variables:
+- EMAIL_TEMPLATE_DIR: directorio de plantillas (por defecto `app/templates`).
+- EMAIL_TEMPLATE_CACHE_DIR: directorio del bytecode cache (por defecto el temporal del
+  sistema; `off` lo desactiva).
+- EMAIL_TEMPLATE_AUTO_RELOAD: recargar plantillas modificadas (por defecto sólo con ENV=dev).
+- EMAIL_TEMPLATE_INLINE_CSS: inlinear CSS y minificar al compilar (por defecto true).
+- EMAIL_TEMPLATE_RENDER_CACHE_SIZE: HTML renderizados que se guardan para reutilizar
+  (por defecto 256; 0 = sin cache).
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from app.worker_metrics import metrics
+from .css_inliner import inline_css
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_TEMPLATE_DIR = str(_PROJECT_ROOT / "app" / "templates")
+
+TEMPLATE_DIR = os.getenv("EMAIL_TEMPLATE_DIR", DEFAULT_TEMPLATE_DIR)
+TEMPLATE_CACHE_DIR = os.getenv("EMAIL_TEMPLATE_CACHE_DIR", "")
+AUTO_RELOAD = os.getenv(
+    "EMAIL_TEMPLATE_AUTO_RELOAD", "true" if os.getenv("ENV", "").lower() == "dev" else "false"
+).lower() == "true"
+INLINE_CSS = os.getenv("EMAIL_TEMPLATE_INLINE_CSS", "true").lower() == "true"
+RENDER_CACHE_SIZE = int(os.getenv("EMAIL_TEMPLATE_RENDER_CACHE_SIZE", "256"))
+
+_environments: Dict[str, Environment] = {}
+_rendered: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def resolve_template_dir(template_dir: Optional[str] = None) -> str:
+    """Ruta absoluta del directorio; las relativas que no existen se buscan desde la raíz del proyecto"""
+    path = Path(template_dir or TEMPLATE_DIR)
+    if not path.is_absolute() and not path.is_dir():
+        path = _PROJECT_ROOT / path
+    return str(path.resolve())
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    if TEMPLATE_CACHE_DIR.lower() in ("off", "none", "false"):
+        return None
+    if TEMPLATE_CACHE_DIR:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    return FileSystemBytecodeCache()
+
+
+@lru_cache(maxsize=128)
+def build_source(source: str) -> str:
+    """Fuente lista para compilar: CSS inline y HTML minificado (una vez por versión)"""
+    return inline_css(source)
+
+
+class _BuildLoader(FileSystemLoader):
+    """Entrega a Jinja la plantilla ya procesada por `build_source`"""
+
+    def get_source(self, environment: Environment, template: str) -> Tuple[str, Optional[str], Optional[Callable[[], bool]]]:
+        source, filename, uptodate = super().get_source(environment, template)
+        if template.endswith(".html"):
+            source = build_source(source)
+        return source, filename, uptodate
+
+
+def get_environment(template_dir: Optional[str] = None) -> Environment:
+    """Environment compartido para `template_dir` (se crea la primera vez)"""
+    directory = resolve_template_dir(template_dir)
+    env = _environments.get(directory)
+    if env is None:
+        with _lock:
+            env = _environments.get(directory)
+            if env is None:
+                env = Environment(
+                    loader=_BuildLoader(directory) if INLINE_CSS else FileSystemLoader(directory),
+                    bytecode_cache=_bytecode_cache(),
+                    auto_reload=AUTO_RELOAD,
+                )
+                _environments[directory] = env
+    return env
+
+
+def template_file(template_name: str) -> str:
+    """`welcome` -> `welcome.html` (se acepta también el nombre con extensión)"""
+    return template_name if template_name.endswith(".html") else f"{template_name}.html"
+
+
+def get_template(template_name: str, template_dir: Optional[str] = None) -> Template:
+    return get_environment(template_dir).get_template(template_file(template_name))
+
+
+def render(template_name: str, context: Dict[str, Any], template_dir: Optional[str] = None) -> str:
+    """Renderiza la plantilla ya compilada con el contexto dado"""
+    return get_template(template_name, template_dir).render(**context)
+
+
+def render_cached(template_name: str, context: Dict[str, Any], template_dir: Optional[str] = None) -> str:
+    """Como `render`, pero reutiliza el HTML si ya se renderizó la misma plantilla con el mismo contexto"""
+    if RENDER_CACHE_SIZE <= 0 or AUTO_RELOAD:
+        return render(template_name, context, template_dir)
+    key = (
+        resolve_template_dir(template_dir),
+        template_file(template_name),
+        json.dumps(context, sort_keys=True, separators=(",", ":"), default=str),
+    )
+    with _lock:
+        html = _rendered.get(key)
+        if html is not None:
+            _rendered.move_to_end(key)
+    if html is not None:
+        metrics.inc("email_template_renders_total", cached="true")
+        return html
+    html = render(template_name, context, template_dir)
+    metrics.inc("email_template_renders_total", cached="false")
+    with _lock:
+        _rendered[key] = html
+        while len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return html
+
+
+def precompile(template_dir: Optional[str] = None) -> List[str]:
+    """Compila (y deja en memoria y en el bytecode cache) todas las plantillas del directorio.
+
+    Retorna los nombres cargados; las que no compilan se registran y se omiten.
+    """
+    env = get_environment(template_dir)
+    loaded = []
+    for name in env.list_templates(extensions=["html"]):
+        try:
+            env.get_template(name)
+        except Exception as exc:
+            logger.error(f"No se pudo compilar la plantilla {name}: {exc}")
+            continue
+        loaded.append(name)
+    return loaded
+
+
+def reset() -> None:
+    """Descarta los Environments y el HTML renderizado (tests, o para forzar la recarga)"""
+    with _lock:
+        _environments.clear()
+        _rendered.clear()
+    build_source.cache_clear()
@@ -1,6 +1,7 @@
 from typing import Optional
 import os
 from app.models import NotificationChannel
+from app.rate_limiter import process_share
 from .base import Channel
 from .email import EmailChannel
 from .sms import SMSChannel
@@ -38,6 +39,13 @@ def create_channel(channel_name: NotificationChannel, config: dict = None) -> Ch
                 "smtp_port": int(os.getenv("SMTP_PORT", "587")),
                 "smtp_user": os.getenv("SMTP_USER"),
                 "smtp_password": os.getenv("SMTP_PASSWORD"),
+                "smtp_starttls": os.getenv("SMTP_STARTTLS", "true"),
+                "smtp_pool_size": int(os.getenv("SMTP_POOL_SIZE", "5")),
+                "smtp_max_age": float(os.getenv("SMTP_MAX_AGE", "300")),
+                "smtp_max_messages": int(os.getenv("SMTP_MAX_MESSAGES", "100")),
+                "smtp_batch_session_size": int(os.getenv("SMTP_BATCH_SESSION_SIZE", "50")),
+                "smtp_domain_concurrency": int(os.getenv("SMTP_DOMAIN_CONCURRENCY", "2")),
+                "smtp_domain_rate": process_share(float(os.getenv("SMTP_DOMAIN_RATE", "0"))),
                 "from_email": os.getenv("FROM_EMAIL", "noreply@example.com"),
                 "from_name": os.getenv("FROM_NAME", "Notification Service"),
             }
@@ -61,6 +69,8 @@ def create_channel(channel_name: NotificationChannel, config: dict = None) -> Ch
                 "provider": "firebase",
                 "firebase_project_id": os.getenv("FIREBASE_PROJECT_ID", ""),
                 "firebase_service_account_key": os.getenv("FIREBASE_SERVICE_ACCOUNT_KEY", ""),
+                "fcm_url": os.getenv("FCM_URL", ""),
+                "fcm_access_token": os.getenv("FCM_ACCESS_TOKEN", ""),
                 "web_vapid_public_key": os.getenv("WEB_VAPID_PUBLIC_KEY", ""),
                 "web_vapid_private_key": os.getenv("WEB_VAPID_PRIVATE_KEY", ""),
             }
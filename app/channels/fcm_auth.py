@@ -0,0 +1,117 @@
+"""
+Tokens OAuth2 para la API HTTP v1 de FCM
+========================================
+
+La API HTTP v1 de FCM (`POST /v1/projects/{id}/messages:send`) no acepta la server key
+del API legado: cada petición lleva `Authorization: Bearer <access token>` de una cuenta
+de servicio con el scope `firebase.messaging`.
+
+Aquí se obtiene ese token con el flujo JWT bearer de Google (RFC 7523), sin el SDK de
+Google:
+- se firma con la clave privada de la cuenta de servicio (RS256, con python-jose, que el
+  API ya usa para sus JWT) un JWT con `iss` = `client_email`, el scope y `aud` = `token_uri`;
+- se cambia en `token_uri` por un access token que dura ~1 hora.
+
+El token se cachea por cuenta de servicio para todos los `PushChannel` del proceso (el
+worker crea un canal por mensaje) y se renueva `REFRESH_MARGIN` segundos antes de que
+venza. Si FCM responde 401 se descarta con `invalidate()` y la próxima petición pide
+otro. Sin lock: si dos envíos lo renuevan a la vez se pide un token de más, nada peor.
+
+Errores: una cuenta de servicio mal formada es `ValueError` (configuración); si el
+endpoint de tokens falla o responde algo ilegible, `ConnectionError` (transitorio).
+"""
+
+import json
+import time
+from typing import Any, Dict, Optional, Union
+
+import httpx
+from jose import jwt
+
+from .http_pool import get_http_client
+
+FCM_SCOPE = "https://www.googleapis.com/auth/firebase.messaging"
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+JWT_BEARER_GRANT = "urn:ietf:params:oauth:grant-type:jwt-bearer"
+
+# Segundos antes del vencimiento en que se pide un token nuevo
+REFRESH_MARGIN = 300.0
+
+
+class ServiceAccountToken:
+    """Access token de una cuenta de servicio, renovado cuando está por vencer"""
+
+    def __init__(self, info: Dict[str, Any], clock=time.time):
+        try:
+            self.client_email = info["client_email"]
+            self.private_key = info["private_key"]
+        except (KeyError, TypeError) as exc:
+            raise ValueError("Cuenta de servicio de Firebase inválida: faltan client_email/private_key") from exc
+        self.token_uri = info.get("token_uri") or GOOGLE_TOKEN_URI
+        self._clock = clock
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+
+    def _assertion(self, now: float) -> str:
+        claims = {
+            "iss": self.client_email,
+            "scope": FCM_SCOPE,
+            "aud": self.token_uri,
+            "iat": int(now),
+            "exp": int(now) + 3600,
+        }
+        return jwt.encode(claims, self.private_key, algorithm="RS256")
+
+    async def get(self) -> str:
+        """Token vigente (lo pide al endpoint de Google si no hay o está por vencer)"""
+        now = self._clock()
+        if self._token is not None and now < self._expires_at - REFRESH_MARGIN:
+            return self._token
+
+        url = httpx.URL(self.token_uri)
+        client = get_http_client(f"{url.scheme}://{url.netloc.decode('ascii')}")
+        try:
+            response = await client.post(
+                url.raw_path.decode("ascii"),
+                data={"grant_type": JWT_BEARER_GRANT, "assertion": self._assertion(now)},
+            )
+        except httpx.HTTPError as exc:
+            raise ConnectionError(f"Error pidiendo token de FCM: {type(exc).__name__}: {exc}") from exc
+        if response.status_code != 200:
+            raise ConnectionError(f"El endpoint de tokens respondió {response.status_code}: {response.text[:200]}")
+        try:
+            data = response.json()
+            token = data["access_token"]
+            expires_in = float(data.get("expires_in", 3600))
+        except (ValueError, KeyError, TypeError) as exc:
+            raise ConnectionError("Respuesta ilegible del endpoint de tokens de FCM") from exc
+
+        self._token = token
+        self._expires_at = now + expires_in
+        return token
+
+    def invalidate(self) -> None:
+        self._token = None
+        self._expires_at = 0.0
+
+
+_tokens: Dict[str, ServiceAccountToken] = {}
+
+
+def service_account_token(key: Union[str, Dict[str, Any]]) -> ServiceAccountToken:
+    """Token compartido de la cuenta de servicio `key` (JSON en texto o ya decodificado)"""
+    if isinstance(key, str):
+        try:
+            key = json.loads(key)
+        except ValueError as exc:
+            raise ValueError("FIREBASE_SERVICE_ACCOUNT_KEY no es JSON válido") from exc
+    source = ServiceAccountToken(key)
+    cached = _tokens.get(source.client_email)
+    if cached is None or cached.private_key != source.private_key or cached.token_uri != source.token_uri:
+        _tokens[source.client_email] = source
+        cached = source
+    return cached
+
+
+def clear_cache() -> None:
+    _tokens.clear()
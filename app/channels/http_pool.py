@@ -0,0 +1,53 @@
+"""
+Clientes HTTP compartidos para los proveedores (FCM, Twilio...)
+==============================================================
+
+Crear un cliente por mensaje implica una conexión TLS nueva en cada envío. Aquí se
+mantiene un `httpx.AsyncClient` por URL base (y por event loop), con keep-alive y
+HTTP/2 cuando el paquete `h2` está instalado, reutilizado por todos los envíos.
+"""
+
+import asyncio
+import weakref
+from typing import Dict
+
+import httpx
+
+try:  # HTTP/2 es opcional: httpx lo necesita vía el paquete `h2`
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Un juego de clientes por event loop: un AsyncClient no puede usarse desde otro loop
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client(
+    base_url: str,
+    timeout: float = 10.0,
+    max_connections: int = 20,
+) -> httpx.AsyncClient:
+    """Retorna el cliente compartido para `base_url` (lo crea la primera vez).
+
+    Las credenciales se pasan en cada petición, así varias cuentas comparten el pool.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _clients.setdefault(loop, {})
+    client = clients.get(base_url)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            http2=HTTP2_AVAILABLE,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+        clients[base_url] = client
+    return client
+
+
+async def close_http_clients() -> None:
+    """Cierra los clientes del event loop actual (llamar al apagar el worker)"""
+    loop = asyncio.get_running_loop()
+    for client in _clients.pop(loop, {}).values():
+        await client.aclose()
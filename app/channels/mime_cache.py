@@ -0,0 +1,84 @@
+"""
+Esqueletos MIME reutilizables para envíos masivos
+=================================================
+
+Antes cada email armaba un `MIMEMultipart` + `MIMEText` nuevo y `smtplib` lo volvía a
+serializar: codificar el HTML (base64 si tiene acentos), plegar cabeceras y generar el
+boundary, por cada destinatario, aunque en una campaña el cuerpo y el asunto son
+idénticos para todos.
+
+Aquí el mensaje se prepara una vez por (remitente, asunto, HTML): `PreparedMessage`
+guarda los bytes ya serializados de las cabeceras comunes y del cuerpo codificado. Por
+destinatario sólo se agregan `To` y `Message-ID` y se obtienen los bytes listos para
+`smtplib.SMTP.sendmail` (terminadores CRLF), sin pasar por el paquete `email`.
+
+Los preparados viven en un LRU de `SMTP_MIME_CACHE_SIZE` entradas (por defecto 64).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+from typing import Optional, Tuple
+
+from app.worker_metrics import metrics
+
+MIME_CACHE_SIZE = int(os.getenv("SMTP_MIME_CACHE_SIZE", "64"))
+
+
+class PreparedMessage:
+    """Mensaje serializado una vez; `for_recipient` sólo estampa las cabeceras por destinatario"""
+
+    def __init__(self, from_header: str, subject: str, html: str, msgid_domain: Optional[str] = None):
+        msg = MIMEMultipart()
+        msg["From"] = from_header
+        msg["Subject"] = subject
+        msg.attach(MIMEText(html, "html"))
+        # Misma serialización que `smtplib.SMTP.send_message` (política del mensaje con CRLF)
+        raw = msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+        self.headers, _, self.body = raw.partition(b"\r\n\r\n")
+        self.msgid_domain = msgid_domain
+
+    def for_recipient(self, destination: str) -> bytes:
+        """Bytes del mensaje para `destination` (dirección ASCII ya validada)"""
+        if "\r" in destination or "\n" in destination:
+            raise ValueError(f"Email invalido: {destination!r}")
+        message_id = make_msgid(domain=self.msgid_domain)
+        return b"".join((
+            self.headers,
+            b"\r\nTo: ", destination.encode("ascii"),
+            b"\r\nMessage-ID: ", message_id.encode("ascii"),
+            b"\r\n\r\n",
+            self.body,
+        ))
+
+
+_prepared: "OrderedDict[Tuple[str, str, str], PreparedMessage]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_prepared(from_header: str, subject: str, html: str, msgid_domain: Optional[str] = None) -> PreparedMessage:
+    """Mensaje preparado para (remitente, asunto, HTML); se serializa sólo la primera vez"""
+    key = (from_header, subject, html)
+    with _lock:
+        prepared = _prepared.get(key)
+        if prepared is not None:
+            _prepared.move_to_end(key)
+    if prepared is not None:
+        metrics.inc("smtp_mime_prepared_total", cached="true")
+        return prepared
+    prepared = PreparedMessage(from_header, subject, html, msgid_domain)
+    metrics.inc("smtp_mime_prepared_total", cached="false")
+    if MIME_CACHE_SIZE > 0:
+        with _lock:
+            _prepared[key] = prepared
+            while len(_prepared) > MIME_CACHE_SIZE:
+                _prepared.popitem(last=False)
+    return prepared
+
+
+def clear() -> None:
+    with _lock:
+        _prepared.clear()
@@ -1,9 +1,43 @@
 from typing import Any, Optional, Dict, List
+from dataclasses import dataclass
 from .base import Channel
+from .http_pool import get_http_client
+from . import fcm_auth
+import asyncio
 import logging
 import json
+import httpx
 from datetime import datetime
 
+# Peticiones simultáneas a FCM por envío agrupado (la API v1 acepta un token por petición)
+FCM_MAX_CONCURRENT_REQUESTS = 50
+
+# Errores de FCM (`errorCode` de la API v1) que dependen del token o del mensaje:
+# reintentar no sirve. El resto (UNAVAILABLE, INTERNAL, QUOTA_EXCEEDED...) son transitorios
+FCM_PERMANENT_ERRORS = {
+    "UNREGISTERED",
+    "INVALID_ARGUMENT",
+    "SENDER_ID_MISMATCH",
+}
+
+
+@dataclass
+class PushResult:
+    """Resultado del envío a un token dentro de un envío agrupado"""
+    token: str
+    success: bool
+    message_id: Optional[str] = None
+    error: Optional[str] = None
+
+    def raise_for_error(self) -> None:
+        """Lanza ValueError (error del token) o ConnectionError (error transitorio)"""
+        if self.success:
+            return
+        if self.error in FCM_PERMANENT_ERRORS:
+            raise ValueError(f"FCM rechazó el token {self.token[:20]}...: {self.error}")
+        raise ConnectionError(f"FCM no entregó a {self.token[:20]}...: {self.error}")
+
+
 class PushChannel(Channel):
     name = "push"
     
@@ -16,6 +50,15 @@ class PushChannel(Channel):
         self.firebase_project_id = self.config.get("firebase_project_id", "")
         self.firebase_service_account_key = self.config.get("firebase_service_account_key", "")
         
+        # API HTTP v1 de FCM: un token por petición, auth OAuth2 (Bearer). El token sale de
+        # la cuenta de servicio o de `fcm_access_token`; sin ninguno el envío es simulado
+        self.fcm_url = (
+            self.config.get("fcm_url")
+            or f"https://fcm.googleapis.com/v1/projects/{self.firebase_project_id}/messages:send"
+        )
+        self.fcm_access_token = self.config.get("fcm_access_token", "")
+        self.max_concurrent_requests = int(self.config.get("max_concurrent_requests", FCM_MAX_CONCURRENT_REQUESTS))
+        
         # Configuración de Web Push
         self.web_vapid_public_key = self.config.get("web_vapid_public_key", "")
         self.web_vapid_private_key = self.config.get("web_vapid_private_key", "")
@@ -78,17 +121,109 @@ class PushChannel(Channel):
     async def _send_via_firebase(self, token: str, payload: Dict[str, Any]) -> None:
         """Envía notificación via Firebase Cloud Messaging"""
         try:
-            # Aquí implementaremos la lógica de Firebase
             self.logger.info(f"Enviando push via Firebase a token: {token[:20]}...")
-            self.logger.info(f"Payload: {payload}")
+            if not self._has_credentials():
+                self.logger.info(f"Payload: {payload}")
+                self.logger.info("✅ Push enviado via Firebase (simulado)")
+                return
             
-            # TODO: Implementar envío real con Firebase
-            self.logger.info("✅ Push enviado via Firebase (simulado)")
+            results = await self.send_multicast([token], payload)
+            results[0].raise_for_error()
             
         except Exception as e:
             self.logger.error(f"Error enviando via Firebase: {str(e)}")
             raise
     
+    def _has_credentials(self) -> bool:
+        return bool(self.fcm_access_token or self.firebase_service_account_key)
+    
+    async def _authorization(self) -> str:
+        """Cabecera Authorization para FCM (token fijo o el de la cuenta de servicio)"""
+        if self.fcm_access_token:
+            return f"Bearer {self.fcm_access_token}"
+        token = await fcm_auth.service_account_token(self.firebase_service_account_key).get()
+        return f"Bearer {token}"
+    
+    async def send_multicast(self, tokens: List[str], payload: Dict[str, Any]) -> List[PushResult]:
+        """
+        Envía el mismo payload a varios tokens
+        
+        La API v1 de FCM no tiene multicast: sale una petición por token, en paralelo
+        (máximo `max_concurrent_requests` a la vez) por un cliente HTTP compartido y con
+        un solo token OAuth2 para todas. Nunca lanza por errores de entrega: cada token
+        recibe su PushResult, en el mismo orden que `tokens`.
+        
+        Args:
+            tokens: Lista de tokens de dispositivos
+            payload: title, body y opcionalmente data
+            
+        Returns:
+            List[PushResult]: Resultado por token
+        """
+        if not tokens:
+            raise ValueError("Lista de tokens vacía")
+        
+        if not self._has_credentials():
+            self.logger.info(f"✅ Push enviado a {len(tokens)} dispositivos via Firebase (simulado)")
+            return [PushResult(token=t, success=True) for t in tokens]
+        
+        try:
+            authorization = await self._authorization()
+        except ConnectionError as e:
+            self.logger.error(f"No se obtuvo token OAuth2 para FCM ({len(tokens)} tokens): {e}")
+            return [PushResult(token=t, success=False, error=f"AUTH: {e}") for t in tokens]
+        
+        url = httpx.URL(self.fcm_url)
+        client = get_http_client(
+            f"{url.scheme}://{url.netloc.decode('ascii')}", max_connections=self.max_concurrent_requests
+        )
+        path = url.raw_path.decode("ascii")
+        notification = {"title": payload.get("title"), "body": payload.get("body")}
+        # La API v1 sólo acepta valores de texto en `data`
+        data = {str(k): v if isinstance(v, str) else json.dumps(v) for k, v in (payload.get("data") or {}).items()}
+        semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        
+        async def _limited(token: str) -> PushResult:
+            async with semaphore:
+                return await self._post_message(client, path, authorization, token, notification, data)
+        
+        results = await asyncio.gather(*(_limited(t) for t in tokens))
+        if any(r.error == "UNAUTHENTICATED" for r in results) and not self.fcm_access_token:
+            # El token OAuth2 fue revocado o venció antes de lo esperado: pedir otro la próxima vez
+            fcm_auth.service_account_token(self.firebase_service_account_key).invalidate()
+        return list(results)
+    
+    async def _post_message(
+        self,
+        client: httpx.AsyncClient,
+        path: str,
+        authorization: str,
+        token: str,
+        notification: Dict[str, Any],
+        data: Dict[str, str],
+    ) -> PushResult:
+        """Una petición `messages:send`; los errores de transporte son transitorios"""
+        body = {"message": {"token": token, "notification": notification, "data": data}}
+        try:
+            response = await client.post(path, json=body, headers={"Authorization": authorization})
+        except httpx.HTTPError as e:
+            self.logger.error(f"Error de conexión con FCM: {e}")
+            return PushResult(token=token, success=False, error=f"{type(e).__name__}: {e}")
+        
+        try:
+            content = response.json()
+        except ValueError:
+            content = None
+        
+        if response.status_code == 200:
+            if not isinstance(content, dict) or "name" not in content:
+                # Respuesta ilegible: no sabemos si se entregó, se trata como transitorio
+                self.logger.error(f"FCM respondió 200 con un cuerpo inválido: {response.text[:200]}")
+                return PushResult(token=token, success=False, error="INVALID_RESPONSE")
+            return PushResult(token=token, success=True, message_id=content["name"])
+        
+        error = _fcm_error_code(content) or f"HTTP {response.status_code}"
+        return PushResult(token=token, success=False, error=error)
     
     async def send_with_data(self, destination: str, title: str, body: str, data: Dict[str, Any] = None) -> None:
         """
@@ -119,7 +254,7 @@ class PushChannel(Channel):
             self.logger.error(f"Error enviando push con datos: {str(e)}")
             raise
     
-    async def send_to_multiple(self, tokens: List[str], title: str, body: str, data: Dict[str, Any] = None) -> None:
+    async def send_to_multiple(self, tokens: List[str], title: str, body: str, data: Dict[str, Any] = None) -> List[PushResult]:
         """
         Envía notificación push a múltiples dispositivos
         
@@ -128,6 +263,9 @@ class PushChannel(Channel):
             title: Título de la notificación
             body: Cuerpo del mensaje
             data: Datos adicionales (opcional)
+            
+        Returns:
+            List[PushResult]: Resultado por token (los fallos no interrumpen al resto)
         """
         try:
             if not tokens:
@@ -142,17 +280,28 @@ class PushChannel(Channel):
             
             self.logger.info(f"Enviando push a {len(tokens)} dispositivos")
             
-            for token in tokens:
-                try:
-                    if self.provider == "firebase":
-                        await self._send_via_firebase(token, payload)
-                except Exception as e:
-                    self.logger.error(f"Error enviando a token {token[:20]}...: {str(e)}")
-                    # Continuar con el siguiente token
-                    continue
-                    
-            self.logger.info("✅ Push enviado a todos los dispositivos")
+            if self.provider != "firebase":
+                raise ValueError(f"Proveedor no soportado: {self.provider}")
+            
+            results = await self.send_multicast(tokens, payload)
+            failed = [r for r in results if not r.success]
+            for result in failed:
+                self.logger.error(f"Error enviando a token {result.token[:20]}...: {result.error}")
+            
+            self.logger.info(f"✅ Push enviado a {len(results) - len(failed)}/{len(results)} dispositivos")
+            return results
             
         except Exception as e:
             self.logger.error(f"Error enviando push múltiple: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+
+
+def _fcm_error_code(content: Any) -> Optional[str]:
+    """`errorCode` del FcmError de la respuesta v1 (o el `status` general del error)"""
+    if not isinstance(content, dict) or not isinstance(content.get("error"), dict):
+        return None
+    error = content["error"]
+    for detail in error.get("details") or []:
+        if isinstance(detail, dict) and detail.get("errorCode"):
+            return detail["errorCode"]
+    return error.get("status")
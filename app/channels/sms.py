@@ -1,7 +1,8 @@
 from typing import Any, Optional, Dict
 from .base import Channel
+from . import sms_segments, twilio_api, validation
+from .sms_segments import MessageEstimate
 import logging
-import re
 
 class SMSChannel(Channel):
     name = "sms"
@@ -16,6 +17,8 @@ class SMSChannel(Channel):
                 - account_sid: SID de la cuenta de Twilio
                 - auth_token: Token de autenticación de Twilio
                 - from_number: Número de teléfono de envío
+                - api_url: URL base de la API de Twilio (opcional, para tests)
+                - cost_per_segment: Precio de cada segmento (para Notification.cost)
         """
         self.config = config or {}
         self.logger = logging.getLogger(__name__)
@@ -23,6 +26,8 @@ class SMSChannel(Channel):
         # Configuraciones por defecto
         self.provider = self.config.get("provider", "twilio")
         self.from_number = self.config.get("from_number", "+1234567890")
+        self.api_url = self.config.get("api_url") or twilio_api.TWILIO_API_URL
+        self.cost_per_segment = self.config.get("cost_per_segment") or sms_segments.SMS_COST_PER_SEGMENT
         
         # Validar configuración requerida
         if self.provider == "twilio":
@@ -31,24 +36,30 @@ class SMSChannel(Channel):
             if not self.config.get("auth_token"):
                 self.logger.warning("Twilio configurado, pero sin Auth Token")
 
-    def validate_destination(self, destination: str) -> None:
+    def validate_destination(self, destination: str) -> str:
         """
         Valida que el número de teléfono sea válido
         
         Args:
             destination: Número de teléfono a validar
             
+        Returns:
+            str: Número normalizado en E.164 (+573001234567)
+            
         Raises:
             ValueError: Si el número no es válido
         """
-        # Limpiar el número (quitar espacios, guiones, etc.)
-        cleaned = re.sub(r'[^\d+]', '', destination)
-        
-        # Patrones válidos: +1234567890 o 1234567890
-        if not re.match(r'^\+?[1-9]\d{1,14}$', cleaned):
+        normalized = validation.normalize_phone(destination)
+        if normalized is None:
             raise ValueError(f"Número de teléfono inválido: {destination}")
-        
-        self.logger.info(f"Número de teléfono validado: {destination}")
+        return normalized
+
+    def estimate(self, message: str) -> MessageEstimate:
+        """
+        Codificación (GSM-7/UCS-2), segmentos y costo del SMS; se calcula una vez por cuerpo distinto
+        """
+        info = sms_segments.segment_info(message)
+        return MessageEstimate(info.encoding, info.segments, sms_segments.estimate_cost(info.segments, self.cost_per_segment))
 
     async def send(self, destination: str, message: str, subject: str = None) -> None:
         """
@@ -60,8 +71,8 @@ class SMSChannel(Channel):
             subject: Asunto (no se usa en SMS, pero mantiene compatibilidad)
         """
         try:
-            # Validar destino
-            self.validate_destination(destination)
+            # Validar y normalizar destino
+            destination = self.validate_destination(destination)
             
             # Enviar según el proveedor
             if self.provider == "twilio":
@@ -82,26 +93,17 @@ class SMSChannel(Channel):
             message: Contenido del mensaje
         """
         try:
-            from twilio.rest import Client
-            
-            # Obtener credenciales
-            account_sid = self.config.get("account_sid")
-            auth_token = self.config.get("auth_token")
-            
-            if not account_sid or not auth_token:
-                raise ValueError("Credenciales de Twilio no configuradas")
-            
-            # Crear cliente de Twilio
-            client = Client(account_sid, auth_token)
-            
-            # Enviar SMS
-            message_obj = client.messages.create(
-                body=message,
+            # Cliente HTTP compartido (keep-alive) en vez de un twilio.rest.Client por mensaje
+            message_obj = await twilio_api.create_message(
+                self.config.get("account_sid"),
+                self.config.get("auth_token"),
                 from_=self.from_number,
-                to=destination
+                to=destination,
+                body=message,
+                api_url=self.api_url,
             )
             
-            self.logger.info(f"SMS enviado exitosamente. SID: {message_obj.sid}")
+            self.logger.info(f"SMS enviado exitosamente. SID: {message_obj.get('sid')}")
             
         except Exception as e:
             self.logger.error(f"Error enviando SMS via Twilio: {str(e)}")
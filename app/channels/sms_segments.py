@@ -0,0 +1,121 @@
+"""
+Codificación, segmentos y costo estimado de SMS
+===============================================
+
+Un SMS viaja en segmentos de 140 bytes: 160 caracteres GSM-7 (153 si el mensaje se
+parte en varios, por la cabecera UDH) o 70 unidades UCS-2/UTF-16 (67 si se parte). Basta
+un carácter fuera del alfabeto GSM (una tilde como `á`, un emoji) para que todo el mensaje
+pase a UCS-2 y use ~2.3 veces más segmentos. Twilio cobra y limita el throughput
+(mensajes por segundo de cada número) por segmento, no por mensaje.
+
+Aquí:
+- `segment_info(body)` calcula codificación, unidades y segmentos una vez por cuerpo
+  distinto (LRU de `SMS_SEGMENT_CACHE_SIZE` entradas, por defecto 4096): una campaña
+  repite el mismo texto;
+- la codificación y los caracteres de extensión se detectan con regex precompiladas en
+  lugar de recorrer carácter por carácter; los cuerpos ASCII (la mayoría) usan clases
+  más chicas y no se codifican a UTF-16;
+- `estimate_cost(segments, price)` da el costo como texto para `Notification.cost`.
+
+Precios por defecto (los canales aceptan `cost_per_segment` / `cost_per_message` en su
+configuración):
+- SMS_COST_PER_SEGMENT: precio de cada segmento SMS (por defecto 0.0079).
+- WHATSAPP_COST_PER_MESSAGE: precio de cada mensaje de WhatsApp, que no se segmenta
+  (por defecto 0.005).
+
+Los caracteres de la tabla de extensión GSM (`^ { } \\ [ ~ ] | €` y el salto de página)
+ocupan dos septetos y nunca se parten entre segmentos; tampoco los pares sustitutos UTF-16.
+"""
+
+import os
+import re
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Iterable, NamedTuple, Union
+
+SEGMENT_CACHE_SIZE = int(os.getenv("SMS_SEGMENT_CACHE_SIZE", "4096"))
+SMS_COST_PER_SEGMENT = os.getenv("SMS_COST_PER_SEGMENT", "0.0079")
+WHATSAPP_COST_PER_MESSAGE = os.getenv("WHATSAPP_COST_PER_MESSAGE", "0.005")
+
+GSM_7 = "GSM-7"
+UCS_2 = "UCS-2"
+
+GSM_BASIC = frozenset(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_EXTENSION = frozenset("\f^{}\\[~]|€")
+
+# ASCII fuera del alfabeto GSM (controles salvo \n \r \f, y el acento grave)
+_ASCII_NON_GSM_RE = re.compile(r"[\x00-\x09\x0b\x0e-\x1f\x7f`]")
+_ASCII_EXTENSION_RE = re.compile(r"[\f^{}\\\[~\]|]")
+# Cualquier carácter fuera de GSM-7 (básico + extensión) y los de la extensión
+_NON_GSM_RE = re.compile("[^" + "".join(re.escape(char) for char in sorted(GSM_BASIC | GSM_EXTENSION)) + "]")
+_EXTENSION_RE = re.compile("[" + "".join(re.escape(char) for char in sorted(GSM_EXTENSION)) + "]")
+
+_LIMITS = {GSM_7: (160, 153), UCS_2: (70, 67)}
+
+
+class SegmentInfo(NamedTuple):
+    encoding: str  # GSM-7 o UCS-2
+    units: int  # septetos (GSM-7) o unidades UTF-16 (UCS-2)
+    segments: int
+
+
+class MessageEstimate(NamedTuple):
+    """Lo que un envío consume del proveedor: segmentos (tokens del rate limit) y costo"""
+    encoding: str
+    segments: int
+    cost: str
+
+
+def _split(costs: Iterable[int], per_segment: int) -> int:
+    """Segmentos necesarios sin partir un carácter (escape GSM o par sustituto) entre dos"""
+    segments, used = 1, 0
+    for cost in costs:
+        if used + cost > per_segment:
+            segments += 1
+            used = 0
+        used += cost
+    return segments
+
+
+def _info(encoding: str, units: int, costs: Iterable[int], exact: bool) -> SegmentInfo:
+    single, multi = _LIMITS[encoding]
+    if units <= single:
+        return SegmentInfo(encoding, units, 1)
+    if exact:  # todos los caracteres cuestan una unidad
+        return SegmentInfo(encoding, units, -(-units // multi))
+    return SegmentInfo(encoding, units, _split(costs, multi))
+
+
+def _gsm(body: str, extended: int) -> SegmentInfo:
+    costs = (2 if char in GSM_EXTENSION else 1 for char in body)
+    return _info(GSM_7, len(body) + extended, costs, exact=not extended)
+
+
+def _ucs2(body: str, units: int) -> SegmentInfo:
+    costs = (2 if ord(char) > 0xFFFF else 1 for char in body)
+    return _info(UCS_2, units, costs, exact=units == len(body))
+
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def segment_info(body: str) -> SegmentInfo:
+    """Codificación y segmentos de `body` (se calcula una vez por cuerpo distinto)"""
+    if body.isascii():
+        if _ASCII_NON_GSM_RE.search(body):
+            return _ucs2(body, len(body))
+        return _gsm(body, len(_ASCII_EXTENSION_RE.findall(body)))
+    if _NON_GSM_RE.search(body):
+        return _ucs2(body, len(body.encode("utf-16-le")) // 2)
+    return _gsm(body, len(_EXTENSION_RE.findall(body)))
+
+
+def estimate_cost(segments: int, price: Union[str, float, Decimal]) -> str:
+    """Costo de `segments` a `price` cada uno, con 4 decimales (p. ej. "0.0158")"""
+    cost = Decimal(str(price)) * segments
+    return str(cost.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP))
+
+
+def clear_cache() -> None:
+    segment_info.cache_clear()
@@ -0,0 +1,240 @@
+"""
+Pool de sesiones SMTP autenticadas
+==================================
+
+Antes cada email abría `smtplib.SMTP(...)`, hacía EHLO, STARTTLS (handshake TLS), EHLO
+otra vez y LOGIN, enviaba un solo mensaje y cerraba. Eso son varias idas y vueltas por
+email, y todo dentro del event loop (bloqueándolo).
+
+Aquí se mantiene un pool de sesiones ya autenticadas por servidor/usuario, reutilizadas
+entre envíos:
+- Las operaciones de smtplib corren en hilos (`asyncio.to_thread`); el loop no se bloquea.
+- A lo sumo `max_size` sesiones por pool (= envíos SMTP simultáneos).
+- Reciclado: una sesión se cierra al superar `max_age` segundos o `max_messages` envíos
+  (los servidores cortan sesiones largas y algunos limitan mensajes por conexión).
+- Health check: una sesión que estuvo ociosa más de `check_after` segundos se prueba con
+  NOOP antes de usarla; si falla se descarta y se abre otra.
+- Reconexión: si el servidor cortó la sesión a mitad de un envío, se reintenta una vez
+  con una sesión nueva.
+- Límites por dominio de destino (`domain_limits`): sesiones simultáneas y emails/s hacia
+  un mismo dominio, compartidos por todos los lotes que usan el pool.
+"""
+
+import time
+import asyncio
+import logging
+import smtplib
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from email.message import Message
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+from app.rate_limiter import TokenBucket
+from app.worker_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def is_broken_session(exc: BaseException) -> bool:
+    """True si el error indica que la sesión ya no sirve (no que el mensaje sea inválido).
+
+    `SMTPException` hereda de `OSError`: un rechazo del servidor (4xx/5xx) deja la sesión usable.
+    """
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class _Session:
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages = 0
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: bool = True,
+        max_size: int = 5,
+        max_age: float = 300.0,
+        max_messages: int = 100,
+        check_after: float = 30.0,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_messages = max_messages
+        self.check_after = check_after
+        self.timeout = timeout
+        self._idle: Deque[_Session] = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._domains: Dict[str, Tuple[asyncio.Semaphore, Optional[TokenBucket]]] = {}
+        self._closed = False
+
+    # --- ciclo de vida de las sesiones (en hilos) ---
+
+    def _open(self) -> _Session:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+        except Exception:
+            _quit(smtp)
+            raise
+        metrics.inc("smtp_connections_opened_total", host=self.host)
+        return _Session(smtp)
+
+    def _expired(self, session: _Session) -> bool:
+        return (
+            time.monotonic() - session.created_at >= self.max_age
+            or session.messages >= self.max_messages
+        )
+
+    def _healthy(self, session: _Session) -> bool:
+        if time.monotonic() - session.last_used < self.check_after:
+            return True
+        try:
+            code, _ = session.smtp.noop()
+        except OSError:
+            return False
+        return code == 250
+
+    async def _checkout(self) -> _Session:
+        while self._idle:
+            session = self._idle.pop()
+            if self._expired(session):
+                await asyncio.to_thread(_quit, session.smtp)
+                continue
+            if await asyncio.to_thread(self._healthy, session):
+                return session
+            metrics.inc("smtp_stale_sessions_total", host=self.host)
+            await asyncio.to_thread(_quit, session.smtp)
+        return await asyncio.to_thread(self._open)
+
+    async def _checkin(self, session: _Session) -> None:
+        session.last_used = time.monotonic()
+        if self._closed or self._expired(session):
+            await asyncio.to_thread(_quit, session.smtp)
+        else:
+            self._idle.append(session)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[_Session]:
+        """Sesión autenticada exclusiva mientras dure el bloque; vuelve al pool al salir.
+
+        Si el bloque lanza un error de conexión la sesión se descarta en vez de devolverse.
+        """
+        async with self._slots:
+            session = await self._checkout()
+            try:
+                yield session
+            except asyncio.CancelledError:
+                # El hilo puede seguir usando la sesión: se cierra el socket y no se devuelve
+                session.smtp.close()
+                raise
+            except Exception as exc:
+                if is_broken_session(exc):
+                    await asyncio.to_thread(_quit, session.smtp)
+                else:
+                    await self._checkin(session)
+                raise
+            await self._checkin(session)
+
+    def domain_limits(self, domain: str, concurrency: int, rate: float) -> Tuple[asyncio.Semaphore, Optional[TokenBucket]]:
+        """Semáforo (sesiones simultáneas) y bucket (emails/s, None = sin límite) del dominio"""
+        limits = self._domains.get(domain)
+        if limits is None:
+            limits = (asyncio.Semaphore(max(1, concurrency)), TokenBucket(rate) if rate > 0 else None)
+            self._domains[domain] = limits
+        return limits
+
+    # --- envío ---
+
+    async def send_message(
+        self,
+        msg: Message,
+        from_addr: Optional[str] = None,
+        to_addrs: Optional[Sequence[str]] = None,
+    ) -> Dict[str, Tuple[int, bytes]]:
+        """Envía `msg` por una sesión del pool; reintenta una vez si la sesión estaba cortada.
+
+        Retorna los destinatarios rechazados (como `smtplib.SMTP.send_message`).
+        """
+        return await self._send(lambda smtp: smtp.send_message(msg, from_addr, to_addrs))
+
+    async def sendmail(self, from_addr: str, to_addrs: Sequence[str], data: bytes) -> Dict[str, Tuple[int, bytes]]:
+        """Como `send_message`, pero con el mensaje ya serializado (ver `mime_cache`)"""
+        return await self._send(lambda smtp: smtp.sendmail(from_addr, list(to_addrs), data))
+
+    async def _send(self, operation: Callable[[smtplib.SMTP], Dict[str, Tuple[int, bytes]]]) -> Dict[str, Tuple[int, bytes]]:
+        for attempt in (1, 2):
+            try:
+                async with self.session() as session:
+                    refused = await asyncio.to_thread(operation, session.smtp)
+                    session.messages += 1
+                    return refused
+            except smtplib.SMTPServerDisconnected:
+                if attempt == 2:
+                    raise
+                logger.info(f"Sesión SMTP con {self.host} cortada; reintentando con una nueva")
+                metrics.inc("smtp_reconnects_total", host=self.host)
+        raise AssertionError("unreachable")
+
+    async def close(self) -> None:
+        self._closed = True
+        while self._idle:
+            await asyncio.to_thread(_quit, self._idle.pop().smtp)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"host": self.host, "idle": len(self._idle), "max_size": self.max_size}
+
+
+def _quit(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.quit()
+    except Exception:
+        smtp.close()
+
+
+# Un juego de pools por event loop (el semáforo pertenece al loop que lo usa)
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, SMTPPool]]" = weakref.WeakKeyDictionary()
+
+
+def get_smtp_pool(
+    host: str,
+    port: int = 587,
+    user: Optional[str] = None,
+    password: Optional[str] = None,
+    starttls: bool = True,
+    **options: Any,
+) -> SMTPPool:
+    """Pool compartido para el servidor/usuario dados (se crea la primera vez)"""
+    loop = asyncio.get_running_loop()
+    pools = _pools.setdefault(loop, {})
+    key = (host, int(port), user, password, bool(starttls))
+    pool = pools.get(key)
+    if pool is None:
+        pool = SMTPPool(host, int(port), user, password, starttls, **options)
+        pools[key] = pool
+    return pool
+
+
+async def close_smtp_pools() -> None:
+    """Cierra las sesiones del event loop actual (llamar al apagar el worker)"""
+    loop = asyncio.get_running_loop()
+    for pool in _pools.pop(loop, {}).values():
+        await pool.close()
@@ -0,0 +1,83 @@
+"""
+Cliente asíncrono de la API de mensajes de Twilio (SMS y WhatsApp)
+==================================================================
+
+Antes cada SMS/WhatsApp creaba un `twilio.rest.Client` nuevo y llamaba a
+`messages.create`, que es bloqueante: una conexión HTTPS (con su handshake TLS) por
+mensaje, y el event loop del worker detenido mientras tanto.
+
+Aquí se habla directo con el endpoint REST de Twilio
+(`POST /2010-04-01/Accounts/{sid}/Messages.json`, formulario URL-encoded, auth básica)
+usando el cliente HTTP compartido de `http_pool`: keep-alive, HTTP/2 si `h2` está
+instalado y un solo pool de conexiones para todos los envíos y cuentas.
+
+Errores (mismo criterio que push):
+- 4xx (número inválido, remitente no habilitado...): `ValueError`, no vale la pena reintentar.
+- 429, 5xx, errores de transporte y respuestas 200/201 ilegibles: `ConnectionError`,
+  transitorio.
+
+Variables:
+- TWILIO_API_URL: URL base de la API (por defecto https://api.twilio.com; en tests un
+  servidor local).
+"""
+
+import os
+from typing import Any, Dict, Optional, Sequence
+
+import httpx
+
+from .http_pool import get_http_client
+
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com")
+
+
+async def create_message(
+    account_sid: str,
+    auth_token: str,
+    from_: str,
+    to: str,
+    body: Optional[str] = None,
+    media_urls: Optional[Sequence[str]] = None,
+    api_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Crea un mensaje (SMS o WhatsApp según el prefijo `whatsapp:`). Retorna el JSON de Twilio."""
+    if not account_sid or not auth_token:
+        raise ValueError("Credenciales de Twilio no configuradas")
+    form: Dict[str, Any] = {"From": from_, "To": to}
+    if body:
+        form["Body"] = body
+    if media_urls:
+        form["MediaUrl"] = list(media_urls)  # un campo MediaUrl por archivo
+
+    client = get_http_client((api_url or TWILIO_API_URL).rstrip("/"))
+    try:
+        response = await client.post(
+            f"/2010-04-01/Accounts/{account_sid}/Messages.json",
+            data=form,
+            auth=(account_sid, auth_token),
+        )
+    except httpx.HTTPError as exc:
+        raise ConnectionError(f"Error de conexión con Twilio: {type(exc).__name__}: {exc}") from exc
+
+    if response.status_code in (200, 201):
+        try:
+            data = response.json()
+        except ValueError as exc:
+            # No sabemos si Twilio aceptó el mensaje (p. ej. un proxy respondió HTML)
+            raise ConnectionError(f"Respuesta ilegible de Twilio ({response.status_code}): {response.text[:200]}") from exc
+        if not isinstance(data, dict):
+            raise ConnectionError(f"Respuesta inesperada de Twilio ({response.status_code}): {response.text[:200]}")
+        return data
+    detail = _error_detail(response)
+    if response.status_code == 429 or response.status_code >= 500:
+        raise ConnectionError(f"Twilio respondió {response.status_code}: {detail}")
+    raise ValueError(f"Twilio rechazó el mensaje ({response.status_code}): {detail}")
+
+
+def _error_detail(response: httpx.Response) -> str:
+    """`code` y `message` del error de Twilio (o el texto de la respuesta)"""
+    try:
+        data = response.json()
+    except ValueError:
+        return response.text[:200]
+    return f"{data.get('code')} {data.get('message')}"
@@ -0,0 +1,103 @@
+"""
+Validación y normalización de destinos (email, SMS, WhatsApp)
+=============================================================
+
+Antes cada `validate_destination` buscaba sus regex en el cache de `re`, limpiaba el
+número con `re.sub` y dejaba una línea INFO por destino validado, en cada mensaje y en
+cada reintento.
+
+Aquí:
+- los patrones se compilan una vez al importar;
+- los teléfonos se normalizan a E.164 (`+573001234567`; WhatsApp con prefijo
+  `whatsapp:`), con un camino rápido para los que ya vienen así. Un número sin `+` (ni
+  prefijo internacional `00`) es nacional: se le antepone DEFAULT_PHONE_COUNTRY_CODE y,
+  si no está configurado, se rechaza (anteponer sólo `+` convertiría `3001234567` en un
+  número de otro país);
+- el resultado (normalizado o inválido) queda en un LRU de `DESTINATION_CACHE_SIZE`
+  entradas por tipo (por defecto 65536): en campañas y reintentos los destinos se repiten;
+- `validate_batch` valida listas grandes procesando cada destino distinto una sola vez.
+
+Las funciones retornan el destino normalizado o `None` si es inválido; el mensaje de
+error lo arma cada canal.
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional
+
+DESTINATION_CACHE_SIZE = int(os.getenv("DESTINATION_CACHE_SIZE", "65536"))
+# Código de país para números en formato nacional (p. ej. "57"); vacío = se rechazan
+DEFAULT_PHONE_COUNTRY_CODE = os.getenv("DEFAULT_PHONE_COUNTRY_CODE", "").strip().lstrip("+")
+
+_EMAIL_RE = re.compile(r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}")
+_E164_RE = re.compile(r"\+[1-9]\d{1,14}")
+_PHONE_NOISE_RE = re.compile(r"[^\d+]")
+WHATSAPP_PREFIX = "whatsapp:"
+
+
+def _email(destination: str) -> Optional[str]:
+    """Email sin espacios alrededor y con el dominio en minúsculas, o None si es inválido"""
+    destination = destination.strip()
+    if not _EMAIL_RE.fullmatch(destination):
+        return None
+    local, _, domain = destination.rpartition("@")
+    return f"{local}@{domain.lower()}"
+
+
+def _phone(destination: str) -> Optional[str]:
+    """Número en E.164 (`+` y hasta 15 dígitos), o None si es inválido.
+
+    Se ignoran espacios, guiones, paréntesis y puntos. `00` equivale a `+`; un número
+    nacional (sin ninguno de los dos) lleva DEFAULT_PHONE_COUNTRY_CODE, sin el `0` de
+    larga distancia, o es inválido si no hay código configurado.
+    """
+    if _E164_RE.fullmatch(destination):
+        return destination
+    cleaned = _PHONE_NOISE_RE.sub("", destination)
+    if cleaned.startswith("00"):
+        cleaned = f"+{cleaned[2:]}"
+    elif not cleaned.startswith("+"):
+        if not DEFAULT_PHONE_COUNTRY_CODE or not cleaned.isdigit():
+            return None
+        cleaned = f"+{DEFAULT_PHONE_COUNTRY_CODE}{cleaned.lstrip('0')}"
+    return cleaned if _E164_RE.fullmatch(cleaned) else None
+
+
+def _whatsapp(destination: str) -> Optional[str]:
+    """Número de WhatsApp como `whatsapp:+E164`, o None si es inválido"""
+    if destination[:len(WHATSAPP_PREFIX)].lower() == WHATSAPP_PREFIX:
+        destination = destination[len(WHATSAPP_PREFIX):]
+    phone = _phone(destination)
+    return f"{WHATSAPP_PREFIX}{phone}" if phone else None
+
+
+normalize_email = lru_cache(maxsize=DESTINATION_CACHE_SIZE)(_email)
+normalize_phone = lru_cache(maxsize=DESTINATION_CACHE_SIZE)(_phone)
+normalize_whatsapp = lru_cache(maxsize=DESTINATION_CACHE_SIZE)(_whatsapp)
+
+NORMALIZERS: Dict[str, Callable[[str], Optional[str]]] = {
+    "email": normalize_email,
+    "sms": normalize_phone,
+    "whatsapp": normalize_whatsapp,
+}
+_UNCACHED: Dict[str, Callable[[str], Optional[str]]] = {"email": _email, "sms": _phone, "whatsapp": _whatsapp}
+
+
+def validate_batch(kind: str, destinations: Iterable[str]) -> List[Optional[str]]:
+    """Normaliza muchos destinos de un canal (`email`, `sms`, `whatsapp`).
+
+    Retorna una lista alineada con la entrada: el destino normalizado o None si es
+    inválido. Cada valor distinto se normaliza una vez y fuera del LRU, para que una
+    importación masiva no desaloje los destinos calientes del worker.
+    """
+    normalize = _UNCACHED[kind]
+    destinations = list(destinations)
+    unique = dict.fromkeys(destinations)
+    normalized = dict(zip(unique, map(normalize, unique)))
+    return [normalized[destination] for destination in destinations]
+
+
+def clear_cache() -> None:
+    for normalize in NORMALIZERS.values():
+        normalize.cache_clear()
@@ -1,7 +1,8 @@
 from typing import Any, Optional, Dict, List
 from .base import Channel
+from . import sms_segments, twilio_api, validation
+from .sms_segments import MessageEstimate
 import logging
-import re
 import json
 from datetime import datetime
 
@@ -19,6 +20,8 @@ class WhatsAppChannel(Channel):
                 - auth_token: Token de autenticación de Twilio
                 - from_number: Número de WhatsApp de envío
                 - webhook_url: URL del webhook para recibir mensajes
+                - api_url: URL base de la API de Twilio (opcional, para tests)
+                - cost_per_message: Precio de cada mensaje (para Notification.cost)
         """
         self.config = config or {}
         self.logger = logging.getLogger(__name__)
@@ -27,6 +30,8 @@ class WhatsAppChannel(Channel):
         self.provider = self.config.get("provider", "twilio")
         self.from_number = self.config.get("from_number", "whatsapp:+1234567890")
         self.webhook_url = self.config.get("webhook_url", "")
+        self.api_url = self.config.get("api_url") or twilio_api.TWILIO_API_URL
+        self.cost_per_message = self.config.get("cost_per_message") or sms_segments.WHATSAPP_COST_PER_MESSAGE
         
         # Validar configuración requerida
         if self.provider == "twilio":
@@ -43,28 +48,23 @@ class WhatsAppChannel(Channel):
             destination: Número de WhatsApp a validar (formato: +1234567890 o whatsapp:+1234567890)
             
         Returns:
-            str: Número validado con prefijo whatsapp:
+            str: Número normalizado en E.164 con prefijo whatsapp:
             
         Raises:
             ValueError: Si el número no es válido
         """
-        # Limpiar el número (quitar espacios, guiones, etc.)
-        cleaned = re.sub(r'[^\d+]', '', destination)
-        
-        # Remover prefijo whatsapp: si existe
-        if cleaned.startswith('whatsapp:'):
-            cleaned = cleaned[9:]
-        
-        # Patrones válidos: +1234567890 o 1234567890
-        if not re.match(r'^\+?[1-9]\d{1,14}$', cleaned):
+        normalized = validation.normalize_whatsapp(destination)
+        if normalized is None:
             raise ValueError(f"Número de WhatsApp inválido: {destination}")
-        
-        # Agregar prefijo whatsapp: si no existe
-        if not destination.startswith('whatsapp:'):
-            destination = f"whatsapp:{destination}"
-        
-        self.logger.info(f"Número de WhatsApp validado: {destination}")
-        return destination
+        return normalized
+
+    def estimate(self, message: str) -> MessageEstimate:
+        """
+        Codificación y costo del mensaje. WhatsApp no parte los mensajes en segmentos ni
+        cobra por ellos: cuenta siempre como uno, al precio por mensaje.
+        """
+        info = sms_segments.segment_info(message)
+        return MessageEstimate(info.encoding, 1, sms_segments.estimate_cost(1, self.cost_per_message))
 
     async def send(self, destination: str, message: str, subject: str = None) -> None:
         """
@@ -98,26 +98,17 @@ class WhatsAppChannel(Channel):
             message: Contenido del mensaje
         """
         try:
-            from twilio.rest import Client
-            
-            # Obtener credenciales
-            account_sid = self.config.get("account_sid")
-            auth_token = self.config.get("auth_token")
-            
-            if not account_sid or not auth_token:
-                raise ValueError("Credenciales de Twilio no configuradas")
-            
-            # Crear cliente de Twilio
-            client = Client(account_sid, auth_token)
-            
-            # Enviar mensaje
-            message_obj = client.messages.create(
-                body=message,
+            # Cliente HTTP compartido (keep-alive) en vez de un twilio.rest.Client por mensaje
+            message_obj = await twilio_api.create_message(
+                self.config.get("account_sid"),
+                self.config.get("auth_token"),
                 from_=self.from_number,
-                to=destination
+                to=destination,
+                body=message,
+                api_url=self.api_url,
             )
             
-            self.logger.info(f"WhatsApp enviado exitosamente. SID: {message_obj.sid}")
+            self.logger.info(f"WhatsApp enviado exitosamente. SID: {message_obj.get('sid')}")
             
         except Exception as e:
             self.logger.error(f"Error enviando WhatsApp via Twilio: {str(e)}")
@@ -176,30 +167,18 @@ class WhatsAppChannel(Channel):
             caption: Texto descriptivo
         """
         try:
-            from twilio.rest import Client
-            
-            account_sid = self.config.get("account_sid")
-            auth_token = self.config.get("auth_token")
-            
-            if not account_sid or not auth_token:
-                raise ValueError("Credenciales de Twilio no configuradas")
-            
-            client = Client(account_sid, auth_token)
-            
-            # Crear mensaje con multimedia
-            message_data = {
-                'from_': self.from_number,
-                'to': destination,
-                'media_url': [media_url]
-            }
-            
-            # Agregar caption si existe
-            if caption:
-                message_data['body'] = caption
-            
-            message_obj = client.messages.create(**message_data)
+            # Mensaje con multimedia; el caption (si existe) va como cuerpo
+            message_obj = await twilio_api.create_message(
+                self.config.get("account_sid"),
+                self.config.get("auth_token"),
+                from_=self.from_number,
+                to=destination,
+                body=caption,
+                media_urls=[media_url],
+                api_url=self.api_url,
+            )
             
-            self.logger.info(f"Multimedia {media_type} enviado exitosamente. SID: {message_obj.sid}")
+            self.logger.info(f"Multimedia {media_type} enviado exitosamente. SID: {message_obj.get('sid')}")
             
         except Exception as e:
             self.logger.error(f"Error enviando multimedia via Twilio: {str(e)}")
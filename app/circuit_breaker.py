@@ -0,0 +1,182 @@
+"""
+Circuit breaker por proveedor
+=============================
+
+Qué es este archivo:
+- Cuando Twilio o el servidor SMTP están caídos, cada mensaje intenta conectar, espera el
+  timeout y termina en reintentos/DLQ. El circuit breaker corta esa cadena: si la tasa de
+  fallos reciente supera un umbral, "abre el circuito" y el worker manda el mensaje
+  directo a la ruta de reintento sin intentar la conexión.
+
+Estados:
+- closed (cerrado): todo normal, se registran éxitos y fallos en una ventana deslizante.
+- open (abierto): se rechazan los envíos durante `open_seconds`.
+- half_open (semiabierto): pasado ese tiempo se dejan pasar unas pocas pruebas
+  (`half_open_max_calls`); si salen bien se cierra, si alguna falla se vuelve a abrir.
+
+Variables de entorno (valores por defecto para todos los proveedores):
+- WORKER_BREAKER_FAILURE_RATE: tasa de fallos (0-1) que abre el circuito.
+- WORKER_BREAKER_WINDOW: tamaño de la ventana de llamadas recientes.
+- WORKER_BREAKER_MIN_CALLS: llamadas mínimas en la ventana antes de evaluar la tasa.
+- WORKER_BREAKER_OPEN_SECONDS: segundos que el circuito permanece abierto.
+- WORKER_BREAKER_HALF_OPEN_CALLS: pruebas permitidas en estado semiabierto.
+"""
+
+import os
+import time
+import enum
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.worker_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FAILURE_RATE = float(os.getenv("WORKER_BREAKER_FAILURE_RATE", "0.5"))
+WINDOW_SIZE = int(os.getenv("WORKER_BREAKER_WINDOW", "20"))
+MIN_CALLS = int(os.getenv("WORKER_BREAKER_MIN_CALLS", "5"))
+OPEN_SECONDS = float(os.getenv("WORKER_BREAKER_OPEN_SECONDS", "30"))
+HALF_OPEN_CALLS = int(os.getenv("WORKER_BREAKER_HALF_OPEN_CALLS", "1"))
+
+
+class CircuitState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+# Valor numérico del estado para el gauge de métricas
+_STATE_VALUE = {CircuitState.CLOSED: 0, CircuitState.HALF_OPEN: 1, CircuitState.OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Se lanza cuando el circuito del proveedor está abierto y no se intenta el envío"""
+
+    def __init__(self, name: str):
+        super().__init__(f"Circuito abierto para {name}; envío no intentado")
+        self.name = name
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_rate_threshold: float = FAILURE_RATE,
+        window_size: int = WINDOW_SIZE,
+        minimum_calls: int = MIN_CALLS,
+        open_seconds: float = OPEN_SECONDS,
+        half_open_max_calls: int = HALF_OPEN_CALLS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._clock = clock
+        self._window: Deque[bool] = deque(maxlen=window_size)  # True = fallo
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._publish_state()
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._transition(CircuitState.HALF_OPEN)
+        return self._state
+
+    @property
+    def failure_rate(self) -> float:
+        if not self._window:
+            return 0.0
+        return sum(self._window) / len(self._window)
+
+    def allow(self) -> bool:
+        """Indica si se puede intentar un envío. En semiabierto reserva una prueba."""
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+            self._probes_in_flight += 1
+            return True
+        metrics.inc("circuit_breaker_short_circuits_total", provider=self.name)
+        return False
+
+    def record_success(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_max_calls:
+                self._transition(CircuitState.CLOSED)
+            return
+        self._window.append(False)
+
+    def record_failure(self) -> None:
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+            self._transition(CircuitState.OPEN)
+            return
+        self._window.append(True)
+        if (
+            self._state == CircuitState.CLOSED
+            and len(self._window) >= self.minimum_calls
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._transition(CircuitState.OPEN)
+
+    def record_ignored(self) -> None:
+        """Libera una prueba reservada sin contarla (p. ej. error de validación del destino)"""
+        if self._state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _transition(self, new_state: CircuitState) -> None:
+        if new_state == self._state:
+            return
+        logger.warning(f"Circuit breaker {self.name}: {self._state.value} -> {new_state.value}")
+        self._state = new_state
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        if new_state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        elif new_state == CircuitState.CLOSED:
+            self._window.clear()
+        metrics.inc("circuit_breaker_transitions_total", provider=self.name, state=new_state.value)
+        self._publish_state()
+
+    def _publish_state(self) -> None:
+        metrics.set_gauge("circuit_breaker_state", _STATE_VALUE[self._state], provider=self.name)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_rate": round(self.failure_rate, 3),
+            "calls_in_window": len(self._window),
+        }
+
+
+class CircuitBreakerRegistry:
+    """Un circuit breaker por proveedor (p. ej. `sms:twilio`, `email:smtp`)"""
+
+    def __init__(self, factory: Optional[Callable[[str], CircuitBreaker]] = None):
+        self._factory = factory or CircuitBreaker
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            breaker = self._factory(name)
+            self._breakers[name] = breaker
+        return breaker
+
+    def describe(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.describe() for name, breaker in self._breakers.items()}
+
+    def any_open(self) -> bool:
+        return any(b.state == CircuitState.OPEN for b in self._breakers.values())
+
+
+# Registro global usado por el worker
+circuit_breakers = CircuitBreakerRegistry()
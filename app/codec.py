@@ -0,0 +1,115 @@
+"""
+Codificación de cuerpos AMQP (JSON + compresión opcional)
+=========================================================
+
+Qué es este archivo:
+- Los mensajes multi-canal llevan el HTML completo del email (5-10 KB con nuestras
+  plantillas, mucho más en campañas). RabbitMQ los persiste en disco y los copia en cada
+  cola de reintento y en la DLQ.
+- Todo el que publica (API, scheduler, reintentos) serializa con `encode_payload`: si el
+  JSON supera `AMQP_COMPRESSION_THRESHOLD` bytes se comprime y se marca con la propiedad
+  AMQP `content_encoding` (`deflate` = zlib, o `zstd`). Si comprimir no ahorra, se
+  publica tal cual.
+- El worker (y la herramienta de la DLQ) leen con `decode_body`, que descomprime según
+  `content_encoding`; los mensajes sin esa propiedad (publicadores antiguos) se leen igual.
+
+Despliegue: un worker anterior a este módulo no mira `content_encoding` y trataría un
+cuerpo comprimido como JSON roto (cuarentena). Por eso la compresión viene apagada: se
+activa con AMQP_COMPRESSION=zlib sólo cuando todos los consumidores (worker, reintentos,
+herramienta de la DLQ) ya corren esta versión; el orden es actualizar workers primero y
+después publicadores (API, scheduler).
+
+Variables:
+- AMQP_COMPRESSION: `none` (por defecto, ver arriba), `zlib` o `zstd` (requiere el
+  paquete `zstandard`; si no está instalado se usa zlib).
+- AMQP_COMPRESSION_THRESHOLD: bytes a partir de los cuales se comprime (por defecto 2048).
+- AMQP_COMPRESSION_LEVEL: nivel del compresor (por defecto 1 para zlib, 3 para zstd). Con
+  nuestras plantillas zlib-1 logra ~3.3x contra ~3.7x de zlib-6 con casi la mitad de CPU
+  (ver `benchmarks/payload_compression.py`).
+"""
+
+import os
+import json
+import zlib
+import logging
+from typing import Any, Optional, Tuple
+
+try:  # zstd es opcional: más rápido y algo mejor ratio que zlib
+    import zstandard
+except ImportError:  # pragma: no cover - depende del entorno
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFLATE = "deflate"
+ZSTD = "zstd"
+
+COMPRESSION = os.getenv("AMQP_COMPRESSION", "none").lower()
+COMPRESSION_THRESHOLD = int(os.getenv("AMQP_COMPRESSION_THRESHOLD", "2048"))
+_LEVEL = os.getenv("AMQP_COMPRESSION_LEVEL")
+
+
+class CodecError(ValueError):
+    """El cuerpo no se puede decodificar (encoding desconocido o datos corruptos)"""
+
+
+def _encoding_for(algorithm: str) -> Optional[str]:
+    if algorithm in ("none", "off", ""):
+        return None
+    if algorithm == ZSTD:
+        if zstandard is not None:
+            return ZSTD
+        logger.warning("AMQP_COMPRESSION=zstd pero `zstandard` no está instalado; se usa zlib")
+    return DEFLATE
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=level if level is not None else 3).compress(body)
+    return zlib.compress(body, level if level is not None else 1)
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == "identity":
+        return body
+    try:
+        if encoding in (DEFLATE, "zlib"):
+            return zlib.decompress(body)
+        if encoding == ZSTD:
+            if zstandard is None:
+                raise CodecError("Mensaje comprimido con zstd pero `zstandard` no está instalado")
+            return zstandard.ZstdDecompressor().decompress(body)
+    except CodecError:
+        raise
+    except Exception as exc:
+        raise CodecError(f"No se pudo descomprimir ({encoding}): {exc}") from exc
+    raise CodecError(f"content_encoding no soportado: {encoding}")
+
+
+def encode_body(
+    body: bytes,
+    algorithm: Optional[str] = None,
+    threshold: Optional[int] = None,
+    level: Optional[int] = None,
+) -> Tuple[bytes, Optional[str]]:
+    """Comprime `body` si supera el umbral y ahorra espacio. Retorna (bytes, content_encoding)."""
+    encoding = _encoding_for((algorithm or COMPRESSION).lower())
+    threshold = COMPRESSION_THRESHOLD if threshold is None else threshold
+    if encoding is None or len(body) < threshold:
+        return body, None
+    if level is None and _LEVEL:
+        level = int(_LEVEL)
+    compressed = compress(body, encoding, level)
+    if len(compressed) >= len(body):
+        return body, None
+    return compressed, encoding
+
+
+def encode_payload(payload: Any, **options: Any) -> Tuple[bytes, Optional[str]]:
+    """Serializa a JSON (UTF-8) y comprime si corresponde"""
+    return encode_body(json.dumps(payload).encode("utf-8"), **options)
+
+
+def decode_body(body: bytes, content_encoding: Optional[str] = None) -> bytes:
+    """Bytes JSON originales del mensaje; lanza CodecError si no se pueden recuperar"""
+    return decompress(body, content_encoding)
@@ -0,0 +1,205 @@
+"""
+Control adaptativo de concurrencia y prefetch del worker (AIMD)
+===============================================================
+
+Qué es este archivo:
+- El worker tenía `prefetch_count=10` fijo. El valor correcto depende de la latencia del
+  proveedor, que varía de 50 ms a varios segundos: con un valor bajo se desperdicia
+  capacidad cuando el proveedor responde rápido, y con uno alto se satura al proveedor
+  (y se acumulan mensajes sin ack) cuando se pone lento o empieza a fallar.
+- `AdaptiveConcurrency` ajusta el límite en tiempo de ejecución con la regla AIMD
+  (la misma idea que el control de congestión de TCP):
+  - Aumento aditivo: si en el último intervalo la latencia (p90) de los envíos estuvo
+    por debajo del objetivo, la tasa de errores bajo el umbral y el límite se llegó a
+    usar completo, el límite sube en 1.
+  - Disminución multiplicativa: si la latencia supera el objetivo o los errores superan
+    el umbral, el límite se multiplica por `decrease_factor` (por defecto se reduce a la
+    mitad).
+- El mismo objeto limita cuántos mensajes procesa el worker a la vez (`acquire`/
+  `release`) y avisa de los cambios (`on_change`) para ajustar el prefetch del canal AMQP.
+- Cada decisión se exporta en las métricas (`worker_concurrency_limit`,
+  `worker_concurrency_decisions_total`) y en `GET /concurrency` del worker.
+
+Variables de entorno:
+- WORKER_CONCURRENCY: límite inicial.
+- WORKER_CONCURRENCY_MIN / WORKER_CONCURRENCY_MAX: cotas del límite.
+- WORKER_ADAPTIVE_CONCURRENCY: "false" deja el límite fijo en WORKER_CONCURRENCY.
+- WORKER_TARGET_LATENCY_MS: latencia p90 de envío objetivo.
+- WORKER_CONCURRENCY_ERROR_RATE: tasa de errores (0-1) que provoca una disminución.
+- WORKER_CONCURRENCY_INTERVAL: segundos entre decisiones.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List
+
+from app.worker_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+INITIAL_LIMIT = int(os.getenv("WORKER_CONCURRENCY", "10"))
+MIN_LIMIT = int(os.getenv("WORKER_CONCURRENCY_MIN", "1"))
+MAX_LIMIT = int(os.getenv("WORKER_CONCURRENCY_MAX", "64"))
+ADAPTIVE = os.getenv("WORKER_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+TARGET_LATENCY = float(os.getenv("WORKER_TARGET_LATENCY_MS", "1000")) / 1000.0
+ERROR_RATE_THRESHOLD = float(os.getenv("WORKER_CONCURRENCY_ERROR_RATE", "0.2"))
+INTERVAL = float(os.getenv("WORKER_CONCURRENCY_INTERVAL", "5"))
+
+# Muestras mínimas en un intervalo para tomar una decisión
+MIN_SAMPLES = 5
+
+
+class AdaptiveConcurrency:
+    def __init__(
+        self,
+        initial: int = INITIAL_LIMIT,
+        min_limit: int = MIN_LIMIT,
+        max_limit: int = MAX_LIMIT,
+        adaptive: bool = ADAPTIVE,
+        target_latency: float = TARGET_LATENCY,
+        error_rate_threshold: float = ERROR_RATE_THRESHOLD,
+        interval: float = INTERVAL,
+        decrease_factor: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = min(max(initial, self.min_limit), self.max_limit)
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.error_rate_threshold = error_rate_threshold
+        self.interval = interval
+        self.decrease_factor = decrease_factor
+        self._clock = clock
+
+        self._in_use = 0
+        self._peak = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._window_started = clock()
+        self._listeners: List[Callable[[int], None]] = []
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=20)
+        metrics.set_gauge("worker_concurrency_limit", self._limit)
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    def on_change(self, listener: Callable[[int], None]) -> None:
+        """Registra una función que recibe el nuevo límite cada vez que cambia"""
+        self._listeners.append(listener)
+
+    # --- Limitador ---------------------------------------------------------------
+
+    async def acquire(self) -> None:
+        """Espera un hueco libre según el límite actual"""
+        if self._in_use < self._limit and not self._waiters:
+            self._take()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # El hueco se otorgó justo antes de cancelar: devolverlo
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        self._in_use -= 1
+        self._wake()
+
+    def _take(self) -> None:
+        self._in_use += 1
+        self._peak = max(self._peak, self._in_use)
+
+    def _wake(self) -> None:
+        while self._waiters and self._in_use < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._take()
+                waiter.set_result(None)
+
+    # --- Control AIMD ------------------------------------------------------------
+
+    def record(self, latency: float, error: bool = False) -> None:
+        """Registra el resultado de un envío al proveedor"""
+        self._latencies.append(latency)
+        if error:
+            self._errors += 1
+        if self._clock() - self._window_started >= self.interval:
+            self._evaluate()
+
+    def _evaluate(self) -> None:
+        samples = len(self._latencies)
+        now = self._clock()
+        if samples < MIN_SAMPLES:
+            # Muy pocos datos: seguir acumulando en la misma ventana
+            return
+        latencies = sorted(self._latencies)
+        p90 = latencies[min(samples - 1, int(samples * 0.9))]
+        error_rate = self._errors / samples
+        saturated = self._peak >= self._limit
+
+        previous = self._limit
+        if not self.adaptive:
+            action = "hold"
+        elif error_rate > self.error_rate_threshold or p90 > self.target_latency:
+            action = "decrease"
+            self._limit = max(self.min_limit, int(self._limit * self.decrease_factor))
+        elif saturated and self._limit < self.max_limit:
+            action = "increase"
+            self._limit += 1
+        else:
+            action = "hold"
+
+        self.decisions.append({
+            "action": action,
+            "limit": self._limit,
+            "previous": previous,
+            "p90_latency_seconds": round(p90, 4),
+            "error_rate": round(error_rate, 4),
+            "samples": samples,
+            "saturated": saturated,
+        })
+        metrics.inc("worker_concurrency_decisions_total", action=action)
+        metrics.set_gauge("worker_concurrency_limit", self._limit)
+        metrics.set_gauge("worker_send_latency_p90_seconds", p90)
+        metrics.set_gauge("worker_send_error_rate", error_rate)
+
+        self._latencies = []
+        self._errors = 0
+        self._peak = self._in_use
+        self._window_started = now
+
+        if self._limit != previous:
+            logger.info(
+                f"Concurrencia {previous} -> {self._limit} ({action}; p90={p90 * 1000:.0f}ms, "
+                f"errores={error_rate:.0%}, muestras={samples})"
+            )
+            self._wake()
+            for listener in self._listeners:
+                listener(self._limit)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "limit": self._limit,
+            "in_use": self._in_use,
+            "waiting": len(self._waiters),
+            "adaptive": self.adaptive,
+            "bounds": [self.min_limit, self.max_limit],
+            "target_latency_seconds": self.target_latency,
+            "error_rate_threshold": self.error_rate_threshold,
+            "decisions": list(self.decisions),
+        }
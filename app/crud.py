@@ -73,6 +73,8 @@ def get_notification(db: Session, notification_id: int) -> Optional[Notification
         status=i.status.value,
         created_at=i.created_at,
         updated_at=i.sent_at,
+        trace_id=i.trace_id,
+        timings=json.loads(i.timings) if i.timings else None,
     )
 
 
@@ -107,7 +109,9 @@ def get_metrics(db: Session) -> MetricsSummary:
     sent = db.execute(select(func.count()).where(Notification.status == NotificationStatus.SENT)).scalar() or 0
     failed = db.execute(select(func.count()).where(Notification.status == NotificationStatus.FAILED)).scalar() or 0
     scheduled = db.execute(select(func.count()).where(Notification.status == NotificationStatus.SCHEDULED)).scalar() or 0
-    in_process = db.execute(select(func.count()).where(Notification.status == NotificationStatus.PENDING)).scalar() or 0
+    in_process = db.execute(
+        select(func.count()).where(Notification.status.in_([NotificationStatus.PENDING, NotificationStatus.PROCESSING]))
+    ).scalar() or 0
 
     per_channel: dict[str, int] = {}
     rows = db.execute(select(Notification.channel, func.count()).group_by(Notification.channel)).all()
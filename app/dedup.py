@@ -0,0 +1,64 @@
+"""
+Índice de deduplicación del worker
+==================================
+
+Qué es este archivo:
+- Un mismo mensaje lógico puede llegar varias veces al worker: reintentos (`.retry.N`),
+  reentregas del broker tras una caída, etc. Antes cada entrega insertaba una fila nueva
+  en `notifications` y volvía a enviar.
+- Cada mensaje lleva un `message_id` estable (se asigna al publicar). La clave de
+  deduplicación es `<message_id>:<canal>` y se guarda en la columna única
+  `notifications.dedup_key`.
+- `DedupIndex` es un LRU en memoria delante de esa columna: evita la consulta a BD en
+  los casos frecuentes (p. ej. saber que ya se envió) y recuerda qué fila reutilizar.
+- Mientras una entrega envía, su fila está en PROCESSING; si otra entrega del mismo
+  mensaje llega a la vez (reentrega tras perder la conexión, dos consumidores) recibe
+  `NotificationInProgress` y vuelve a los reintentos en lugar de enviar de nuevo.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.models import NotificationChannel, NotificationStatus
+
+
+def dedup_key(message_id: Optional[str], channel: NotificationChannel) -> Optional[str]:
+    """Clave única por mensaje lógico y canal (None si el mensaje no trae id)"""
+    if not message_id:
+        return None
+    return f"{message_id}:{channel.value}"
+
+
+class NotificationInProgress(Exception):
+    """Otra entrega del mismo mensaje y canal está enviando ahora (fila en PROCESSING)"""
+
+    def __init__(self, key: str):
+        super().__init__(f"La notificación {key} se está enviando en otra entrega")
+        self.key = key
+
+
+class DedupIndex:
+    """LRU acotado: dedup_key -> (notification_id, último estado conocido)"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[int, NotificationStatus]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[int, NotificationStatus]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, notification_id: int, status: NotificationStatus) -> None:
+        with self._lock:
+            self._entries[key] = (notification_id, status)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
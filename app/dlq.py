@@ -0,0 +1,317 @@
+"""
+Inspección y reenvío (replay) de la DLQ
+=======================================
+
+Qué es este archivo:
+- Los mensajes que agotan los reintentos quedan en `notifications.queue.dlq` sin camino
+  de vuelta salvo moverlos a mano. Reenviar miles de golpe, además, vuelve a tumbar al
+  proveedor que causó los fallos.
+- Este módulo permite:
+  - inspeccionar la DLQ con filtros (canal, texto del error, antigüedad) sin sacar
+    los mensajes;
+  - reenviar al exchange principal los que cumplan los filtros, en lotes con límite de
+    mensajes por segundo y con confirmación del broker (publisher confirms): un mensaje
+    se quita de la DLQ sólo después de que el broker confirmó su republicación;
+  - reiniciar `x-retry-count` para que el mensaje vuelva a tener toda la escalera de
+    reintentos, e informar el avance.
+- Los mensajes que no cumplen los filtros se devuelven a la DLQ (nack con requeue) al
+  terminar la pasada.
+
+Uso por línea de comandos:
+    python -m app.dlq inspect --channel sms --error timeout --min-age 3600
+    python -m app.dlq replay --channel sms --rate 20 --batch-size 50 --limit 1000
+    python -m app.dlq replay --dry-run
+
+También disponible en el API: `GET /admin/dlq` y `POST /admin/dlq/replay`.
+"""
+
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.codec import CodecError, decode_body
+from app.messaging import EXCHANGE_NAME, QUEUE_NAME, ROUTING_KEY, _connection_channel
+from app.rate_limiter import TokenBucket
+from app.retry_router import build_raw_message
+
+logger = logging.getLogger(__name__)
+
+DLQ_NAME = f"{QUEUE_NAME}.dlq"
+
+# Cabeceras que agrega el worker al mandar un mensaje a la DLQ
+ERROR_HEADER = "x-error"
+FAILED_AT_HEADER = "x-failed-at"
+
+# Cabeceras que se quitan al reenviar: el mensaje vuelve a empezar la escalera de reintentos
+_RESET_HEADERS = ("x-retry-count", "x-final-failure", "x-last-enqueued-at")
+
+
+@dataclass
+class DLQFilter:
+    """Criterios para elegir mensajes de la DLQ (todos opcionales)"""
+    channel: Optional[str] = None
+    error: Optional[str] = None
+    min_age: Optional[float] = None  # segundos desde el fallo definitivo
+    max_age: Optional[float] = None
+
+    def matches(self, payload: Optional[Dict[str, Any]], headers: Dict[str, Any], now: float) -> bool:
+        if self.channel and self.channel.lower() not in _channels_of(payload):
+            return False
+        if self.error and self.error.lower() not in str(headers.get(ERROR_HEADER, "")).lower():
+            return False
+        if self.min_age is not None or self.max_age is not None:
+            age = _age(headers, now)
+            if age is None:
+                return False
+            if self.min_age is not None and age < self.min_age:
+                return False
+            if self.max_age is not None and age > self.max_age:
+                return False
+        return True
+
+
+@dataclass
+class ReplayProgress:
+    scanned: int = 0
+    matched: int = 0
+    replayed: int = 0
+    failed: int = 0
+    dry_run: bool = False
+    finished: bool = False
+    started_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    errors: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["errors"] = self.errors[-10:]
+        data["elapsed_seconds"] = round(time.time() - self.started_at, 3)
+        return data
+
+
+def _channels_of(payload: Optional[Dict[str, Any]]) -> List[str]:
+    if not isinstance(payload, dict):
+        return []
+    destination = payload.get("destination")
+    if isinstance(destination, dict):
+        return [name.lower() for name, value in destination.items() if value]
+    return [str(payload.get("channel") or "").lower()]
+
+
+def _age(headers: Dict[str, Any], now: float) -> Optional[float]:
+    try:
+        failed_at = float(headers[FAILED_AT_HEADER])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return max(0.0, now - failed_at)
+
+
+def _decode(message: Any) -> Optional[Dict[str, Any]]:
+    try:
+        body = decode_body(message.body, getattr(message, "content_encoding", None))
+        payload = json.loads(body.decode("utf-8"))
+    except (CodecError, UnicodeDecodeError, ValueError):
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def _summary(message: Any, payload: Optional[Dict[str, Any]], now: float) -> Dict[str, Any]:
+    headers = dict(message.headers or {})
+    return {
+        "message_id": getattr(message, "message_id", None) or headers.get("x-message-id"),
+        "channels": _channels_of(payload),
+        "error": headers.get(ERROR_HEADER),
+        "age_seconds": _age(headers, now),
+        "retry_count": headers.get("x-retry-count"),
+        "replay_count": headers.get("x-replay-count", 0),
+        "trace_id": headers.get("x-trace-id"),
+        "payload": payload,
+    }
+
+
+async def _scan(channel: Any, filters: DLQFilter, limit: Optional[int], scan_limit: int):
+    """Lee mensajes de la DLQ sin ack. Genera (mensaje, payload, coincide)."""
+    queue = await channel.get_queue(DLQ_NAME)
+    matched = 0
+    for _ in range(scan_limit):
+        if limit is not None and matched >= limit:
+            return
+        message = await queue.get(no_ack=False, fail=False)
+        if message is None:
+            return
+        payload = _decode(message)
+        is_match = filters.matches(payload, dict(message.headers or {}), time.time())
+        matched += int(is_match)
+        yield message, payload, is_match
+
+
+async def inspect_dlq(
+    channel: Any,
+    filters: Optional[DLQFilter] = None,
+    limit: int = 50,
+    scan_limit: int = 10000,
+) -> List[Dict[str, Any]]:
+    """Lista los mensajes de la DLQ que cumplen los filtros; todos quedan en la DLQ"""
+    filters = filters or DLQFilter()
+    held: List[Any] = []
+    found: List[Dict[str, Any]] = []
+    try:
+        async for message, payload, is_match in _scan(channel, filters, limit, scan_limit):
+            held.append(message)
+            if is_match:
+                found.append(_summary(message, payload, time.time()))
+    finally:
+        # Los mensajes se retienen sin ack hasta el final: si se devolvieran de a uno,
+        # basic.get los entregaría otra vez en la misma pasada
+        for message in held:
+            await message.nack(requeue=True)
+    return found
+
+
+async def replay_dlq(
+    channel: Any,
+    filters: Optional[DLQFilter] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 50,
+    rate: float = 10.0,
+    dry_run: bool = False,
+    scan_limit: int = 10000,
+    progress: Optional[ReplayProgress] = None,
+    on_progress: Optional[Callable[[ReplayProgress], None]] = None,
+) -> ReplayProgress:
+    """Reenvía al exchange principal los mensajes de la DLQ que cumplen los filtros.
+
+    El canal debe tener publisher confirms activos (por defecto en aio_pika): cada
+    `publish` retorna cuando el broker confirmó, y recién entonces se hace ack en la DLQ.
+    """
+    filters = filters or DLQFilter()
+    progress = progress or ReplayProgress()
+    progress.dry_run = dry_run
+    exchange = await channel.get_exchange(EXCHANGE_NAME)
+    bucket = TokenBucket(rate, capacity=batch_size)
+    skipped: List[Any] = []
+    batch: List[Any] = []
+
+    async def _flush() -> None:
+        if not batch:
+            return
+        await bucket.acquire(len(batch))
+        results = await asyncio.gather(*(_replay_one(exchange, m) for m in batch), return_exceptions=True)
+        for message, result in zip(list(batch), results):
+            if isinstance(result, BaseException):
+                progress.failed += 1
+                progress.errors.append(f"{getattr(message, 'message_id', None)}: {result}")
+                await message.nack(requeue=True)
+            else:
+                progress.replayed += 1
+                await message.ack()
+            # Sale del lote apenas se resolvió: si un ack falla a mitad, el `finally` sólo
+            # devuelve a la cola los que faltan, nunca uno ya confirmado
+            batch.remove(message)
+        if on_progress is not None:
+            on_progress(progress)
+
+    try:
+        async for message, _, is_match in _scan(channel, filters, limit, scan_limit):
+            progress.scanned += 1
+            if not is_match or dry_run:
+                progress.matched += int(is_match)
+                skipped.append(message)
+                continue
+            progress.matched += 1
+            batch.append(message)
+            if len(batch) >= batch_size:
+                await _flush()
+        await _flush()
+    finally:
+        for message in batch + skipped:
+            await message.nack(requeue=True)
+        progress.finished = True
+        progress.finished_at = time.time()
+        if on_progress is not None:
+            on_progress(progress)
+    return progress
+
+
+async def inspect(filters: Optional[DLQFilter] = None, **options: Any) -> List[Dict[str, Any]]:
+    """`inspect_dlq` con una conexión propia al broker"""
+    async with _connection_channel() as channel:
+        return await inspect_dlq(channel, filters, **options)
+
+
+async def replay(filters: Optional[DLQFilter] = None, **options: Any) -> ReplayProgress:
+    """`replay_dlq` con una conexión propia al broker (con publisher confirms)"""
+    async with _connection_channel() as channel:
+        return await replay_dlq(channel, filters, **options)
+
+
+async def _replay_one(exchange: Any, message: Any) -> None:
+    headers = {k: v for k, v in dict(message.headers or {}).items() if k not in _RESET_HEADERS}
+    headers["x-replay-count"] = int(headers.get("x-replay-count", 0)) + 1
+    headers["x-replayed-at"] = time.time()
+    republished = build_raw_message(
+        message.body,
+        headers,
+        priority=getattr(message, "priority", None),
+        message_id=getattr(message, "message_id", None),
+        content_encoding=getattr(message, "content_encoding", None),
+    )
+    await exchange.publish(republished, routing_key=ROUTING_KEY)
+
+
+def _parse_args(argv: Optional[List[str]]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.dlq", description="Inspección y replay de la DLQ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("inspect", "replay"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--channel", help="email | sms | whatsapp | push")
+        cmd.add_argument("--error", help="texto contenido en el error (x-error)")
+        cmd.add_argument("--min-age", type=float, help="segundos mínimos desde el fallo")
+        cmd.add_argument("--max-age", type=float, help="segundos máximos desde el fallo")
+        cmd.add_argument("--limit", type=int, default=50 if name == "inspect" else None)
+        cmd.add_argument("--scan-limit", type=int, default=10000, help="mensajes máximos a leer de la DLQ")
+    replay = sub.choices["replay"]
+    replay.add_argument("--rate", type=float, default=10.0, help="mensajes por segundo")
+    replay.add_argument("--batch-size", type=int, default=50)
+    replay.add_argument("--dry-run", action="store_true", help="sólo contar, sin reenviar")
+    return parser.parse_args(argv)
+
+
+async def _run(args: argparse.Namespace) -> None:
+    filters = DLQFilter(channel=args.channel, error=args.error, min_age=args.min_age, max_age=args.max_age)
+    if args.command == "inspect":
+        for item in await inspect(filters, limit=args.limit, scan_limit=args.scan_limit):
+            print(json.dumps(item, ensure_ascii=False, default=str))
+        return
+
+    def _report(progress: ReplayProgress) -> None:
+        print(
+            f"leídos={progress.scanned} coinciden={progress.matched} "
+            f"reenviados={progress.replayed} fallidos={progress.failed}",
+            file=sys.stderr,
+        )
+
+    progress = await replay(
+        filters,
+        limit=args.limit,
+        batch_size=args.batch_size,
+        rate=args.rate,
+        dry_run=args.dry_run,
+        scan_limit=args.scan_limit,
+        on_progress=_report,
+    )
+    print(json.dumps(progress.to_dict(), ensure_ascii=False))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_run(_parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Registro de mensajes en vuelo del worker
+========================================
+
+Qué es este archivo:
+- Lleva la cuenta de los mensajes que el worker está procesando en este momento
+  (desde que se reciben hasta que se hace ack o se mandan a reintento/DLQ).
+- Sirve para dos cosas:
+  1) Apagado ordenado: al recibir SIGTERM el worker deja de consumir y espera a que
+     este registro quede vacío (con un tiempo máximo) antes de cerrar la conexión.
+  2) Diagnóstico: cuántos mensajes hay en vuelo y hace cuánto empezó cada uno
+     (`GET /inflight` en el endpoint de métricas del worker).
+"""
+
+import time
+import asyncio
+import itertools
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.worker_metrics import metrics
+
+
+class InFlightRegistry:
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def count(self) -> int:
+        return len(self._entries)
+
+    def oldest_age(self) -> float:
+        if not self._entries:
+            return 0.0
+        now = self._clock()
+        return max(now - e["started_at"] for e in self._entries.values())
+
+    @contextmanager
+    def track(self, **info: Any) -> Iterator[Dict[str, Any]]:
+        """Marca un mensaje como en vuelo mientras dura el bloque `with`.
+
+        El diccionario retornado puede enriquecerse durante el proceso (p. ej. canal o
+        etapa actual) y se verá en `describe()`.
+        """
+        entry_id = next(self._ids)
+        entry = dict(info, started_at=self._clock())
+        self._entries[entry_id] = entry
+        self._idle.clear()
+        self._publish()
+        try:
+            yield entry
+        finally:
+            self._entries.pop(entry_id, None)
+            if not self._entries:
+                self._idle.set()
+            self._publish()
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que no quede nada en vuelo; retorna False si venció el tiempo"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def describe(self) -> List[Dict[str, Any]]:
+        now = self._clock()
+        return [
+            {**{k: v for k, v in e.items() if k != "started_at"}, "age_seconds": round(now - e["started_at"], 3)}
+            for e in sorted(self._entries.values(), key=lambda e: e["started_at"])
+        ]
+
+    def _publish(self) -> None:
+        metrics.set_gauge("worker_inflight_messages", self.count)
+        metrics.set_gauge("worker_inflight_oldest_seconds", self.oldest_age())
+
+
+# Registro global del proceso worker
+inflight = InFlightRegistry()
@@ -3,8 +3,8 @@ from fastapi import FastAPI, Body, HTTPException, Depends, Request, Query
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.middleware.base import BaseHTTPMiddleware
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Any, Dict, Literal, Optional, Union
 import asyncio
 import logging
 import structlog
@@ -23,6 +23,7 @@ def try_configure_logging(service_name: str, env: str = "dev") -> None:
         logging.basicConfig(level=logging.INFO, stream=sys.stdout)
 
 from .messaging import publish_message, setup_infrastructure
+from .priority import resolve_priority
 from .db import get_db, create_tables, init_default_channels, init_default_user
 from .auth import (
     create_access_token,
@@ -30,18 +31,33 @@ from .auth import (
     get_user_by_username,
     get_user_by_email,
     verify_token,
+    verify_admin,
     create_user,
 )
 from .models import NotificationChannel, TokenResponse
-from .schemas import NotificationFilter, NotificationCreate, MultiChannelNotification
+from .schemas import NotificationFilter, NotificationCreate, MultiChannelNotification, DLQReplayRequest
+from . import dlq
 from .crud import list_channels, list_notifications, get_notification, create_notification, get_metrics, list_schedules, get_schedule, cancel_schedule
 
 
 class NotifyPayload(BaseModel):
     channel: str = Field(..., description="Canal de envío (email, sms, whatsapp, push)")
     destination: str = Field(..., description="Destino del mensaje")
-    message: str = Field(..., min_length=1, description="Mensaje a enviar")
+    message: Optional[str] = Field(None, min_length=1, description="Mensaje a enviar")
     subject: Optional[str] = Field(None, description="Asunto (para email/push)")
+    template: Optional[str] = Field(None, description="Plantilla de email (app/templates) que renderiza el worker")
+    context: Optional[Dict[str, Any]] = Field(None, description="Variables de la plantilla")
+    priority: Optional[Union[Literal["high", "normal", "low"], int]] = Field(
+        None, description="Prioridad en la cola: high (alertas, OTP), normal o low (campañas)"
+    )
+
+    @model_validator(mode="after")
+    def check_content(self):
+        if not self.message and not self.template:
+            raise ValueError("Se requiere `message` o `template`")
+        if self.template and self.channel != "email":
+            raise ValueError("`template` sólo se admite en el canal email")
+        return self
     
     class Config:
         # Configurar para manejar caracteres especiales correctamente
@@ -165,11 +181,13 @@ async def notify(request: Request) -> dict:
         import json
         payload_dict = json.loads(body_str)
         
-        # Validar que tenga los campos requeridos
-        required_fields = ['channel', 'destination', 'message']
+        # Validar que tenga los campos requeridos (el HTML del email puede venir como plantilla)
+        required_fields = ['channel', 'destination', 'template' if 'template' in payload_dict else 'message']
         for field in required_fields:
             if field not in payload_dict:
                 raise HTTPException(status_code=400, detail=f"Campo requerido faltante: {field}")
+        if 'template' in payload_dict and payload_dict['channel'] != 'email':
+            raise HTTPException(status_code=400, detail="`template` sólo se admite en el canal email")
         
         # Normalizar strings para manejar caracteres especiales
         for key, value in payload_dict.items():
@@ -177,8 +195,13 @@ async def notify(request: Request) -> dict:
                 # Normalizar el string para manejar caracteres especiales
                 payload_dict[key] = value.encode('utf-8', errors='ignore').decode('utf-8')
         
-        await publish_message(routing_key="notifications.key", payload=payload_dict)
-        return {"queued": True}
+        try:
+            resolve_priority(payload_dict)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        trace_id = await publish_message(routing_key="notifications.key", payload=payload_dict)
+        return {"queued": True, "trace_id": trace_id}
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=400, detail=f"JSON inválido: {str(e)}")
     except HTTPException:
@@ -199,8 +222,8 @@ async def notify_multi(request: Request) -> dict:
         import json
         payload_dict = json.loads(body_str)
         
-        # Validar que tenga los campos requeridos
-        required_fields = ['destination', 'message']
+        # Validar que tenga los campos requeridos (el HTML del email puede venir como plantilla)
+        required_fields = ['destination', 'template' if 'template' in payload_dict else 'message']
         for field in required_fields:
             if field not in payload_dict:
                 raise HTTPException(status_code=400, detail=f"Campo requerido faltante: {field}")
@@ -218,10 +241,16 @@ async def notify_multi(request: Request) -> dict:
         
         payload_dict = normalize_strings(payload_dict)
         
-        await publish_message(routing_key="notifications.key", payload=payload_dict)
+        try:
+            resolve_priority(payload_dict)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        trace_id = await publish_message(routing_key="notifications.key", payload=payload_dict)
         return {
             "queued": True, 
-            "message": "Notificación encolada para múltiples canales"
+            "message": "Notificación encolada para múltiples canales",
+            "trace_id": trace_id,
         }
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=400, detail=f"JSON inválido: {str(e)}")
@@ -234,8 +263,8 @@ async def notify_multi(request: Request) -> dict:
 async def send_notification(payload: NotifyPayload, user_id: str = Depends(verify_token)):
     """Endpoint protegido que requiere autenticación JWT"""
     try:
-        await publish_message(routing_key="notifications.key", payload=payload.model_dump())
-        return {"status": "ok", "sent_by": user_id, "queued": True}
+        trace_id = await publish_message(routing_key="notifications.key", payload=payload.model_dump())
+        return {"status": "ok", "sent_by": user_id, "queued": True, "trace_id": trace_id}
     except Exception as exc:
         raise HTTPException(status_code=500, detail=str(exc))
 
@@ -248,13 +277,17 @@ async def send_multi_notification(payload: MultiChannelNotification, user_id: st
             "destination": payload.destination.model_dump(),
             "message": payload.message.model_dump(),
             "subject": payload.subject,
-            "metadata": payload.metadata
+            "template": payload.template,
+            "context": payload.context,
+            "metadata": payload.metadata,
+            "priority": payload.priority,
         }
-        await publish_message(routing_key="notifications.key", payload=worker_payload)
+        trace_id = await publish_message(routing_key="notifications.key", payload=worker_payload)
         return {
             "status": "ok", 
             "sent_by": user_id, 
             "queued": True,
+            "trace_id": trace_id,
             "channels": payload.destination.get_active_channels(),
             "message_channels": payload.message.get_active_channels()
         }
@@ -262,6 +295,92 @@ async def send_multi_notification(payload: MultiChannelNotification, user_id: st
         raise HTTPException(status_code=500, detail=str(exc))
 
 
+# Administración de la DLQ (ver app/dlq.py)
+
+# Replays en curso o terminados de ESTE proceso: id -> avance. El registro vive en
+# memoria, así que el `replay_id` sólo se puede consultar en la misma réplica del API que
+# lo inició. Los terminados se descartan pasados DLQ_REPLAY_TTL segundos y nunca se
+# guardan más de DLQ_REPLAY_MAX (si están todos en curso, no se aceptan más).
+DLQ_REPLAY_TTL = float(os.getenv("DLQ_REPLAY_TTL", "3600"))
+DLQ_REPLAY_MAX = int(os.getenv("DLQ_REPLAY_MAX", "100"))
+_dlq_replays: Dict[str, dlq.ReplayProgress] = {}
+_dlq_replay_tasks: set = set()
+
+
+def _prune_dlq_replays(now: Optional[float] = None) -> None:
+    """Descarta los replays terminados vencidos y, si sobran, los terminados más viejos"""
+    now = time.time() if now is None else now
+    finished = [rid for rid, progress in _dlq_replays.items() if progress.finished]
+    for replay_id in finished:
+        progress = _dlq_replays[replay_id]
+        if now - (progress.finished_at or progress.started_at) > DLQ_REPLAY_TTL:
+            del _dlq_replays[replay_id]
+    finished = [rid for rid in finished if rid in _dlq_replays]
+    while len(_dlq_replays) >= DLQ_REPLAY_MAX and finished:
+        del _dlq_replays[finished.pop(0)]
+
+
+@v1_router.get("/admin/dlq")
+async def admin_inspect_dlq(
+    channel: Optional[str] = Query(None),
+    error: Optional[str] = Query(None),
+    min_age: Optional[float] = Query(None, ge=0),
+    max_age: Optional[float] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+    user_id: str = Depends(verify_admin),
+):
+    """Lista mensajes de la DLQ que cumplen los filtros (no los saca de la cola)"""
+    filters = dlq.DLQFilter(channel=channel, error=error, min_age=min_age, max_age=max_age)
+    try:
+        items = await dlq.inspect(filters, limit=limit)
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=str(exc))
+    return {"count": len(items), "items": items}
+
+
+@v1_router.post("/admin/dlq/replay")
+async def admin_replay_dlq(payload: DLQReplayRequest, user_id: str = Depends(verify_admin)):
+    """Inicia en segundo plano el reenvío de la DLQ; el avance se consulta por su id en esta réplica"""
+    _prune_dlq_replays()
+    if len(_dlq_replays) >= DLQ_REPLAY_MAX:
+        raise HTTPException(status_code=429, detail="Too many DLQ replays in progress")
+    filters = dlq.DLQFilter(channel=payload.channel, error=payload.error, min_age=payload.min_age, max_age=payload.max_age)
+    replay_id = os.urandom(6).hex()
+    progress = dlq.ReplayProgress()
+    _dlq_replays[replay_id] = progress
+
+    async def _run() -> None:
+        try:
+            await dlq.replay(
+                filters,
+                limit=payload.limit,
+                batch_size=payload.batch_size,
+                rate=payload.rate,
+                dry_run=payload.dry_run,
+                progress=progress,
+            )
+        except Exception as exc:
+            progress.errors.append(str(exc))
+            progress.finished = True
+            progress.finished_at = time.time()
+            log.error("dlq_replay_error", replay_id=replay_id, error=str(exc))
+
+    task = asyncio.create_task(_run())
+    _dlq_replay_tasks.add(task)
+    task.add_done_callback(_dlq_replay_tasks.discard)
+    log.info("dlq_replay_started", replay_id=replay_id, requested_by=user_id)
+    return {"replay_id": replay_id, "progress": progress.to_dict()}
+
+
+@v1_router.get("/admin/dlq/replay/{replay_id}")
+async def admin_replay_status(replay_id: str, user_id: str = Depends(verify_admin)):
+    _prune_dlq_replays()
+    progress = _dlq_replays.get(replay_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Replay not found")
+    return {"replay_id": replay_id, "progress": progress.to_dict()}
+
+
 # FASE 5 - Endpoints de consulta y gestión
 
 @app.get("/channels")
@@ -1,10 +1,16 @@
 import os
 import json
+import uuid
 import asyncio
 from contextlib import asynccontextmanager
 
 import aio_pika
 
+from app import blob_store
+from app.codec import encode_body
+from app.priority import MAX_PRIORITY, resolve_priority
+from app.tracing import TRACE_HEADER, trace_headers
+
 
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "localhost")
 RABBITMQ_PORT = int(os.getenv("RABBITMQ_PORT", "5672"))
@@ -17,6 +23,7 @@ EXCHANGE_TYPE = os.getenv("AMQP_EXCHANGE_TYPE", "direct").lower()  # "direct" |
 QUEUE_NAME = os.getenv("AMQP_QUEUE", "notifications.queue")
 ROUTING_KEY = os.getenv("AMQP_ROUTING_KEY", "notifications.key")
 DECLARE_INFRA = os.getenv("MESSAGING_DECLARE_INFRA", "true").lower() == "true"
+QUARANTINE_NAME = os.getenv("AMQP_QUARANTINE_EXCHANGE", f"{EXCHANGE_NAME}.quarantine")
 
 
 @asynccontextmanager
@@ -25,8 +32,8 @@ async def _connection_channel():
     url = f"amqp://{RABBITMQ_USERNAME}:{RABBITMQ_PASSWORD}@{RABBITMQ_HOST}:{RABBITMQ_PORT}/{RABBITMQ_VHOST}"
     connection = await aio_pika.connect_robust(url)
     try:
+        # Canal sólo para publicar: el prefetch (basic.qos) no aplica y se ahorra la ida y vuelta
         channel = await connection.channel()
-        await channel.set_qos(prefetch_count=10)
         yield channel
     finally:
         await connection.close()
@@ -49,23 +56,43 @@ async def setup_infrastructure() -> None:
         dlq = await channel.declare_queue(f"{QUEUE_NAME}.dlq", durable=True)
         await dlq.bind(dlx)
 
-        # Cola principal con dead-letter exchange configurado
-        queue = await channel.declare_queue(
-            QUEUE_NAME,
-            durable=True,
-            arguments={
-                "x-dead-letter-exchange": f"{EXCHANGE_NAME}.dlx",
-            },
-        )
+        # Cuarentena para mensajes inválidos (JSON roto, canal desconocido): sin reintentos
+        quarantine = await channel.declare_exchange(QUARANTINE_NAME, aio_pika.ExchangeType.FANOUT, durable=True)
+        quarantine_queue = await channel.declare_queue(f"{QUEUE_NAME}.quarantine", durable=True)
+        await quarantine_queue.bind(quarantine)
+
+        # Cola principal con dead-letter exchange configurado (y prioridades si aplica)
+        arguments = {"x-dead-letter-exchange": f"{EXCHANGE_NAME}.dlx"}
+        if MAX_PRIORITY > 0:
+            arguments["x-max-priority"] = MAX_PRIORITY
+        queue = await channel.declare_queue(QUEUE_NAME, durable=True, arguments=arguments)
         await queue.bind(exchange, ROUTING_KEY)
 
 
-async def publish_message(routing_key: str, payload: dict) -> None:
+async def publish_message(routing_key: str, payload: dict) -> str:
+    """Publica el payload y retorna el trace id con el que se puede seguir su latencia"""
+    headers = trace_headers()
     async with _connection_channel() as channel:
         # Usar el exchange existente sin redeclararlo para evitar conflictos con definiciones pre-cargadas
         exchange = await channel.get_exchange(EXCHANGE_NAME)
+        # message_id estable: el worker lo usa para no duplicar filas ni envíos en reintentos/reentregas
+        message_id = uuid.uuid4().hex
+        priority = resolve_priority(payload)
+        # Textos muy grandes: se guardan en el almacén de blobs y el campo lleva sólo la referencia
+        payload = blob_store.check_in_payload(payload, owner=message_id)
         body = json.dumps(payload).encode("utf-8")
-        message = aio_pika.Message(body=body, content_type="application/json", delivery_mode=aio_pika.DeliveryMode.PERSISTENT)
+        # Los cuerpos grandes (HTML de email) se comprimen; el worker descomprime según content_encoding
+        body, content_encoding = encode_body(body)
+        message = aio_pika.Message(
+            body=body,
+            content_type="application/json",
+            content_encoding=content_encoding,
+            delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            message_id=message_id,
+            priority=priority,
+            headers=headers,
+        )
         await exchange.publish(message, routing_key=routing_key)
+    return headers[TRACE_HEADER]
 
 
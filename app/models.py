@@ -13,6 +13,7 @@ Base = declarative_base()
 #Enum para los estados de la notificacion
 class NotificationStatus(str, enum.Enum):
     PENDING = "pending"
+    PROCESSING = "processing" #un worker la tomó y la está enviando
     SENT = "sent"
     FAILED = "failed"
     SCHEDULED = "scheduled"
@@ -47,6 +48,10 @@ class Notification(Base):
     retry_count = Column(Integer, default=0) #cantidad de reintentos de envio de la notificacion
     error_message = Column(Text, nullable=True) #mensaje de error en caso de fallo
     cost = Column(String(20), nullable=True) #costo de la notificacion 
+    dedup_key = Column(String(100), unique=True, nullable=True, index=True) #"<message_id>:<canal>", evita duplicar filas/envios en reintentos
+    claimed_at = Column(DateTime(timezone=True), nullable=True) #cuando un worker la pasó a PROCESSING (para detectar envíos abandonados)
+    trace_id = Column(String(64), nullable=True, index=True) #id de traza asignado al encolar (cabecera x-trace-id)
+    timings = Column(Text, nullable=True) #JSON con los segundos de cada etapa (cola, decode, BD, proveedor...)
 
 #Modelo para la tabla de canales disponibles
 class NotificationChannelConfig(Base):
@@ -0,0 +1,54 @@
+"""
+Mensajes venenosos (poison messages) y cuarentena
+=================================================
+
+Qué es este archivo:
+- Un mensaje con JSON inválido, un canal desconocido o un destino que no pasa la
+  validación va a fallar igual en cada intento. Mandarlo por la escalera de reintentos
+  (5s, 30s, 120s) sólo gasta cuatro idas y vueltas al broker antes de llegar a la DLQ.
+- El worker clasifica cada error:
+  - `PoisonMessageError` (o un error al decodificar el cuerpo): el mensaje es inválido
+    por estructura y va directo a la cola de cuarentena `notifications.queue.quarantine`,
+    con los bytes originales y el motivo en la cabecera `x-quarantine-reason`.
+  - Cualquier otro error se considera transitorio y entra a la escalera de reintentos.
+- `PoisonMessageError` hereda de `ValueError`: el circuit breaker y el control de
+  concurrencia ya tratan los `ValueError` como errores de datos, no del proveedor.
+"""
+
+import json
+from typing import Optional
+
+from app.blob_store import BlobNotFoundError
+from app.codec import CodecError
+
+REASON_HEADER = "x-quarantine-reason"
+
+# Motivos de cuarentena (valor de la cabecera `x-quarantine-reason`)
+INVALID_JSON = "invalid_json"
+INVALID_ENCODING = "invalid_encoding"
+MISSING_BLOB = "missing_blob"
+INVALID_PAYLOAD = "invalid_payload"
+UNKNOWN_CHANNEL = "unknown_channel"
+VALIDATION = "validation"
+INVALID_TEMPLATE = "invalid_template"
+
+
+class PoisonMessageError(ValueError):
+    """El mensaje no puede procesarse nunca tal como está: no se reintenta"""
+
+    def __init__(self, reason: str, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+
+
+def classify(exc: BaseException) -> Optional[str]:
+    """Motivo de cuarentena si el error es permanente; None si vale la pena reintentar"""
+    if isinstance(exc, PoisonMessageError):
+        return exc.reason
+    if isinstance(exc, CodecError):
+        return INVALID_ENCODING
+    if isinstance(exc, BlobNotFoundError):
+        return MISSING_BLOB
+    if isinstance(exc, (UnicodeDecodeError, json.JSONDecodeError)):
+        return INVALID_JSON
+    return None
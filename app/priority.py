@@ -0,0 +1,66 @@
+"""
+Prioridad de los mensajes encolados
+===================================
+
+Qué es este archivo:
+- Con una sola cola FIFO, una alerta de seguridad o un OTP por SMS esperan detrás de
+  todo el backlog de una campaña masiva (p. ej. `promotion.html` a un millón de usuarios).
+- Con `AMQP_MAX_PRIORITY` > 0 la cola principal se declara con `x-max-priority` y cada
+  mensaje lleva la propiedad AMQP `priority`: RabbitMQ entrega primero los de mayor
+  prioridad aunque haya miles de mensajes de menor prioridad esperando.
+- Está apagado por defecto: RabbitMQ no deja cambiar los argumentos de una cola
+  existente, y redeclarar `notifications.queue` con `x-max-priority` falla con
+  PRECONDITION_FAILED (API y worker no arrancan). Se activa al crear la cola de cero.
+- Este módulo traduce el campo `priority` del payload ("high" | "normal" | "low" o un
+  entero) al valor numérico que se publica. Lo usan el API, el scheduler y el worker
+  (los reintentos conservan la prioridad original).
+
+Variables de entorno:
+- AMQP_MAX_PRIORITY: prioridad máxima de la cola principal (0 = sin prioridades, por
+  defecto; 10 recomendado para colas nuevas).
+"""
+
+import os
+from typing import Any, Dict, Optional, Union
+
+MAX_PRIORITY = int(os.getenv("AMQP_MAX_PRIORITY", "0"))
+
+PRIORITY_LEVELS: Dict[str, int] = {
+    "high": 9,
+    "normal": 5,
+    "low": 1,
+}
+DEFAULT_PRIORITY = "normal"
+
+# Prioridad por defecto según la plantilla, si el payload no la indica
+TEMPLATE_PRIORITIES: Dict[str, str] = {
+    "security_alert": "high",
+    "promotion": "low",
+}
+
+
+def resolve_priority(payload: Dict[str, Any]) -> Optional[int]:
+    """Prioridad AMQP del payload; None si la cola no usa prioridades.
+
+    Raises:
+        ValueError: si `priority` no es un nivel conocido ni un entero válido
+    """
+    if MAX_PRIORITY <= 0:
+        return None
+    value: Union[str, int, None] = payload.get("priority")
+    if value is None:
+        template = str(payload.get("template") or "").rsplit("/", 1)[-1].split(".", 1)[0]
+        value = TEMPLATE_PRIORITIES.get(template, DEFAULT_PRIORITY)
+    if isinstance(value, str) and not value.strip().isdigit():
+        level = value.strip().lower()
+        if level not in PRIORITY_LEVELS:
+            raise ValueError(f"Prioridad no soportada: {value} (usa high, normal o low)")
+        number = PRIORITY_LEVELS[level]
+    else:
+        try:
+            number = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Prioridad no soportada: {value}")
+        if number < 0:
+            raise ValueError(f"Prioridad no puede ser negativa: {value}")
+    return min(number, MAX_PRIORITY)
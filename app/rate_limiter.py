@@ -0,0 +1,155 @@
+"""
+Rate limiting por proveedor (token bucket)
+==========================================
+
+Qué es este archivo:
+- Twilio y los relays SMTP limitan cuántos mensajes por segundo aceptan. Si los
+  superamos, el envío falla y el mensaje entra en la escalera de reintentos
+  (5s/30s/120s), multiplicando la carga.
+- Aquí implementamos un "token bucket": cada envío consume un token; los tokens se
+  recargan a `rate` por segundo hasta un máximo `burst`. Si no hay token disponible,
+  el worker espera lo justo en vez de fallar.
+
+Configuración (JSON de `NotificationChannelConfig.config`):
+- rate_limit_per_second: tokens/seg para todo el proveedor (p. ej. la cuenta Twilio).
+- rate_limit_burst: capacidad del bucket del proveedor (por defecto = rate).
+- sender_rate_limit_per_second: tokens/seg por remitente (número o email de origen).
+- sender_rate_limit_burst: capacidad del bucket por remitente (por defecto = rate).
+Si una clave no existe o es 0, ese nivel no se limita.
+
+Varios procesos worker (`python -m app.supervisor`): cada proceso tiene sus propios
+buckets, así que sin más el límite efectivo sería `rate` × procesos. El supervisor pasa
+a cada hijo WORKER_RATE_LIMIT_PROCESSES (= WORKER_PROCESSES) y cada proceso usa la parte
+que le toca: `rate` y `burst` divididos por ese número (por defecto 1, un solo proceso).
+Si se lanzan varios `python -m app.worker` a mano, hay que definirla igual en todos.
+
+Los SMS consumen un token por segmento (Twilio mide el throughput de cada número en
+segmentos por segundo): un mensaje UCS-2 de tres segmentos gasta tres tokens.
+"""
+
+import os
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.worker_metrics import metrics
+
+# Procesos que comparten cada límite configurado (el supervisor lo fija en sus hijos)
+RATE_LIMIT_PROCESSES = max(1, int(os.getenv("WORKER_RATE_LIMIT_PROCESSES", "1")))
+
+
+class TokenBucket:
+    """Token bucket con reservas: los que llegan primero salen primero.
+
+    `acquire` descuenta el token de inmediato (el saldo puede quedar negativo) y duerme
+    el tiempo necesario para cubrir la deuda, de modo que los envíos quedan espaciados
+    uniformemente a `rate` por segundo.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if rate <= 0:
+            raise ValueError("rate debe ser mayor que 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else float(rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+
+    @property
+    def tokens(self) -> float:
+        """Tokens disponibles ahora mismo (negativo si hay envíos esperando)"""
+        self._refill()
+        return self._tokens
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Reserva tokens y retorna cuántos segundos hay que esperar para usarlos"""
+        self._refill()
+        self._tokens -= tokens
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """Espera hasta disponer de `tokens`; retorna los segundos esperados"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def process_share(value: float) -> float:
+    """Parte de un límite global (tokens/seg o ráfaga) que corresponde a este proceso"""
+    return value / RATE_LIMIT_PROCESSES
+
+
+def _limit_from_config(config: Dict[str, Any], prefix: str) -> Optional[Tuple[float, Optional[float]]]:
+    """(rate, burst) de este proceso según la config del canal, o None si no se limita"""
+    try:
+        rate = float(config.get(f"{prefix}rate_limit_per_second") or 0)
+        burst = config.get(f"{prefix}rate_limit_burst")
+        burst = float(burst) if burst else None
+    except (TypeError, ValueError):
+        return None
+    if rate <= 0:
+        return None
+    return process_share(rate), burst and process_share(burst)
+
+
+class RateLimiterRegistry:
+    """Mantiene un bucket por proveedor y otro por remitente"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def _bucket(self, key: str, rate: float, burst: Optional[float]) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        capacity = burst or rate
+        # Si la configuración cambió, recrear el bucket con los nuevos valores
+        if bucket is None or bucket.rate != rate or bucket.capacity != capacity:
+            bucket = TokenBucket(rate, capacity)
+            self._buckets[key] = bucket
+        return bucket
+
+    async def acquire(
+        self,
+        provider: str,
+        config: Dict[str, Any],
+        sender: Optional[str] = None,
+        tokens: float = 1.0,
+    ) -> float:
+        """Espera el turno de envío para `provider` (y `sender` si aplica).
+
+        `tokens` es lo que cuesta el envío (1 por mensaje, o sus segmentos en SMS).
+        Retorna el tiempo total esperado en segundos.
+        """
+        waited = 0.0
+        levels = [(f"provider:{provider}", _limit_from_config(config, ""), {"provider": provider})]
+        if sender:
+            levels.append((
+                f"sender:{provider}:{sender}",
+                _limit_from_config(config, "sender_"),
+                {"provider": provider, "sender": sender},
+            ))
+
+        for key, limit, labels in levels:
+            if limit is None:
+                continue
+            bucket = self._bucket(key, *limit)
+            wait = await bucket.acquire(tokens)
+            waited += wait
+            metrics.observe("rate_limiter_wait_seconds", wait, **labels)
+            metrics.set_gauge("rate_limiter_tokens_available", bucket.tokens, **labels)
+            if wait > 0:
+                metrics.inc("rate_limiter_throttled_total", **labels)
+        return waited
+
+
+# Registro global usado por el worker
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,112 @@
+"""
+Ruteo de reintentos y DLQ del worker
+====================================
+
+Qué es este archivo:
+- Antes, cada mensaje fallido hacía `declare_exchange` (exchange de reintento) o
+  `get_exchange` (DLX) contra el broker: una ida y vuelta extra justo cuando el sistema
+  está bajo estrés.
+- `RetryRouter` resuelve todos los exchanges una sola vez al arrancar (al declarar la
+  topología) y luego sólo publica. También centraliza la construcción de
+  `aio_pika.Message` para que todos los mensajes salgan con las mismas propiedades.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import aio_pika
+
+from app.codec import encode_payload
+from app.priority import resolve_priority
+from app.retry_scheduler import DelayedRetryScheduler
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(payload: Dict[str, Any], headers: Optional[Dict[str, Any]] = None, **properties: Any) -> aio_pika.Message:
+    """Construye un mensaje JSON persistente con las cabeceras indicadas"""
+    # Los reintentos y la DLQ conservan la prioridad con la que se encoló el mensaje
+    if "priority" not in properties:
+        try:
+            properties["priority"] = resolve_priority(payload)
+        except ValueError:
+            properties["priority"] = None
+    # Los reintentos y la DLQ también viajan comprimidos si el cuerpo es grande
+    body, content_encoding = encode_payload(payload)
+    properties.setdefault("content_encoding", content_encoding)
+    return build_raw_message(body, headers, **properties)
+
+
+def build_raw_message(body: bytes, headers: Optional[Dict[str, Any]] = None, **properties: Any) -> aio_pika.Message:
+    """Igual que `build_message` pero con el cuerpo ya serializado"""
+    properties.setdefault("content_type", "application/json")
+    # Conservar el id estable del mensaje en reintentos y DLQ
+    if headers and headers.get("x-message-id"):
+        properties.setdefault("message_id", headers["x-message-id"])
+    return aio_pika.Message(
+        body=body,
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        headers=headers,
+        **properties,
+    )
+
+
+class RetryRouter:
+    """Publica en el exchange principal, en los de reintento o en la DLX ya resueltos.
+
+    - Con infraestructura completa (`retry_exchanges` no vacío) el reintento N va al
+      exchange `<exchange>.retry.N`, cuya cola con TTL lo devuelve al principal.
+    - En modo compatibilidad (`retry_exchanges` vacío) se usa el `scheduler` en memoria.
+    """
+
+    def __init__(
+        self,
+        main_exchange: aio_pika.abc.AbstractExchange,
+        dlx: aio_pika.abc.AbstractExchange,
+        routing_key: str,
+        retry_delays: List[int],
+        retry_exchanges: Optional[Dict[int, aio_pika.abc.AbstractExchange]] = None,
+        scheduler: Optional[DelayedRetryScheduler] = None,
+        quarantine: Optional[aio_pika.abc.AbstractExchange] = None,
+    ):
+        self.main_exchange = main_exchange
+        self.dlx = dlx
+        self.routing_key = routing_key
+        self.retry_delays = retry_delays
+        self.retry_exchanges = retry_exchanges or {}
+        self.scheduler = scheduler
+        self.quarantine = quarantine
+
+    async def publish_main(self, payload: Dict[str, Any], headers: Dict[str, Any]) -> None:
+        await self.main_exchange.publish(build_message(payload, headers), routing_key=self.routing_key)
+
+    async def publish_retry(self, retry_index: int, payload: Dict[str, Any], headers: Dict[str, Any]) -> None:
+        exchange = self.retry_exchanges.get(retry_index)
+        if exchange is not None:
+            await exchange.publish(build_message(payload, headers), routing_key=self.routing_key)
+            return
+        # Modo compatibilidad: el scheduler retiene el mensaje y lo republica al exchange
+        # principal cuando vence la espera, sin bloquear el consumo
+        retry_delay = self.retry_delays[max(0, min(retry_index, len(self.retry_delays)) - 1)]
+        if self.scheduler is not None and self.scheduler.schedule(retry_delay, payload, headers):
+            return
+        # Sin scheduler o con el límite de retenidos alcanzado: devolver al broker ya mismo.
+        # Sin cola con TTL (ni plugin x-delay) el broker no puede aplazarlo, así que vuelve
+        # sin espera y no consume el intento: con `retry_index - 1` el próximo fallo pide el
+        # mismo reintento en lugar de acercar el mensaje a la DLQ
+        logger.warning("Reintento devuelto al broker sin espera (scheduler lleno o no disponible)")
+        await self.publish_main(payload, {**headers, "x-retry-count": retry_index - 1})
+
+    async def publish_dlq(self, payload: Dict[str, Any], headers: Dict[str, Any]) -> None:
+        # Usar routing_key vacío por compatibilidad con fanout; para topic/direct no afecta si no hay bindings específicos
+        await self.dlx.publish(build_message(payload, headers), routing_key="")
+
+    async def publish_quarantine(self, body: bytes, headers: Dict[str, Any], **properties: Any) -> None:
+        """Publica los bytes originales de un mensaje inválido (sin exchange de cuarentena, a la DLX)"""
+        exchange = self.quarantine if self.quarantine is not None else self.dlx
+        await exchange.publish(build_raw_message(body, headers, **properties), routing_key="")
+
+    async def close(self) -> None:
+        """Republica los reintentos retenidos en memoria (modo compatibilidad)"""
+        if self.scheduler is not None:
+            await self.scheduler.stop()
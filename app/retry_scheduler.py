@@ -0,0 +1,110 @@
+"""
+Reintentos diferidos en memoria (modo compatibilidad)
+=====================================================
+
+Qué es este archivo:
+- Con WORKER_DECLARE_INFRA=false no existen las colas de reintento con TTL, así que el
+  worker tenía que esperar (`asyncio.sleep`) hasta 120s dentro del bucle de consumo:
+  un solo mensaje fallido congelaba todo el worker.
+- `DelayedRetryScheduler` guarda los mensajes a reintentar en un heap ordenado por
+  hora de vencimiento y los republica cuando toca, en una tarea aparte, sin bloquear
+  el consumo.
+
+Límite de memoria:
+- Como mucho `max_held` mensajes quedan retenidos. Si se supera, `schedule()` retorna
+  False y el llamador debe devolver el mensaje al broker de inmediato ("spill"), sin
+  contar ese reintento (ver `RetryRouter.publish_retry`).
+- Al detener el worker, `stop()` republica todo lo retenido para no perder mensajes.
+"""
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.worker_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PublishFn = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[None]]
+
+# Espera antes de volver a intentar una republicación que falló (p. ej. broker reconectando)
+REPUBLISH_BACKOFF_SECONDS = 1.0
+
+
+class DelayedRetryScheduler:
+    def __init__(self, publish: PublishFn, max_held: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self._publish = publish
+        self.max_held = max_held
+        self._clock = clock
+        self._heap: List[Tuple[float, int, Dict[str, Any], Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def held(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, delay: float, payload: Dict[str, Any], headers: Dict[str, Any]) -> bool:
+        """Retiene el mensaje `delay` segundos. Retorna False si se alcanzó el límite."""
+        if len(self._heap) >= self.max_held:
+            metrics.inc("retry_scheduler_spilled_total")
+            return False
+        due = self._clock() + delay
+        # Si el nuevo mensaje vence antes que el primero actual, despertar el bucle
+        if not self._heap or due < self._heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self._heap, (due, next(self._seq), payload, headers))
+        metrics.set_gauge("retry_scheduler_held", len(self._heap))
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, flush: bool = True) -> None:
+        """Detiene el bucle; con `flush` republica de inmediato lo que quede retenido"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if flush:
+            while self._heap:
+                _, _, payload, headers = heapq.heappop(self._heap)
+                try:
+                    await self._publish(payload, headers)
+                except Exception as e:
+                    logger.error(f"Reintento retenido perdido al detener el worker: {e}")
+            metrics.set_gauge("retry_scheduler_held", 0)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, self._heap[0][0] - self._clock())
+            if timeout != 0.0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            await self._release_due()
+
+    async def _release_due(self) -> None:
+        now = self._clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, payload, headers = heapq.heappop(self._heap)
+            try:
+                await self._publish(payload, headers)
+                metrics.inc("retry_scheduler_released_total")
+            except Exception as e:
+                logger.error(f"Error republicando reintento diferido: {e}")
+                heapq.heappush(self._heap, (now + REPUBLISH_BACKOFF_SECONDS, next(self._seq), payload, headers))
+                break
+        metrics.set_gauge("retry_scheduler_held", len(self._heap))
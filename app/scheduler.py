@@ -23,7 +23,7 @@ Variables de entorno útiles:
 """
 
 import os
-import json
+import uuid
 import asyncio
 import logging
 from datetime import datetime, timedelta, timezone
@@ -33,6 +33,10 @@ from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.date import DateTrigger
 import aio_pika
 
+from app.codec import encode_payload
+from app.priority import resolve_priority
+from app.tracing import trace_headers
+
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
@@ -55,11 +59,15 @@ async def _publish(payload: Dict[str, Any]) -> None:
         channel = await connection.channel()
         # Obtener el exchange existente sin declararlo (evita conflictos de tipo/parámetros)
         exchange = await channel.get_exchange(EXCHANGE_NAME)
-        body = json.dumps(payload).encode("utf-8")
+        body, content_encoding = encode_payload(payload)
         message = aio_pika.Message(
             body=body,
             content_type="application/json",
+            content_encoding=content_encoding,
             delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            message_id=uuid.uuid4().hex,
+            priority=resolve_priority(payload),
+            headers=trace_headers(),
         )
         await exchange.publish(message, routing_key=ROUTING_KEY)
         logger.info("Publicada notificación programada")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Optional, Literal, List
+from typing import Optional, Literal, List, Union
 from datetime import datetime
 from pydantic import BaseModel, Field, EmailStr, validator
 from pydantic import ConfigDict
@@ -93,9 +93,14 @@ class MultiChannelMessage(BaseModel):
 class MultiChannelNotification(BaseModel):
     """Notificación que puede enviarse por múltiples canales con mensajes específicos"""
     destination: MultiChannelDestination = Field(..., description="Destinos por canal")
-    message: MultiChannelMessage = Field(..., description="Mensajes específicos por canal")
+    message: MultiChannelMessage = Field(default_factory=MultiChannelMessage, description="Mensajes específicos por canal")
     subject: Optional[str] = Field(None, description="Asunto (para email/push)")
+    template: Optional[str] = Field(None, description="Plantilla del email (app/templates); reemplaza a message.email")
+    context: Optional[dict] = Field(None, description="Variables de la plantilla")
     metadata: Optional[dict] = Field(None, description="Metadatos adicionales")
+    priority: Optional[Union[Literal["high", "normal", "low"], int]] = Field(
+        None, description="Prioridad en la cola: high (alertas, OTP), normal o low (campañas)"
+    )
 
     def get_notifications(self) -> list[NotificationBase]:
         """Convierte la notificación multi-canal en notificaciones individuales"""
@@ -138,11 +143,25 @@ class NotificationDB(NotificationBase):
     status: Literal["pending", "scheduled", "processing", "sent", "failed"]
     created_at: datetime
     updated_at: Optional[datetime]
+    trace_id: Optional[str] = None
+    timings: Optional[dict] = Field(None, description="Segundos por etapa: queue_wait, decode, db_insert, provider_send...")
 
     class Config:
         from_attributes = True
 
 
+class DLQReplayRequest(BaseModel):
+    """Filtros y ritmo del replay de la DLQ"""
+    channel: Optional[ChannelName] = None
+    error: Optional[str] = Field(None, description="Texto contenido en el error (cabecera x-error)")
+    min_age: Optional[float] = Field(None, ge=0, description="Segundos mínimos desde el fallo definitivo")
+    max_age: Optional[float] = Field(None, ge=0, description="Segundos máximos desde el fallo definitivo")
+    limit: Optional[int] = Field(None, ge=1, description="Máximo de mensajes a reenviar")
+    batch_size: int = Field(50, ge=1, le=1000)
+    rate: float = Field(10.0, gt=0, description="Mensajes por segundo")
+    dry_run: bool = False
+
+
 class NotificationFilter(BaseModel):
     channel: Optional[ChannelName] = None
     status: Optional[Literal["pending", "scheduled", "processing", "sent", "failed"]] = None
@@ -0,0 +1,253 @@
+"""
+Supervisor multi-proceso del worker
+===================================
+
+Qué es este archivo:
+- `python -m app.worker` corre un solo proceso y usa un solo núcleo, aunque decodificar
+  JSON, armar MIME y renderizar plantillas es trabajo de CPU.
+- `python -m app.supervisor` lanza N procesos worker (por defecto tantos como CPUs),
+  cada uno con su propia conexión AMQP y su propio pool de BD, y los vigila:
+  - Si un hijo muere, lo reinicia con espera creciente (backoff) para no entrar en un
+    bucle de caídas.
+  - Al recibir SIGTERM/SIGINT lo reenvía a los hijos para que drenen y cierren bien, y
+    si no terminan en WORKER_SHUTDOWN_TIMEOUT segundos los mata.
+  - Expone en WORKER_METRICS_PORT las métricas de todos los hijos combinadas
+    (`GET /metrics`: contadores e histogramas sumados, gauges sumados o con el máximo
+    según `worker_metrics.ADDITIVE_GAUGES`) y el detalle por hijo (`GET /metrics/processes`).
+    Cuando un hijo termina, sus contadores e histogramas se siguen sumando (así los
+    totales no retroceden al reiniciarlo) y sus gauges se descartan.
+
+Variables de entorno:
+- WORKER_PROCESSES: número de procesos (por defecto os.cpu_count()).
+- WORKER_RESTART_BACKOFF_BASE / WORKER_RESTART_BACKOFF_MAX: backoff de reinicio (seg).
+- WORKER_SHUTDOWN_TIMEOUT: segundos de gracia para que los hijos terminen.
+- WORKER_METRICS_PUSH_INTERVAL: cada cuántos segundos cada hijo reporta sus métricas.
+
+Rate limits: cada hijo recibe WORKER_RATE_LIMIT_PROCESSES = número de procesos y divide
+por él `rate_limit_per_second`/`rate_limit_burst` (y los de remitente) y SMTP_DOMAIN_RATE,
+así la suma de los hijos respeta el límite configurado del proveedor.
+"""
+
+import os
+import time
+import queue
+import signal
+import asyncio
+import logging
+import multiprocessing
+from typing import Any, Callable, Dict, Optional
+
+from app.worker_metrics import merge_snapshots, serve_metrics
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+PROCESSES = int(os.getenv("WORKER_PROCESSES", "0")) or (os.cpu_count() or 1)
+RESTART_BACKOFF_BASE = float(os.getenv("WORKER_RESTART_BACKOFF_BASE", "1"))
+RESTART_BACKOFF_MAX = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", "60"))
+SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+METRICS_PUSH_INTERVAL = float(os.getenv("WORKER_METRICS_PUSH_INTERVAL", "5"))
+METRICS_HOST = os.getenv("WORKER_METRICS_HOST", "0.0.0.0")
+METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+# Si un hijo vivió al menos esto, se considera estable y se reinicia el backoff
+STABLE_AFTER_SECONDS = 60.0
+
+
+def _child_main(index: int, snapshots: "multiprocessing.Queue", processes: int = 1) -> None:
+    """Punto de entrada de cada proceso hijo (se importa de cero con `spawn`)"""
+    # Cada hijo tiene sus propios token buckets: se reparte el rate limit entre todos.
+    # Se fija antes de importar el worker porque app.rate_limiter lo lee al cargarse.
+    os.environ["WORKER_RATE_LIMIT_PROCESSES"] = str(processes)
+    from app import worker
+    from app.worker_metrics import metrics
+
+    # El endpoint de métricas lo sirve el supervisor, no cada hijo
+    worker.METRICS_PORT = 0
+
+    async def _report() -> None:
+        while True:
+            await asyncio.sleep(METRICS_PUSH_INTERVAL)
+            try:
+                snapshots.put_nowait((index, os.getpid(), metrics.snapshot()))
+            except queue.Full:
+                pass
+
+    async def _run() -> None:
+        reporter = asyncio.create_task(_report())
+        try:
+            await worker.main()
+        finally:
+            reporter.cancel()
+            snapshots.put_nowait((index, os.getpid(), metrics.snapshot()))
+
+    asyncio.run(_run())
+
+
+class _Child:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.consecutive_failures = 0
+        self.restart_at: Optional[float] = None
+
+
+class Supervisor:
+    def __init__(self, processes: int = PROCESSES, target: Callable[..., None] = _child_main):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._snapshots = self._ctx.Queue(maxsize=processes * 4)
+        self._children = [_Child(i) for i in range(processes)]
+        self._target = target
+        self._latest: Dict[int, Dict[str, Any]] = {}
+        # Contadores e histogramas de los hijos que ya terminaron
+        self._retired: Dict[str, Any] = {"counters": {}, "gauges": {}, "histograms": {}}
+        self._stopping = asyncio.Event()
+
+    def _start(self, child: _Child) -> None:
+        child.process = self._ctx.Process(
+            target=self._target,
+            args=(child.index, self._snapshots, len(self._children)),
+            name=f"notifications-worker-{child.index}",
+        )
+        child.process.start()
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        logger.info(f"Worker {child.index} iniciado (pid={child.process.pid})")
+
+    def _backoff(self, child: _Child) -> float:
+        return min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * (2 ** max(0, child.consecutive_failures - 1)))
+
+    def _check_children(self) -> None:
+        now = time.monotonic()
+        for child in self._children:
+            proc = child.process
+            if proc is not None and not proc.is_alive():
+                uptime = now - child.started_at
+                child.consecutive_failures = 1 if uptime >= STABLE_AFTER_SECONDS else child.consecutive_failures + 1
+                delay = self._backoff(child)
+                logger.error(
+                    f"Worker {child.index} (pid={proc.pid}) terminó con código {proc.exitcode}; "
+                    f"reinicio en {delay:.1f}s"
+                )
+                # El último snapshot del hijo ya está en la cola (se escribe antes de salir)
+                self._drain_snapshots()
+                self._retire(child.index, proc.pid)
+                child.process = None
+                child.restart_at = now + delay
+            if child.process is None and child.restart_at is not None and now >= child.restart_at:
+                child.restarts += 1
+                self._start(child)
+
+    def _drain_snapshots(self) -> None:
+        while True:
+            try:
+                index, pid, snapshot = self._snapshots.get_nowait()
+            except queue.Empty:
+                return
+            proc = self._children[index].process
+            if proc is None or proc.pid != pid:
+                continue  # de un hijo ya retirado: sus contadores están en `_retired`
+            self._latest[index] = {"pid": pid, "metrics": snapshot}
+
+    def _retire(self, index: int, pid: Optional[int]) -> None:
+        """Acumula los contadores e histogramas del hijo que terminó y descarta su snapshot"""
+        entry = self._latest.pop(index, None)
+        if entry is None or entry["pid"] != pid:
+            return
+        final = entry["metrics"]
+        self._retired = merge_snapshots([
+            self._retired,
+            {"counters": final.get("counters", {}), "histograms": final.get("histograms", {})},
+        ])
+
+    async def _metrics_route(self):
+        self._drain_snapshots()
+        merged = merge_snapshots([self._retired] + [entry["metrics"] for entry in self._latest.values()])
+        merged["gauges"]["supervisor_processes_alive"] = float(self.alive())
+        merged["counters"]["supervisor_restarts_total"] = float(sum(c.restarts for c in self._children))
+        return 200, merged
+
+    async def _processes_route(self):
+        self._drain_snapshots()
+        body = {
+            "processes": [
+                {
+                    "index": child.index,
+                    "pid": child.process.pid if child.process else None,
+                    "alive": bool(child.process and child.process.is_alive()),
+                    "restarts": child.restarts,
+                    "metrics": self._latest.get(child.index, {}).get("metrics"),
+                }
+                for child in self._children
+            ]
+        }
+        return 200, body
+
+    async def _readiness_route(self):
+        alive = self.alive()
+        is_ready = alive == len(self._children)
+        body = {
+            "status": "UP" if is_ready else "DOWN",
+            "checks": [{"name": "Worker processes", "status": "UP" if is_ready else "DOWN",
+                        "data": {"alive": alive, "expected": len(self._children)}}],
+        }
+        return (200 if is_ready else 503), body
+
+    def alive(self) -> int:
+        return sum(1 for c in self._children if c.process is not None and c.process.is_alive())
+
+    def request_stop(self) -> None:
+        self._stopping.set()
+
+    async def _shutdown(self) -> None:
+        logger.info("Deteniendo workers (SIGTERM a los hijos)")
+        procs = [c.process for c in self._children if c.process is not None and c.process.is_alive()]
+        for proc in procs:
+            proc.terminate()
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while any(p.is_alive() for p in procs) and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        for proc in procs:
+            if proc.is_alive():
+                logger.warning(f"Worker pid={proc.pid} no terminó a tiempo; forzando cierre")
+                proc.kill()
+            proc.join(timeout=1)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self.request_stop)
+
+        server = None
+        if METRICS_PORT:
+            server = await serve_metrics(METRICS_HOST, METRICS_PORT, routes={
+                "/metrics": self._metrics_route,
+                "/metrics/processes": self._processes_route,
+                "/health/ready": self._readiness_route,
+            })
+
+        for child in self._children:
+            self._start(child)
+        try:
+            while not self._stopping.is_set():
+                self._check_children()
+                self._drain_snapshots()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self._shutdown()
+            if server is not None:
+                server.close()
+
+
+def main() -> None:
+    logger.info(f"Supervisor iniciando {PROCESSES} procesos worker")
+    asyncio.run(Supervisor(PROCESSES).run())
+
+
+if __name__ == "__main__":
+    main()
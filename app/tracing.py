@@ -0,0 +1,102 @@
+"""
+Trazas de latencia por etapa (desde el POST hasta el proveedor)
+===============================================================
+
+Qué es este archivo:
+- Para saber cuánto tarda una notificación desde que el API la encola hasta que el
+  proveedor la acepta, el API publica cada mensaje con dos cabeceras AMQP:
+  - `x-trace-id`: identificador de la traza (se devuelve en la respuesta del API).
+  - `x-enqueued-at`: hora de encolado (epoch en segundos).
+- El worker mide cada etapa del procesamiento con `MessageTrace`:
+  - queue_wait: tiempo en el broker desde la última publicación (incluye la espera de
+    un reintento, que se vuelve a marcar en `x-last-enqueued-at`).
+  - decode: decodificar y parsear el JSON.
+  - blob_fetch: descargar el cuerpo del almacén de blobs (sólo mensajes con claim-check).
+  - render: renderizar la plantilla del email (sólo mensajes con `template`).
+  - db_insert: crear o reutilizar la fila en `notifications`.
+  - throttle: espera por rate limit.
+  - provider_send: envío al proveedor hasta su confirmación.
+  - status_update: guardar el estado final (sólo en histogramas: ocurre mientras se
+    escribe la fila).
+- Los tiempos quedan en `notifications.timings` (JSON) junto con `trace_id`, y se suman
+  a los histogramas `notification_stage_seconds{stage, channel}` y
+  `notification_end_to_end_seconds{channel}` del endpoint de métricas del worker.
+"""
+
+import json
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from app.worker_metrics import metrics
+
+TRACE_HEADER = "x-trace-id"
+ENQUEUED_HEADER = "x-enqueued-at"
+LAST_ENQUEUED_HEADER = "x-last-enqueued-at"
+
+
+def trace_headers(trace_id: Optional[str] = None) -> Dict[str, Any]:
+    """Cabeceras que el publicador agrega a cada mensaje nuevo"""
+    return {TRACE_HEADER: trace_id or uuid.uuid4().hex, ENQUEUED_HEADER: time.time()}
+
+
+class MessageTrace:
+    def __init__(self, trace_id: Optional[str] = None, enqueued_at: Optional[float] = None, channel: Optional[str] = None):
+        self.trace_id = trace_id
+        self.enqueued_at = enqueued_at
+        self.channel = channel
+        self.timings: Dict[str, float] = {}
+
+    @classmethod
+    def from_headers(cls, headers: Mapping[str, Any], fallback_id: Optional[str] = None) -> "MessageTrace":
+        """Crea la traza de una entrega y registra cuánto esperó en la cola"""
+        enqueued_at = _as_float(headers.get(ENQUEUED_HEADER))
+        trace = cls(headers.get(TRACE_HEADER) or fallback_id, enqueued_at)
+        last_enqueued = _as_float(headers.get(LAST_ENQUEUED_HEADER)) or enqueued_at
+        if last_enqueued is not None:
+            trace.record("queue_wait", max(0.0, time.time() - last_enqueued))
+        return trace
+
+    def child(self, channel: str) -> "MessageTrace":
+        """Copia para un canal concreto (en multi-canal cada canal tiene su fila)"""
+        trace = MessageTrace(self.trace_id, self.enqueued_at, channel)
+        trace.timings = dict(self.timings)
+        return trace
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def to_json(self) -> str:
+        data: Dict[str, Any] = {stage: round(seconds, 6) for stage, seconds in self.timings.items()}
+        if self.enqueued_at is not None:
+            data["since_enqueue"] = round(max(0.0, time.time() - self.enqueued_at), 6)
+        return json.dumps(data)
+
+    def observe(self, sent: bool) -> None:
+        """Suma los tiempos de la traza a los histogramas del canal"""
+        channel = self.channel or "unknown"
+        for stage, seconds in self.timings.items():
+            metrics.observe("notification_stage_seconds", seconds, stage=stage, channel=channel)
+        if sent and self.enqueued_at is not None:
+            metrics.observe("notification_end_to_end_seconds", max(0.0, time.time() - self.enqueued_at), channel=channel)
+
+
+def _as_float(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+# Traza del mensaje que procesa la tarea actual (cada mensaje corre en su propia tarea)
+current_trace: ContextVar[Optional[MessageTrace]] = ContextVar("current_trace", default=None)
@@ -0,0 +1,177 @@
+"""
+Métricas en memoria del worker
+==============================
+
+Qué es este archivo:
+- Un registro muy simple de métricas (contadores, gauges e histogramas) que el worker
+  actualiza mientras procesa mensajes. No depende de Prometheus ni de otra librería.
+- `serve_metrics()` expone el snapshot en JSON por HTTP para poder consultarlo con curl
+  (por ejemplo `curl http://localhost:9100/metrics`).
+
+Nombres con etiquetas:
+- Cada métrica se identifica por nombre + etiquetas, p. ej.
+  `rate_limiter_wait_seconds{provider="sms:twilio"}`.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los buckets de los histogramas
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _key(name: str, labels: Dict[str, Any]) -> str:
+    if not labels:
+        return name
+    parts = ",".join(f'{k}="{labels[k]}"' for k in sorted(labels))
+    return f"{name}{{{parts}}}"
+
+
+class MetricsRegistry:
+    """Registro de métricas seguro para hilos (el worker usa asyncio.to_thread)"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._lock = threading.Lock()
+        self._buckets = buckets
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, Dict[str, Any]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = float(value)
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = {"count": 0, "sum": 0.0, "buckets": {str(b): 0 for b in self._buckets}}
+                hist["buckets"]["+Inf"] = 0
+                self._histograms[key] = hist
+            hist["count"] += 1
+            hist["sum"] += value
+            for bound in self._buckets:
+                if value <= bound:
+                    hist["buckets"][str(bound)] += 1
+            hist["buckets"]["+Inf"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copia consistente de todas las métricas"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {
+                    k: {"count": v["count"], "sum": v["sum"], "buckets": dict(v["buckets"])}
+                    for k, v in self._histograms.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Registro global del proceso
+metrics = MetricsRegistry()
+
+
+# Gauges que son un conteo por proceso y tiene sentido sumar entre procesos. El resto
+# (estado del circuito, percentiles, edad del más antiguo, tokens, límite de
+# concurrencia) se combina con el máximo: sumarlos daría valores sin sentido.
+ADDITIVE_GAUGES = frozenset({"retry_scheduler_held", "worker_inflight_messages"})
+
+
+def merge_snapshots(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combina snapshots de varios procesos (usado por el supervisor).
+
+    Contadores e histogramas se suman. De los gauges sólo se suman los de
+    `ADDITIVE_GAUGES` (p. ej. `retry_scheduler_held` refleja el total retenido entre
+    todos los procesos); los demás toman el máximo, p. ej. `circuit_breaker_state` el
+    peor estado. El valor de cada proceso está en `GET /metrics/processes`.
+    """
+    merged: Dict[str, Any] = {"counters": {}, "gauges": {}, "histograms": {}}
+    for snap in snapshots:
+        counters = merged["counters"]
+        for key, value in snap.get("counters", {}).items():
+            counters[key] = counters.get(key, 0.0) + value
+        gauges = merged["gauges"]
+        for key, value in snap.get("gauges", {}).items():
+            if key not in gauges:
+                gauges[key] = value
+            elif key.split("{", 1)[0] in ADDITIVE_GAUGES:
+                gauges[key] += value
+            else:
+                gauges[key] = max(gauges[key], value)
+        for key, hist in snap.get("histograms", {}).items():
+            target = merged["histograms"].setdefault(key, {"count": 0, "sum": 0.0, "buckets": {}})
+            target["count"] += hist["count"]
+            target["sum"] += hist["sum"]
+            for bound, count in hist["buckets"].items():
+                target["buckets"][bound] = target["buckets"].get(bound, 0) + count
+    return merged
+
+
+async def serve_metrics(
+    host: str,
+    port: int,
+    routes: Optional[Dict[str, Callable[[], Awaitable[Tuple[int, Dict[str, Any]]]]]] = None,
+) -> asyncio.AbstractServer:
+    """Levanta un servidor HTTP mínimo que responde JSON.
+
+    Por defecto sólo expone `GET /metrics`; `routes` permite añadir más rutas
+    (path -> corrutina que retorna (status_code, body)).
+    """
+
+    async def _metrics_route() -> Tuple[int, Dict[str, Any]]:
+        return 200, metrics.snapshot()
+
+    handlers = {"/metrics": _metrics_route}
+    handlers.update(routes or {})
+
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            # Descartar cabeceras de la petición
+            while True:
+                line = await reader.readline()
+                if not line or line in (b"\r\n", b"\n"):
+                    break
+            parts = request_line.decode("latin-1").split()
+            path = parts[1].split("?", 1)[0] if len(parts) >= 2 else "/"
+            handler = handlers.get(path)
+            if handler is None:
+                status, body = 404, {"detail": "Not found"}
+            else:
+                status, body = await handler()
+            payload = json.dumps(body).encode("utf-8")
+            reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}.get(status, "OK")
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode("latin-1") + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.warning(f"Error atendiendo petición de métricas: {e}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(_handle, host, port)
+    logger.info(f"Métricas del worker expuestas en http://{host}:{port}/metrics")
+    return server
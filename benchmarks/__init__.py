@@ -0,0 +1 @@
+# Benchmarks reproducibles del worker y de los canales (no forman parte de la suite de pytest)
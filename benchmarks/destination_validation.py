@@ -0,0 +1,128 @@
+"""
+Benchmark: destinos/s validados (email, SMS, WhatsApp)
+======================================================
+
+Genera `--count` destinos sintéticos por canal (por defecto un millón) con formatos
+mezclados (`+57 300-123-4567`, `(555) 123 4567`, `whatsapp:+...`, emails con el dominio
+en mayúsculas y un 2% inválidos); cada destino se repite en promedio `--repeat` veces,
+como en campañas y reintentos. Compara:
+
+- por llamada: el `validate_destination` anterior, `re.sub` + `re.match` con patrones en
+  texto y una línea INFO por destino (con el logger en WARNING, como en producción);
+- LRU: `app.channels.validation.normalize_*`, patrones precompilados y cache de
+  normalizados;
+- lote: `validation.validate_batch`, cada valor distinto una vez, sin pasar por el LRU.
+
+Uso:
+    python -m benchmarks.destination_validation --count 1000000 --repeat 5
+"""
+
+import re
+import time
+import random
+import logging
+import argparse
+from typing import Callable, List, Optional
+
+from app.channels import validation
+
+logger = logging.getLogger("benchmarks.destination_validation")
+logger.setLevel(logging.WARNING)
+
+
+def old_email(destination: str) -> None:
+    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+    if not re.match(pattern, destination):
+        raise ValueError(f"Email invalido: {destination}")
+
+
+def old_sms(destination: str) -> None:
+    cleaned = re.sub(r'[^\d+]', '', destination)
+    if not re.match(r'^\+?[1-9]\d{1,14}$', cleaned):
+        raise ValueError(f"Número de teléfono inválido: {destination}")
+    logger.info(f"Número de teléfono validado: {destination}")
+
+
+def old_whatsapp(destination: str) -> str:
+    cleaned = re.sub(r'[^\d+]', '', destination)
+    if cleaned.startswith('whatsapp:'):
+        cleaned = cleaned[9:]
+    if not re.match(r'^\+?[1-9]\d{1,14}$', cleaned):
+        raise ValueError(f"Número de WhatsApp inválido: {destination}")
+    if not destination.startswith('whatsapp:'):
+        destination = f"whatsapp:{destination}"
+    logger.info(f"Número de WhatsApp validado: {destination}")
+    return destination
+
+
+OLD = {"email": old_email, "sms": old_sms, "whatsapp": old_whatsapp}
+
+
+def _phone(rng: random.Random) -> str:
+    digits = f"{rng.randint(1, 99)}{rng.randint(2000000000, 9999999999)}"
+    style = rng.random()
+    if style < 0.5:
+        return f"+{digits}"
+    if style < 0.8:
+        return f"+{digits[:2]} {digits[2:5]}-{digits[5:8]}-{digits[8:]}"
+    return f"({digits[:3]}) {digits[3:6]} {digits[6:]}"
+
+
+def synthetic(kind: str, count: int, repeat: int, seed: int = 7) -> List[str]:
+    """`count` destinos con ~count/repeat valores distintos y un 2% inválidos"""
+    rng = random.Random(seed)
+    unique: List[str] = []
+    for i in range(max(1, count // repeat)):
+        if rng.random() < 0.02:
+            unique.append(rng.choice(["sin-arroba.example.com", "+0123", "abc", ""]))
+        elif kind == "email":
+            unique.append(f"cliente{i}@{rng.choice(['example.com', 'Example.COM', 'correo.co'])}")
+        elif kind == "whatsapp" and rng.random() < 0.5:
+            unique.append(f"whatsapp:{_phone(rng)}")
+        else:
+            unique.append(_phone(rng))
+    return [rng.choice(unique) for _ in range(count)]
+
+
+def per_call(check: Callable[[str], object], destinations: List[str]) -> float:
+    started = time.perf_counter()
+    for destination in destinations:
+        try:
+            check(destination)
+        except ValueError:
+            pass
+    return len(destinations) / (time.perf_counter() - started)
+
+
+def cached(normalize: Callable[[str], Optional[str]], destinations: List[str]) -> float:
+    started = time.perf_counter()
+    for destination in destinations:
+        normalize(destination)
+    return len(destinations) / (time.perf_counter() - started)
+
+
+def batch(kind: str, destinations: List[str]) -> float:
+    started = time.perf_counter()
+    validation.validate_batch(kind, destinations)
+    return len(destinations) / (time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000, help="destinos por canal")
+    parser.add_argument("--repeat", type=int, default=5, help="apariciones promedio de cada destino")
+    args = parser.parse_args(argv)
+
+    print(f"destinos={args.count} repetición={args.repeat} cache={validation.DESTINATION_CACHE_SIZE}")
+    print(f"{'canal':<10}{'por llamada':>14}{'LRU':>14}{'lote':>14}{'mejora lote':>13}")
+    for kind in ("email", "sms", "whatsapp"):
+        destinations = synthetic(kind, args.count, args.repeat)
+        validation.clear_cache()
+        old = per_call(OLD[kind], destinations)
+        lru = cached(validation.NORMALIZERS[kind], destinations)
+        bulk = batch(kind, destinations)
+        print(f"{kind:<10}{old:>12.0f}/s{lru:>12.0f}/s{bulk:>12.0f}/s{bulk / old:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
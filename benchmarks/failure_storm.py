@@ -0,0 +1,88 @@
+"""
+Benchmark: tormenta de fallos (100% de envíos fallidos)
+======================================================
+
+Mide cuántos mensajes por segundo puede mandar el worker a la ruta de reintento/DLQ
+cuando todos los proveedores fallan. Se usa un broker falso con una latencia por
+operación configurable (`--rtt-ms`) para comparar:
+
+- per-message: resolver el exchange en cada fallo (declare_exchange/get_exchange), como
+  hacía el worker antes del RetryRouter.
+- router: exchanges resueltos una vez al arrancar (`RetryRouter`).
+
+Uso:
+    python -m benchmarks.failure_storm --messages 5000 --rtt-ms 0.5
+"""
+
+import time
+import json
+import asyncio
+import argparse
+from unittest.mock import patch
+
+from app import worker
+from app.retry_router import RetryRouter
+
+
+class FakeExchange:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.published = 0
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(self.rtt)
+        self.published += 1
+
+
+class ResolvingExchange(FakeExchange):
+    """Simula el coste de resolver el exchange (una ida y vuelta) antes de cada publicación"""
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(self.rtt)
+        await super().publish(message, routing_key)
+
+
+class FakeIncoming:
+    def __init__(self, body: bytes, retry: int):
+        self.body = body
+        self.headers = {"x-retry-count": retry}
+
+    async def ack(self):
+        pass
+
+
+async def _failing_process(payload):
+    raise ConnectionError("proveedor caído")
+
+
+async def _run(exchange_cls, messages: int, rtt: float) -> float:
+    retry_exchanges = {idx: exchange_cls(rtt) for idx in range(1, len(worker.RETRY_DELAYS) + 1)}
+    router = RetryRouter(exchange_cls(rtt), exchange_cls(rtt), worker.ROUTING_KEY, worker.RETRY_DELAYS, retry_exchanges)
+    body = json.dumps({"channel": "sms", "destination": "+573001234567", "message": "hola"}).encode("utf-8")
+    # Reparte los mensajes entre los reintentos y la DLQ como en una caída real
+    incoming = [FakeIncoming(body, i % (worker.MAX_RETRIES + 1)) for i in range(messages)]
+
+    with patch.object(worker, "_process_one", _failing_process), patch.object(worker.logger, "disabled", True):
+        started = time.perf_counter()
+        for msg in incoming:
+            await worker._handle_message(msg, router)
+        elapsed = time.perf_counter() - started
+    return messages / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="latencia simulada por operación con el broker")
+    args = parser.parse_args()
+    rtt = args.rtt_ms / 1000
+
+    baseline = asyncio.run(_run(ResolvingExchange, args.messages, rtt))
+    router = asyncio.run(_run(FakeExchange, args.messages, rtt))
+    print(f"mensajes={args.messages} rtt={args.rtt_ms}ms")
+    print(f"per-message resolve : {baseline:10.0f} msg/s")
+    print(f"router (cacheado)   : {router:10.0f} msg/s  ({router / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
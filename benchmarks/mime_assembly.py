@@ -0,0 +1,73 @@
+"""
+Benchmark: bytes/s de armado de mensajes MIME en una campaña
+============================================================
+
+Para cada plantilla de `app/templates` (renderizada y con CSS inline) arma `--recipients`
+mensajes con el mismo asunto y cuerpo y distinto destinatario:
+
+- por destinatario: el comportamiento anterior, `MIMEMultipart` + `MIMEText` nuevos y
+  serialización completa (lo que hace `smtplib.SMTP.send_message`) para cada email;
+- esqueleto: `app.channels.mime_cache`, cuerpo y cabeceras comunes serializados una vez;
+  por destinatario sólo se estampan `To` y `Message-ID`.
+
+Mide sólo el armado (sin red): mensajes/s y MB/s de bytes listos para SMTP.
+
+Uso:
+    python -m benchmarks.mime_assembly --recipients 2000
+"""
+
+import time
+import argparse
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Callable, List, Optional, Tuple
+
+from app.channels import email_templates, mime_cache
+from benchmarks.template_render import CONTEXTS
+
+FROM = "Notifications Service <noreply@example.com>"
+
+
+def per_recipient(html: str, subject: str, destination: str) -> bytes:
+    msg = MIMEMultipart()
+    msg["From"] = FROM
+    msg["To"] = destination
+    msg["Subject"] = subject
+    msg.attach(MIMEText(html, "html"))
+    return msg.as_bytes(policy=msg.policy.clone(linesep="\r\n"))
+
+
+def skeleton(html: str, subject: str, destination: str) -> bytes:
+    return mime_cache.get_prepared(FROM, subject, html, msgid_domain="example.com").for_recipient(destination)
+
+
+def measure(build: Callable[[str, str, str], bytes], html: str, subject: str, recipients: int) -> Tuple[float, float]:
+    """Retorna (mensajes/s, MB/s)"""
+    total = 0
+    started = time.perf_counter()
+    for i in range(recipients):
+        total += len(build(html, subject, f"cliente{i}@example.com"))
+    elapsed = time.perf_counter() - started
+    return recipients / elapsed, total / elapsed / (1024 * 1024)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=2000, help="destinatarios por plantilla")
+    args = parser.parse_args(argv)
+
+    print(f"{'plantilla':<28}{'por destinatario':>22}{'esqueleto':>22}{'mejora':>9}")
+    for name, context in CONTEXTS.items():
+        html = email_templates.render(name, context)
+        subject = f"Campaña {context.get('subject', name)}"
+        mime_cache.clear()
+        old_rate, old_mb = measure(per_recipient, html, subject, args.recipients)
+        new_rate, new_mb = measure(skeleton, html, subject, args.recipients)
+        print(
+            f"{name:<28}{old_rate:>10.0f}/s {old_mb:>7.1f} MB/s"
+            f"{new_rate:>10.0f}/s {new_mb:>7.1f} MB/s{new_rate / old_rate:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
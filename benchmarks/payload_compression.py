@@ -0,0 +1,86 @@
+"""
+Benchmark: bytes en el broker y throughput con cuerpos comprimidos
+==================================================================
+
+Arma mensajes multi-canal típicos con el HTML de cada plantilla de `app/templates` y
+compara, por algoritmo (`none`, `zlib` con varios niveles y `zstd` si está instalado):
+
+- bytes por mensaje que RabbitMQ persiste (y copia en cada cola de reintento/DLQ);
+- costo de CPU de `encode_payload` (API) + `decode_body` (worker), en mensajes/s;
+- throughput de punta a punta estimado: el menor entre el límite de CPU y el de ancho de
+  banda del broker (`--broker-mbps`, disco o red) para `--copies` escrituras por mensaje.
+
+No usa un broker real: los bytes salen del codec real y el ancho de banda es un
+parámetro, para poder comparar escenarios (disco lento, muchos reintentos).
+
+Uso:
+    python -m benchmarks.payload_compression --messages 2000 --broker-mbps 50 --copies 2
+"""
+
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app import codec
+
+TEMPLATES = Path(__file__).resolve().parent.parent / "app" / "templates"
+
+
+def _payloads() -> List[Tuple[str, Dict[str, Any]]]:
+    payloads = []
+    for path in sorted(TEMPLATES.glob("*.html")):
+        html = path.read_text(encoding="utf-8")
+        payloads.append((path.stem, {
+            "destination": {"email": "cliente@example.com", "sms": "+573001234567", "push": "token-" + "x" * 140},
+            "message": {"email": html, "sms": "Tienes una notificación nueva", "push": "Notificación nueva"},
+            "subject": path.stem.replace("_", " ").title(),
+            "user_id": "user-123",
+        }))
+    return payloads
+
+
+def _variants() -> List[Tuple[str, str, Optional[int]]]:
+    variants = [("none", "none", None), ("zlib-1", "zlib", 1), ("zlib-6", "zlib", 6), ("zlib-9", "zlib", 9)]
+    if codec.zstandard is not None:
+        variants += [("zstd-3", "zstd", 3), ("zstd-9", "zstd", 9)]
+    return variants
+
+
+def measure(payload: Dict[str, Any], algorithm: str, level: Optional[int], messages: int) -> Tuple[int, float]:
+    """Retorna (bytes por mensaje, mensajes/s de encode+decode)"""
+    body, encoding = codec.encode_payload(payload, algorithm=algorithm, threshold=0, level=level)
+    started = time.perf_counter()
+    for _ in range(messages):
+        body, encoding = codec.encode_payload(payload, algorithm=algorithm, threshold=0, level=level)
+        json.loads(codec.decode_body(body, encoding))
+    elapsed = time.perf_counter() - started
+    return len(body), messages / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000, help="mensajes por medición")
+    parser.add_argument("--broker-mbps", type=float, default=50.0, help="MB/s que el broker puede persistir")
+    parser.add_argument("--copies", type=int, default=2, help="escrituras por mensaje (principal + reintentos)")
+    args = parser.parse_args()
+
+    bandwidth = args.broker_mbps * 1024 * 1024
+    if codec.zstandard is None:
+        print("(zstandard no instalado: sólo zlib)")
+    print(f"{'plantilla':<26}{'variante':<10}{'bytes':>8}{'ratio':>8}{'cpu msg/s':>12}{'e2e msg/s':>12}")
+    for name, payload in _payloads():
+        raw_size = None
+        for label, algorithm, level in _variants():
+            size, cpu_rate = measure(payload, algorithm, level, args.messages)
+            raw_size = raw_size or size
+            broker_rate = bandwidth / (size * args.copies)
+            print(
+                f"{name:<26}{label:<10}{size:>8}{raw_size / size:>7.1f}x"
+                f"{cpu_rate:>12.0f}{min(cpu_rate, broker_rate):>12.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: latencia de mensajes prioritarios durante una campaña masiva
+======================================================================
+
+Un worker drena una campaña de `--bulk` emails con la plantilla `promotion` mientras
+llegan alertas con la plantilla `security_alert` cada `--high-every` segundos. Compara:
+
+- fifo: cola sin prioridades (AMQP_MAX_PRIORITY=0, comportamiento anterior). Cada
+  alerta espera a que se procese todo el backlog que tiene delante.
+- priority: cola con `x-max-priority` (AMQP_MAX_PRIORITY=`--max-priority`). El broker
+  entrega primero las alertas; sólo esperan a los mensajes que el worker ya tenía en
+  su prefetch.
+
+Los mensajes salen por el código real: cada payload pasa por `build_message` (que
+resuelve la prioridad con `resolve_priority` a partir de la plantilla) y la cola ordena
+por la propiedad `priority` del `aio_pika.Message` resultante. Lo que se modela, por
+eventos discretos y sin RabbitMQ, es la entrega y el tiempo de servicio: el broker
+entrega mientras el consumidor tenga menos de `prefetch` mensajes sin ack, primero la
+subcola de mayor prioridad y en orden FIFO dentro de cada una, y los mensajes ya
+entregados no se reordenan. La latencia de las alertas queda acotada por
+~ prefetch * servicio / concurrencia.
+
+Uso:
+    python -m benchmarks.priority_lanes --bulk 100000 --concurrency 10 --prefetch 10 --service-ms 20
+"""
+
+import heapq
+import random
+import argparse
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import aio_pika
+
+from app import priority
+from app.retry_router import build_message
+
+ENQUEUED_HEADER = "x-enqueued-at"
+
+CAMPAIGN = {
+    "channel": "email",
+    "destination": "cliente@example.com",
+    "template": "promotion",
+    "context": {"name": "Ana", "title": "Ofertas de temporada"},
+}
+ALERT = {
+    "channel": "email",
+    "destination": "cliente@example.com",
+    "template": "security_alert",
+    "context": {"name": "Ana", "ip": "203.0.113.7"},
+}
+
+
+class _Broker:
+    """Cola con la entrega de RabbitMQ: una subcola FIFO por prioridad, primero la mayor.
+
+    Sin `x-max-priority` todos los mensajes llevan `priority=None` y queda una sola FIFO.
+    """
+
+    def __init__(self):
+        self._lanes: Dict[int, Deque[aio_pika.Message]] = {}
+
+    def publish(self, message: aio_pika.Message) -> None:
+        self._lanes.setdefault(message.priority or 0, deque()).append(message)
+
+    def get(self) -> aio_pika.Message:
+        lane = max(self._lanes)
+        queue = self._lanes[lane]
+        message = queue.popleft()
+        if not queue:
+            del self._lanes[lane]
+        return message
+
+    def __bool__(self) -> bool:
+        return bool(self._lanes)
+
+
+def simulate(max_priority: int, bulk: int, concurrency: int, prefetch: int, service: float, high_every: float, high_count: int, seed: int = 7):
+    rng = random.Random(seed)
+    with patch.object(priority, "MAX_PRIORITY", max_priority):
+        broker = _Broker()
+        for _ in range(bulk):
+            broker.publish(build_message(CAMPAIGN))
+        buffer: Deque[aio_pika.Message] = deque()  # entregados por prefetch, esperando un hueco
+        in_service: List[Tuple[float, int, aio_pika.Message]] = []
+        latencies: List[float] = []
+        seq = 0
+        now = 0.0
+        next_high = high_every if high_count else float("inf")
+        highs_left = high_count
+
+        def fill() -> None:
+            nonlocal seq
+            while broker and len(buffer) + len(in_service) < prefetch:
+                buffer.append(broker.get())
+            while buffer and len(in_service) < concurrency:
+                seq += 1
+                heapq.heappush(in_service, (now + service * rng.uniform(0.5, 1.5), seq, buffer.popleft()))
+
+        fill()
+        while in_service or broker or highs_left:
+            next_done = in_service[0][0] if in_service else float("inf")
+            if next_high <= next_done:
+                now = next_high
+                broker.publish(build_message(ALERT, {ENQUEUED_HEADER: now}))
+                highs_left -= 1
+                next_high = now + high_every if highs_left else float("inf")
+            else:
+                now, _, message = heapq.heappop(in_service)
+                arrival: Optional[float] = (message.headers or {}).get(ENQUEUED_HEADER)
+                if arrival is not None:
+                    latencies.append(now - arrival)
+            fill()
+    return latencies, now
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bulk", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--prefetch", type=int, default=10)
+    parser.add_argument("--service-ms", type=float, default=20.0)
+    parser.add_argument("--high-every", type=float, default=1.0, help="segundos entre alertas")
+    parser.add_argument("--high-count", type=int, default=100)
+    parser.add_argument("--max-priority", type=int, default=10, help="x-max-priority de la cola")
+    args = parser.parse_args(argv)
+
+    service = args.service_ms / 1000.0
+    throughput = args.concurrency / service
+    with patch.object(priority, "MAX_PRIORITY", args.max_priority):
+        campaign_priority = build_message(CAMPAIGN).priority
+        alert_priority = build_message(ALERT).priority
+    print(f"Campaña: {args.bulk} mensajes (priority={campaign_priority}), ~{throughput:.0f} msg/s -> {args.bulk / throughput:.0f}s de drenaje")
+    print(f"Alertas: {args.high_count} (priority={alert_priority}), una cada {args.high_every}s")
+    print(f"Cota esperada con prioridades: ~{(args.prefetch / args.concurrency + 1) * service * 1.5 * 1000:.0f} ms\n")
+    print(f"{'modo':<10}{'p50':>12}{'p99':>12}{'máx':>12}{'drenaje':>12}")
+    for mode, max_priority in (("fifo", 0), ("priority", args.max_priority)):
+        latencies, finished = simulate(
+            max_priority, args.bulk, args.concurrency, args.prefetch, service, args.high_every, args.high_count
+        )
+        print(
+            f"{mode:<10}{_percentile(latencies, 0.5) * 1000:>10.0f}ms{_percentile(latencies, 0.99) * 1000:>10.0f}ms"
+            f"{max(latencies) * 1000:>10.0f}ms{finished:>11.0f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: cálculos de segmentos SMS por segundo
+================================================
+
+Genera `--messages` cuerpos de SMS (códigos de verificación ASCII, avisos con tildes y
+algunos con emoji; `--distinct` textos distintos, como en campañas) y compara:
+
+- carácter a carácter: recorrer el cuerpo contra las tablas GSM-7 en cada envío;
+- regex: `sms_segments.segment_info` sin cache (regex precompiladas, camino ASCII);
+- cacheado: `segment_info` con su LRU, lo que hace el worker.
+
+Uso:
+    python -m benchmarks.sms_segments --messages 200000 --distinct 500
+"""
+
+import time
+import random
+import argparse
+from typing import Callable, List, Optional
+
+from app.channels import sms_segments
+
+
+def per_char(body: str) -> sms_segments.SegmentInfo:
+    costs = []
+    for char in body:
+        if char in sms_segments.GSM_BASIC:
+            costs.append(1)
+        elif char in sms_segments.GSM_EXTENSION:
+            costs.append(2)
+        else:
+            units = len(body.encode("utf-16-le")) // 2
+            single, multi = 70, 67
+            return sms_segments.SegmentInfo(sms_segments.UCS_2, units, 1 if units <= single else -(-units // multi))
+    units = sum(costs)
+    return sms_segments.SegmentInfo(
+        sms_segments.GSM_7, units, 1 if units <= 160 else sms_segments._split(costs, 153)
+    )
+
+
+def bodies(messages: int, distinct: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    templates = [
+        "Your verification code is {n}. It expires in 10 minutes. Do not share it with anyone.",
+        "Hola, tu pedido #{n} fue despachado y llegará mañana entre las 8:00 y las 12:00. Gracias por comprar.",
+        "Recordatorio: tu cita es el {n} a las 3pm [confirma respondiendo SI] 😀",
+        "ALERTA: se detectó un inicio de sesión nuevo en tu cuenta ({n}). Si no fuiste tú, cambia tu contraseña.",
+    ]
+    unique = [rng.choice(templates).format(n=rng.randint(100000, 999999)) for _ in range(distinct)]
+    return [rng.choice(unique) for _ in range(messages)]
+
+
+def measure(compute: Callable[[str], sms_segments.SegmentInfo], items: List[str]) -> float:
+    started = time.perf_counter()
+    for body in items:
+        compute(body)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=500, help="cuerpos distintos")
+    args = parser.parse_args(argv)
+
+    items = bodies(args.messages, args.distinct)
+    old = measure(per_char, items)
+    fast = measure(sms_segments.segment_info.__wrapped__, items)
+    sms_segments.clear_cache()
+    cached = measure(sms_segments.segment_info, items)
+    print(f"mensajes={args.messages} distintos={args.distinct}")
+    print(f"carácter a carácter : {old:>12.0f}/s")
+    print(f"regex, sin cache    : {fast:>12.0f}/s  {fast / old:.1f}x")
+    print(f"cacheado            : {cached:>12.0f}/s  {cached / old:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Benchmark: emails/s con conexión SMTP por mensaje vs. pool de sesiones
+=====================================================================
+
+Levanta un servidor SMTP local (el stand-in de este archivo, o `aiosmtpd` si está
+instalado y se pasa `--aiosmtpd`) y envía `--messages` emails con:
+
+- per-message: el comportamiento anterior de `EmailChannel`: conexión nueva, EHLO, LOGIN,
+  un envío y QUIT por email, en el event loop.
+- pool: `SMTPPool` con `--pool-size` sesiones autenticadas reutilizadas y envíos
+  concurrentes.
+
+El stand-in agrega `--rtt-ms` de latencia a cada respuesta para simular un relay remoto
+(con un servidor local sin latencia la diferencia casi no se ve). No hace TLS: en
+producción el ahorro es mayor porque cada conexión nueva también paga un handshake TLS.
+
+Uso:
+    python -m benchmarks.smtp_throughput --messages 500 --rtt-ms 5 --pool-size 5
+"""
+
+import time
+import socket
+import asyncio
+import smtplib
+import argparse
+import threading
+import socketserver
+from email.mime.text import MIMEText
+from typing import List, Optional
+
+from app.channels.smtp_pool import SMTPPool
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Implementa lo mínimo de SMTP (RFC 5321) para que smtplib pueda enviar"""
+
+    def _reply(self, line: str) -> None:
+        if self.server.rtt:
+            time.sleep(self.server.rtt)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        server = self.server
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with server.lock:
+            server.connections += 1
+        session_messages = 0
+        self._reply("220 stand-in ESMTP")
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode("ascii", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self._reply("250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 stand-in")
+            elif verb == "AUTH":
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb in ("MAIL", "NOOP", "RSET"):
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                if "rechazado" in command:
+                    self._reply("550 5.1.1 Mailbox unavailable")
+                else:
+                    self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                session_messages += 1
+                with server.lock:
+                    server.messages += 1
+                self._reply("250 OK queued")
+                if server.drop_after and session_messages >= server.drop_after:
+                    return  # el servidor corta la sesión sin avisar
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, rtt: float = 0.0, drop_after: int = 0):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.rtt = rtt
+        self.drop_after = drop_after
+        self.connections = 0
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "StandInSMTPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def _message(i: int) -> MIMEText:
+    msg = MIMEText(f"<p>Hola {i}</p>" * 50, "html")
+    msg["From"] = "noreply@example.com"
+    msg["To"] = f"cliente{i}@example.com"
+    msg["Subject"] = f"Prueba {i}"
+    return msg
+
+
+def per_message(port: int, messages: int) -> float:
+    started = time.perf_counter()
+    for i in range(messages):
+        with smtplib.SMTP("127.0.0.1", port) as server:
+            server.login("user", "secret")
+            server.send_message(_message(i))
+    return messages / (time.perf_counter() - started)
+
+
+async def pooled(port: int, messages: int, pool_size: int) -> float:
+    pool = SMTPPool("127.0.0.1", port, "user", "secret", starttls=False, max_size=pool_size, max_messages=10_000)
+    started = time.perf_counter()
+    await asyncio.gather(*(pool.send_message(_message(i)) for i in range(messages)))
+    elapsed = time.perf_counter() - started
+    await pool.close()
+    return messages / elapsed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="latencia por respuesta del stand-in")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--aiosmtpd", action="store_true", help="usar aiosmtpd (sin latencia simulada)")
+    args = parser.parse_args(argv)
+
+    controller = None
+    if args.aiosmtpd:
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+        from aiosmtpd.smtp import AuthResult
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            port = probe.getsockname()[1]
+        controller = Controller(
+            Sink(),
+            hostname="127.0.0.1",
+            port=port,
+            auth_require_tls=False,
+            authenticator=lambda *_: AuthResult(success=True),
+        )
+        controller.start()
+        server = None
+    else:
+        server = StandInSMTPServer(rtt=args.rtt_ms / 1000.0).start()
+        port = server.port
+
+    try:
+        baseline = per_message(port, args.messages)
+        opened = server.connections if server else None
+        pool = asyncio.run(pooled(port, args.messages, args.pool_size))
+        pool_connections = server.connections - opened if server else None
+    finally:
+        if server:
+            server.stop()
+        if controller:
+            controller.stop()
+
+    print(f"mensajes={args.messages} rtt={args.rtt_ms}ms pool={args.pool_size}")
+    print(f"conexión por mensaje : {baseline:8.1f} emails/s  (conexiones: {opened})")
+    print(f"pool de sesiones     : {pool:8.1f} emails/s  (conexiones: {pool_connections})  {pool / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
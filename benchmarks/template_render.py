@@ -0,0 +1,132 @@
+"""
+Benchmark: renders/s de las plantillas de email
+===============================================
+
+Renderiza cada plantilla de `app/templates` con un contexto típico y compara:
+
+- por llamada: el comportamiento anterior de `EmailChannel._render_template`, un
+  `Environment` nuevo por email (lee, parsea y compila la plantilla cada vez);
+- inline por envío: render + `inline_css` del HTML resultante en cada email, lo que habría
+  que hacer sin el build de plantillas;
+- compartido: `app.channels.email_templates`, plantillas compiladas una vez y reutilizadas
+  (con el CSS ya inlineado en la fuente).
+
+También mide el arranque en frío con y sin bytecode cache (lo que paga cada proceso worker
+nuevo al precompilar).
+
+Uso:
+    python -m benchmarks.template_render --renders 2000
+"""
+
+import time
+import tempfile
+import argparse
+from typing import Any, Dict, List, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.channels import email_templates
+from app.channels.css_inliner import inline_css
+
+CONTEXTS: Dict[str, Dict[str, Any]] = {
+    "welcome": {"name": "Ana", "message": "Tu cuenta está lista.", "subject": "Bienvenida"},
+    "registration_confirmation": {
+        "name": "Ana", "username": "ana", "email": "ana@example.com", "service_name": "Portal",
+        "registration_date": "2024-05-01", "verification_required": True, "verification_code": "482913",
+        "login_url": "https://example.com/login", "next_steps": ["Completa tu perfil", "Activa 2FA"],
+        "subject": "Confirma tu registro",
+    },
+    "security_alert": {
+        "name": "Ana", "alert_type": "login", "message": "Nuevo inicio de sesión", "timestamp": "2024-05-01 10:00",
+        "ip_address": "203.0.113.7", "location": "Bogotá", "device_info": "Firefox / Linux",
+        "security_details": {"método": "contraseña", "resultado": "exitoso"},
+        "recommendations": ["Cambia tu contraseña", "Revisa tus sesiones"], "action_required": True,
+        "action_url": "https://example.com/security", "subject": "Alerta de seguridad",
+    },
+    "status_report": {
+        "report_title": "Reporte semanal", "report_period": "Semana 18", "timestamp": "2024-05-01",
+        "metrics": [{"name": f"métrica {i}", "value": i * 10, "status": "ok", "change": i - 2} for i in range(5)],
+        "services_status": {"api": "ok", "worker": "ok", "db": "degradado"},
+        "alerts": [{"message": "Latencia alta", "timestamp": "10:00"}], "recommendations": ["Escalar workers"],
+        "chart_data": {"title": "Throughput"}, "subject": "Reporte",
+    },
+    "system_notification": {
+        "name": "Ana", "title": "Mantenimiento", "message": "Habrá una ventana de mantenimiento.",
+        "status": "info", "timestamp": "2024-05-01", "details": {"inicio": "02:00", "fin": "03:00"},
+        "action_url": "https://example.com/status", "subject": "Aviso",
+    },
+    "promotion": {
+        "title": "Oferta", "offer_description": "2x1 en todo", "discount_percentage": 50, "price": "10",
+        "original_price": "20", "valid_until": "2024-06-01", "features": ["Envío gratis", "Sin cuotas"],
+        "cta_url": "https://example.com/promo", "social_links": {"twitter": "https://x.com/e"},
+        "email": "ana@example.com", "unsubscribe_url": "https://example.com/u", "subject": "Promo",
+    },
+}
+
+
+def per_call(name: str, context: Dict[str, Any], renders: int) -> float:
+    started = time.perf_counter()
+    for _ in range(renders):
+        env = Environment(loader=FileSystemLoader(email_templates.DEFAULT_TEMPLATE_DIR))
+        env.get_template(f"{name}.html").render(**context)
+    return renders / (time.perf_counter() - started)
+
+
+def shared(name: str, context: Dict[str, Any], renders: int) -> float:
+    email_templates.render(name, context)  # compilación fuera de la medición (precompile)
+    started = time.perf_counter()
+    for _ in range(renders):
+        email_templates.render(name, context)
+    return renders / (time.perf_counter() - started)
+
+
+def inline_per_send(name: str, context: Dict[str, Any], renders: int) -> float:
+    template = Environment(loader=FileSystemLoader(email_templates.DEFAULT_TEMPLATE_DIR)).get_template(f"{name}.html")
+    started = time.perf_counter()
+    for _ in range(renders):
+        inline_css(template.render(**context))
+    return renders / (time.perf_counter() - started)
+
+
+def cold_start(cache_dir: Optional[str]) -> float:
+    """Segundos en compilar todas las plantillas con un Environment nuevo (proceso recién arrancado)"""
+    env = Environment(
+        loader=FileSystemLoader(email_templates.DEFAULT_TEMPLATE_DIR),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir) if cache_dir else None,
+    )
+    started = time.perf_counter()
+    for name in env.list_templates(extensions=["html"]):
+        env.get_template(name)
+    return time.perf_counter() - started
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=2000, help="renders por plantilla y modo")
+    args = parser.parse_args(argv)
+
+    print(f"{'plantilla':<28}{'por llamada':>14}{'inline/envío':>14}{'compartido':>14}{'mejora':>9}")
+    total_old = total_inline = total_new = 0.0
+    for name, context in CONTEXTS.items():
+        old = per_call(name, context, max(1, args.renders // 10))
+        inlined = inline_per_send(name, context, max(1, args.renders // 10))
+        new = shared(name, context, args.renders)
+        total_old += 1 / old
+        total_inline += 1 / inlined
+        total_new += 1 / new
+        print(f"{name:<28}{old:>12.0f}/s{inlined:>12.0f}/s{new:>12.0f}/s{new / old:>8.1f}x")
+    count = len(CONTEXTS)
+    print(
+        f"{'(las seis, mezcla)':<28}{count / total_old:>12.0f}/s{count / total_inline:>12.0f}/s"
+        f"{count / total_new:>12.0f}/s{total_old / total_new:>8.1f}x"
+    )
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        without = cold_start(None)
+        cold_start(cache_dir)  # llena el cache
+        with_cache = cold_start(cache_dir)
+    print(f"arranque en frío: {without * 1000:.1f} ms sin bytecode cache, {with_cache * 1000:.1f} ms con cache")
+
+
+if __name__ == "__main__":
+    main()
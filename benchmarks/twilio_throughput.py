@@ -0,0 +1,149 @@
+"""
+Benchmark: SMS/s con un cliente Twilio por mensaje vs. cliente HTTP compartido
+==============================================================================
+
+Levanta una API de Twilio falsa local (`FakeTwilioServer`, HTTP/1.1 con keep-alive) que
+agrega `--latency-ms` a cada respuesta para simular la red hasta Twilio, y envía
+`--messages` SMS con:
+
+- por mensaje: el comportamiento anterior de `SMSChannel`, un `twilio.rest.Client` nuevo y
+  `messages.create` bloqueante por SMS (una conexión por mensaje, en serie);
+- compartido: `app.channels.twilio_api.create_message` sobre el cliente de `http_pool`,
+  con `--concurrency` envíos en vuelo reutilizando las conexiones.
+
+No hace TLS: contra la API real el ahorro es mayor porque cada conexión nueva paga además
+un handshake TLS.
+
+Uso:
+    python -m benchmarks.twilio_throughput --messages 300 --latency-ms 20 --concurrency 20
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from app.channels import twilio_api
+from app.channels.http_pool import close_http_clients
+
+ACCOUNT_SID = "AC00000000000000000000000000000000"
+AUTH_TOKEN = "secret"
+
+
+class _TwilioHandler(BaseHTTPRequestHandler):
+    """Responde como `POST /2010-04-01/Accounts/{sid}/Messages.json`"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        server = self.server
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+        with server.lock:
+            server.requests.append({"path": self.path, "auth": self.headers.get("Authorization"), "form": form})
+        if server.latency:
+            time.sleep(server.latency)
+        if server.fail_status:
+            self._reply(server.fail_status, {"code": 20500, "message": "Internal Server Error"})
+        elif "rechazado" in form.get("To", [""])[0]:
+            self._reply(400, {"code": 21211, "message": "The 'To' number is not a valid phone number."})
+        else:
+            self._reply(201, {"sid": f"SM{uuid.uuid4().hex}", "status": "queued", "to": form["To"][0]})
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class FakeTwilioServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # con el backlog por defecto (5) las conexiones concurrentes esperan un reintento de SYN
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _TwilioHandler)
+        self.latency = latency
+        self.fail_status: Optional[int] = None
+        self.connections = 0
+        self.requests: List[dict] = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeTwilioServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def per_message(url: str, messages: int) -> float:
+    from twilio.rest import Client
+
+    started = time.perf_counter()
+    for i in range(messages):
+        client = Client(ACCOUNT_SID, AUTH_TOKEN)
+        client.api.base_url = url
+        client.messages.create(body=f"Código {i}", from_="+15005550006", to=f"+1555{i:07d}")
+    return messages / (time.perf_counter() - started)
+
+
+async def shared(url: str, messages: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with semaphore:
+            await twilio_api.create_message(
+                ACCOUNT_SID, AUTH_TOKEN, "+15005550006", f"+1555{i:07d}", body=f"Código {i}", api_url=url
+            )
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(send(i) for i in range(messages)))
+        return messages / (time.perf_counter() - started)
+    finally:
+        await close_http_clients()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latencia por respuesta de la API falsa")
+    parser.add_argument("--concurrency", type=int, default=20, help="envíos en vuelo con el cliente compartido")
+    args = parser.parse_args(argv)
+
+    server = FakeTwilioServer(latency=args.latency_ms / 1000.0).start()
+    try:
+        baseline = per_message(server.url, args.messages)
+        opened = server.connections
+        pooled = asyncio.run(shared(server.url, args.messages, args.concurrency))
+        pooled_connections = server.connections - opened
+    finally:
+        server.stop()
+
+    print(f"mensajes={args.messages} latencia={args.latency_ms}ms concurrencia={args.concurrency}")
+    print(f"cliente por mensaje : {baseline:8.1f} SMS/s  (conexiones: {opened})")
+    print(f"cliente compartido  : {pooled:8.1f} SMS/s  (conexiones: {pooled_connections})  {pooled / baseline:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,3 +26,20 @@ def mock_messaging():
             'setup': mock_setup
         }
 
+
+@pytest.fixture
+def worker_db(tmp_path):
+    """BD SQLite temporal para las funciones de persistencia del worker"""
+    from app import worker
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.models import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'worker.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with patch.object(worker, "_get_session_factory", lambda: factory), \
+         patch.object(worker, "dedup_index", worker.DedupIndex(100)), \
+         patch.object(worker, "circuit_breakers", worker.circuit_breakers.__class__()):
+        yield factory
+    engine.dispose()
@@ -0,0 +1,238 @@
+"""
+Pruebas del claim-check: almacén de blobs, publicación de referencias y lectura en el worker.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import pytest
+
+from app import blob_store, codec, worker
+from app.blob_store import BlobNotFoundError, FileSystemBlobStore
+from app.codec import decode_body
+from app.messaging import publish_message as real_publish_message
+from app.retry_router import RetryRouter
+
+BIG_HTML = "<p>" + "Contenido de la campaña. " * 400 + "</p>"
+
+
+@pytest.fixture
+def store(tmp_path):
+    fs_store = FileSystemBlobStore(str(tmp_path / "blobs"))
+    blob_store.set_blob_store(fs_store)
+    yield fs_store
+    blob_store.set_blob_store(None)
+
+
+class TestFileSystemBlobStore:
+    """Tests del almacén direccionado por contenido"""
+
+    def test_identical_bodies_are_stored_once(self, store):
+        key_a = store.put(b"mismo cuerpo", "msg-a")
+        key_b = store.put(b"mismo cuerpo", "msg-b")
+        assert key_a == key_b
+        assert len(list((store.root / key_a[:2]).iterdir())) == 1
+        assert store.get(key_a) == b"mismo cuerpo"
+
+    def test_blob_is_deleted_after_last_release(self, store):
+        key = store.put(b"cuerpo", "msg-a")
+        store.put(b"cuerpo", "msg-b")
+        assert not store.release(key, "msg-a")
+        assert store.exists(key)
+        assert store.release(key, "msg-b")
+        assert not store.exists(key)
+        with pytest.raises(BlobNotFoundError):
+            store.get(key)
+
+    def test_check_in_respects_threshold(self, store):
+        assert blob_store.check_in(b"corto", "msg-a", threshold=100) is None
+        assert blob_store.check_in(b"x" * 200, "msg-a", threshold=0) is None
+        reference = blob_store.check_in(b"x" * 200, "msg-a", threshold=100)
+        assert blob_store.is_reference(reference)
+        assert reference["size"] == 200
+        assert blob_store.check_out(reference) == b"x" * 200
+
+    def test_only_large_message_fields_are_checked_in(self, store):
+        payload = {
+            "destination": {"email": "a@example.com", "sms": "+15551234567"},
+            "message": {"email": BIG_HTML, "sms": "Hola"},
+            "user_id": "u1",
+        }
+        checked_in = blob_store.check_in_payload(payload, "msg-a", threshold=1000)
+        assert checked_in["destination"] == payload["destination"]
+        assert checked_in["message"]["sms"] == "Hola"
+        assert blob_store.references(checked_in) == [checked_in["message"]["email"]]
+        assert payload["message"]["email"] == BIG_HTML  # no modifica el original
+        assert blob_store.check_out_payload(checked_in) == payload
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append(message)
+
+
+class TestPublishMessage:
+    """Tests del API: el texto que supera el umbral viaja como referencia"""
+
+    def _publish(self, store):
+        exchange = FakeExchange()
+
+        class FakeChannel:
+            async def get_exchange(self, name):
+                return exchange
+
+        @asynccontextmanager
+        async def fake_connection():
+            yield FakeChannel()
+
+        payloads = [
+            {"channel": "email", "destination": f"{name}@example.com", "user_id": name, "message": BIG_HTML}
+            for name in ("ana", "beto")
+        ]
+        # Se parchea el módulo real de publish_message (test_main reemplaza `app.messaging` en sys.modules)
+        messaging_globals = real_publish_message.__globals__
+        with patch.dict(messaging_globals, {"_connection_channel": fake_connection}), \
+             patch.object(messaging_globals["aio_pika"], "Message", lambda **kwargs: kwargs), \
+             patch.object(blob_store, "CLAIM_CHECK_THRESHOLD", 4096):
+            for payload in payloads:
+                asyncio.run(real_publish_message("notifications.key", payload))
+        return exchange.published, payloads
+
+    def test_large_message_is_published_as_reference(self, store):
+        (message, _), (payload, _) = self._publish(store)
+        published = json.loads(message["body"])
+        reference = published["message"]
+        assert message["content_encoding"] is None
+        assert blob_store.is_reference(reference)
+        assert published["destination"] == payload["destination"]
+        assert store.get(reference["$claim_check"]).decode("utf-8") == BIG_HTML
+        assert store._refs_dir(reference["$claim_check"]).joinpath(message["message_id"]).exists()
+
+    def test_threshold_applies_to_compressed_size(self, store):
+        # BIG_HTML ocupa ~10 KB pero comprimido queda muy por debajo de los 4096 bytes
+        with patch.object(codec, "COMPRESSION", "zlib"):
+            (message, _), _ = self._publish(store)
+        assert message["content_encoding"] == "deflate"
+        published = json.loads(decode_body(message["body"], "deflate"))
+        assert published["message"] == BIG_HTML
+        assert not (store.root / "refs").exists()
+
+    def test_campaign_recipients_share_one_blob(self, store):
+        messages, _ = self._publish(store)
+        keys = {json.loads(message["body"])["message"]["$claim_check"] for message in messages}
+        assert len(keys) == 1
+        key = keys.pop()
+        assert len(list((store.root / key[:2]).iterdir())) == 1
+        owners = {ref.name for ref in store._refs_dir(key).iterdir()}
+        assert owners == {message["message_id"] for message in messages}
+
+
+class RoutingExchange:
+    def __init__(self):
+        self.messages = []
+
+    async def publish(self, message, routing_key):
+        self.messages.append(message)
+
+
+class FakeIncoming:
+    def __init__(self, payload, message_id, headers=None):
+        self.body = json.dumps(payload).encode("utf-8")
+        self.message_id = message_id
+        self.headers = headers or {}
+
+    async def ack(self):
+        pass
+
+
+def _router():
+    router = RetryRouter(RoutingExchange(), RoutingExchange(), "notifications.key", [5], {1: RoutingExchange()})
+    router.quarantine = RoutingExchange()
+    return router
+
+
+def _capture():
+    def build(body, headers, **properties):
+        return json.loads(decode_body(body, properties.get("content_encoding")))
+
+    return patch("app.retry_router.build_raw_message", build)
+
+
+class TestWorkerClaimCheck:
+    """Tests del worker: descarga perezosa, reintentos con referencia y recolección"""
+
+    PAYLOAD = {"channel": "email", "destination": "a@example.com", "message": BIG_HTML}
+
+    def _reference(self, owner):
+        return blob_store.check_in_payload(self.PAYLOAD, owner, threshold=1)
+
+    def _key(self, reference):
+        return reference["message"]["$claim_check"]
+
+    def test_success_fetches_body_and_releases_blob(self, store):
+        reference = self._reference("msg-1")
+        received = []
+
+        async def process(payload, message_id=None):
+            received.append(payload)
+
+        with patch.object(worker, "_process_one", process):
+            asyncio.run(worker._handle_message(FakeIncoming(reference, "msg-1"), _router()))
+        assert received == [self.PAYLOAD]
+        assert not store.exists(self._key(reference))
+
+    def test_shared_blob_survives_until_every_message_finishes(self, store):
+        first, second = self._reference("msg-1"), self._reference("msg-2")
+
+        async def process(payload, message_id=None):
+            pass
+
+        with patch.object(worker, "_process_one", process):
+            asyncio.run(worker._handle_message(FakeIncoming(first, "msg-1"), _router()))
+            assert store.exists(self._key(first))
+            asyncio.run(worker._handle_message(FakeIncoming(second, "msg-2"), _router()))
+        assert not store.exists(self._key(second))
+
+    def test_retry_carries_reference_and_dlq_gets_full_body(self, store):
+        reference = self._reference("msg-1")
+
+        async def failing(payload, message_id=None):
+            raise ConnectionError("proveedor caído")
+
+        router = _router()
+        with patch.object(worker, "_process_one", failing), _capture():
+            asyncio.run(worker._handle_message(FakeIncoming(reference, "msg-1"), router))
+            assert router.retry_exchanges[1].messages == [reference]
+            assert store.exists(self._key(reference))
+
+            last = FakeIncoming(reference, "msg-1", {"x-retry-count": worker.MAX_RETRIES})
+            asyncio.run(worker._handle_message(last, router))
+        assert router.dlx.messages == [self.PAYLOAD]
+        assert not store.exists(self._key(reference))
+
+    def test_dlq_keeps_blob_when_check_out_keeps_failing(self, store):
+        reference = self._reference("msg-1")
+
+        def unavailable(reference):
+            raise OSError("almacén de blobs no disponible")
+
+        router = _router()
+        last = FakeIncoming(reference, "msg-1", {"x-retry-count": worker.MAX_RETRIES})
+        with patch.object(blob_store, "check_out", unavailable), _capture():
+            asyncio.run(worker._handle_message(last, router))
+        assert router.dlx.messages == [reference]
+        assert store.exists(self._key(reference))
+        assert store._refs_dir(self._key(reference)).joinpath("msg-1").exists()
+
+    def test_missing_blob_is_quarantined(self, store):
+        reference = self._reference("msg-1")
+        store.release(self._key(reference), "msg-1")
+        router = _router()
+        with _capture():
+            asyncio.run(worker._handle_message(FakeIncoming(reference, "msg-1"), router))
+        assert router.quarantine.messages == [reference]
+        assert router.retry_exchanges[1].messages == []
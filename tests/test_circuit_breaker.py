@@ -0,0 +1,82 @@
+"""
+Pruebas del circuit breaker por proveedor que consulta el worker antes de cada envío.
+"""
+from app.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry, CircuitState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **kwargs):
+    options = dict(failure_rate_threshold=0.5, window_size=10, minimum_calls=4, open_seconds=30, half_open_max_calls=1)
+    options.update(kwargs)
+    return CircuitBreaker("sms:twilio", clock=clock, **options)
+
+
+class TestCircuitBreaker:
+    """Tests de transiciones closed -> open -> half_open -> closed"""
+
+    def test_opens_when_failure_rate_exceeded(self):
+        breaker = _breaker(FakeClock())
+        for _ in range(2):
+            breaker.record_success()
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        assert breaker.allow() is False
+
+    def test_needs_minimum_calls_before_opening(self):
+        breaker = _breaker(FakeClock())
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.state == CircuitState.CLOSED
+
+    def test_half_open_allows_limited_probes(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 31
+        assert breaker.state == CircuitState.HALF_OPEN
+        assert breaker.allow() is True
+        assert breaker.allow() is False
+
+    def test_successful_probe_closes_circuit(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 31
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitState.CLOSED
+        assert breaker.failure_rate == 0.0
+
+    def test_failed_probe_reopens_circuit(self):
+        clock = FakeClock()
+        breaker = _breaker(clock)
+        for _ in range(4):
+            breaker.record_failure()
+        clock.now = 31
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitState.OPEN
+        clock.now = 40
+        assert breaker.allow() is False
+
+
+class TestCircuitBreakerRegistry:
+    def test_reports_open_breakers(self):
+        clock = FakeClock()
+        registry = CircuitBreakerRegistry(factory=lambda name: _breaker(clock))
+        breaker = registry.get("email:smtp")
+        assert registry.get("email:smtp") is breaker
+        for _ in range(4):
+            breaker.record_failure()
+        assert registry.any_open()
+        assert registry.describe()["email:smtp"]["state"] == "open"
@@ -0,0 +1,108 @@
+"""
+Pruebas del control adaptativo (AIMD) de concurrencia y prefetch del worker.
+"""
+import asyncio
+
+from app.concurrency import AdaptiveConcurrency
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _controller(clock, **kwargs):
+    options = dict(initial=8, min_limit=2, max_limit=10, target_latency=0.5, error_rate_threshold=0.2, interval=5)
+    options.update(kwargs)
+    return AdaptiveConcurrency(clock=clock, **options)
+
+
+def _window(controller, clock, latency, errors=0, samples=10):
+    for i in range(samples):
+        if i == samples - 1:
+            clock.now += 5
+        controller.record(latency, error=i < errors)
+
+
+class TestAIMD:
+    """Tests de las decisiones de aumento aditivo y disminución multiplicativa"""
+
+    def test_increases_by_one_when_saturated_and_healthy(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        controller._peak = controller.limit
+        _window(controller, clock, latency=0.1)
+        assert controller.limit == 9
+        assert controller.decisions[-1]["action"] == "increase"
+
+    def test_holds_when_not_saturated(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        _window(controller, clock, latency=0.1)
+        assert controller.limit == 8
+
+    def test_halves_on_high_latency(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        _window(controller, clock, latency=2.0)
+        assert controller.limit == 4
+        assert controller.decisions[-1]["action"] == "decrease"
+
+    def test_halves_on_errors_and_respects_bounds(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        _window(controller, clock, latency=0.1, errors=5)
+        _window(controller, clock, latency=0.1, errors=5)
+        _window(controller, clock, latency=0.1, errors=5)
+        assert controller.limit == 2
+
+    def test_fixed_limit_when_not_adaptive(self):
+        clock = FakeClock()
+        controller = _controller(clock, adaptive=False)
+        _window(controller, clock, latency=2.0)
+        assert controller.limit == 8
+
+    def test_listeners_receive_new_limit(self):
+        clock = FakeClock()
+        controller = _controller(clock)
+        changes = []
+        controller.on_change(changes.append)
+        _window(controller, clock, latency=2.0)
+        assert changes == [4]
+
+
+class TestLimiter:
+    """Tests del limitador: nunca más huecos ocupados que el límite actual"""
+
+    def test_waiters_are_released_when_limit_grows(self):
+        async def run():
+            clock = FakeClock()
+            controller = _controller(clock, initial=2)
+            await controller.acquire()
+            await controller.acquire()
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            controller._peak = controller.limit
+            _window(controller, clock, latency=0.1)
+            await asyncio.wait_for(waiter, 1)
+            return controller.in_use
+
+        assert asyncio.run(run()) == 3
+
+    def test_cancelled_waiter_does_not_leak_slot(self):
+        async def run():
+            controller = _controller(FakeClock(), initial=2)
+            await controller.acquire()
+            await controller.acquire()
+            waiter = asyncio.create_task(controller.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            controller.release()
+            return controller.in_use
+
+        assert asyncio.run(run()) == 1
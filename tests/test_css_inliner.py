@@ -0,0 +1,67 @@
+"""
+Pruebas del inline de CSS y minificado de las plantillas de email.
+"""
+from jinja2 import Environment
+
+from app.channels.css_inliner import inline_css
+
+
+def _page(css, body):
+    return f"<html><head><style>{css}</style></head><body>{body}</body></html>"
+
+
+class TestInlineCSS:
+    """Tests de la cascada, las reglas residuales y la preservación de Jinja"""
+
+    def test_descendant_and_child_selectors(self):
+        html = inline_css(_page(
+            ".header h1 { color: red; } ul > li { margin: 0 }",
+            '<div class="header"><h1>T</h1></div><ul><li>a</li></ul><ol><li>b</li></ol>',
+        ))
+        assert '<h1 style="color:red">' in html
+        assert '<ul><li style="margin:0">a</li></ul>' in html
+        assert "<ol><li>b</li></ol>" in html
+        assert "<style>" not in html
+
+    def test_specificity_order_and_inline_style(self):
+        html = inline_css(_page(
+            "p { color: red; font-size: 10px } .a { color: blue } p { font-size: 12px } "
+            ".b { margin: 0 !important }",
+            '<p class="a b" style="color: green; margin: 5px">x</p>',
+        ))
+        assert 'style="font-size:12px;color:green;margin:0"' in html
+
+    def test_unsupported_rules_stay_in_residual_style(self):
+        html = inline_css(_page(
+            ".btn { color: red } .btn:hover { color: blue } @media (max-width: 600px) { .btn { width: 100% } }",
+            '<a class="btn">x</a>',
+        ))
+        assert '<a class="btn" style="color:red">' in html
+        assert ".btn:hover{color: blue}" in html
+        assert "@media" in html
+
+    def test_rules_for_jinja_generated_classes_are_kept(self):
+        html = inline_css(_page(
+            ".status { padding: 2px } .status-ok { color: green }",
+            '<span class="status status-{{status}}">{{ status|upper }}</span>',
+        ))
+        assert 'class="status status-{{status}}" style="padding:2px"' in html
+        assert "<style>.status-ok{color:green}</style>" in html
+
+    def test_jinja_and_entities_survive_and_compile(self):
+        source = _page(
+            "td { padding: 1px }",
+            "<!-- comentario -->\n  <table>{% for m in metrics %}<tr><td>{{ m.name }} &amp; "
+            "{% if m.change > 0 %}sube{% endif %}</td></tr>{% endfor %}</table>  {{ x or 'a   b' }}",
+        )
+        html = inline_css(source)
+        assert "comentario" not in html
+        assert "{{ x or 'a   b' }}" in html
+        rendered = Environment().from_string(html).render(metrics=[{"name": "cpu", "change": 1}], x=None)
+        assert '<td style="padding:1px">cpu &amp; sube</td>' in rendered
+        assert "a   b" in rendered
+
+    def test_minify_false_keeps_whitespace(self):
+        html = "<p>\n  hola\n</p>"
+        assert inline_css(html, minify=False) == html
+        assert inline_css(html) == "<p> hola </p>"
@@ -0,0 +1,183 @@
+"""
+Pruebas de la inspección y el replay de la DLQ sin broker real.
+"""
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app import dlq
+from app.dlq import DLQFilter
+
+
+class FakeDLQMessage:
+    def __init__(self, payload, headers=None, message_id=None):
+        self.body = json.dumps(payload).encode("utf-8")
+        self.headers = headers or {}
+        self.message_id = message_id
+        self.priority = None
+        self.state = "held"
+
+    async def ack(self):
+        self.state = "acked"
+
+    async def nack(self, requeue=True):
+        self.state = "requeued" if requeue else "dropped"
+
+
+class FakeDLQ:
+    """Cola con semántica de basic.get: lo no confirmado no se vuelve a entregar"""
+
+    def __init__(self, messages):
+        self.pending = list(messages)
+
+    async def get(self, no_ack=False, fail=True):
+        return self.pending.pop(0) if self.pending else None
+
+
+class FakeExchange:
+    def __init__(self, fail_for=()):
+        self.published = []
+        self.fail_for = set(fail_for)
+
+    async def publish(self, message, routing_key):
+        if message["message_id"] in self.fail_for:
+            raise ConnectionError("sin confirmación del broker")
+        self.published.append(message)
+
+
+class FakeChannel:
+    def __init__(self, messages, exchange=None):
+        self.queue = FakeDLQ(messages)
+        self.exchange = exchange or FakeExchange()
+
+    async def get_queue(self, name):
+        assert name == dlq.DLQ_NAME
+        return self.queue
+
+    async def get_exchange(self, name):
+        return self.exchange
+
+
+def _fake_build(body, headers, **properties):
+    return {"body": body, "headers": headers, **properties}
+
+
+@pytest.fixture(autouse=True)
+def plain_messages():
+    with patch.object(dlq, "build_raw_message", _fake_build):
+        yield
+
+
+def _failed(channel, error, age, message_id, retries=3):
+    headers = {
+        "x-retry-count": retries,
+        "x-final-failure": True,
+        "x-error": error,
+        "x-failed-at": time.time() - age,
+        "x-message-id": message_id,
+    }
+    return FakeDLQMessage({"channel": channel, "destination": "x", "message": "hola"}, headers, message_id)
+
+
+class TestDLQFilter:
+    """Tests de los filtros por canal, error y antigüedad"""
+
+    def test_channel_error_and_age(self):
+        message = _failed("sms", "TimeoutError: timeout del proveedor", age=7200, message_id="m1")
+        headers, payload = message.headers, json.loads(message.body)
+        now = time.time()
+        assert DLQFilter(channel="SMS", error="timeout", min_age=3600).matches(payload, headers, now)
+        assert not DLQFilter(channel="email").matches(payload, headers, now)
+        assert not DLQFilter(error="401").matches(payload, headers, now)
+        assert not DLQFilter(max_age=60).matches(payload, headers, now)
+
+    def test_multichannel_payload_matches_any_destination(self):
+        payload = {"destination": {"email": "a@example.com", "sms": None, "push": "token"}}
+        assert DLQFilter(channel="push").matches(payload, {}, time.time())
+        assert not DLQFilter(channel="sms").matches(payload, {}, time.time())
+
+
+class TestInspect:
+    """Tests de la inspección: lista coincidencias y deja todo en la DLQ"""
+
+    def test_lists_matches_and_requeues_everything(self):
+        messages = [_failed("sms", "timeout", 10, "m1"), _failed("email", "timeout", 10, "m2")]
+        found = asyncio.run(dlq.inspect_dlq(FakeChannel(messages), DLQFilter(channel="sms")))
+        assert [item["message_id"] for item in found] == ["m1"]
+        assert found[0]["error"] == "timeout"
+        assert all(m.state == "requeued" for m in messages)
+
+
+class TestReplay:
+    """Tests del replay: reinicia reintentos, confirma y respeta filtros y ritmo"""
+
+    def test_replays_matches_and_resets_retry_headers(self):
+        messages = [_failed("sms", "timeout", 10, "m1"), _failed("email", "timeout", 10, "m2")]
+        channel = FakeChannel(messages)
+        progress = asyncio.run(dlq.replay_dlq(channel, DLQFilter(channel="sms"), rate=1000))
+
+        assert (progress.scanned, progress.matched, progress.replayed) == (2, 1, 1)
+        assert progress.finished
+        assert [m.state for m in messages] == ["acked", "requeued"]
+        headers = channel.exchange.published[0]["headers"]
+        assert "x-retry-count" not in headers and "x-final-failure" not in headers
+        assert headers["x-replay-count"] == 1
+        assert headers["x-message-id"] == "m1"
+
+    def test_unconfirmed_publish_stays_in_dlq(self):
+        messages = [_failed("sms", "timeout", 10, "m1"), _failed("sms", "timeout", 10, "m2")]
+        channel = FakeChannel(messages, FakeExchange(fail_for={"m2"}))
+        progress = asyncio.run(dlq.replay_dlq(channel, rate=1000))
+        assert (progress.replayed, progress.failed) == (1, 1)
+        assert [m.state for m in messages] == ["acked", "requeued"]
+
+    def test_failed_ack_does_not_nack_settled_messages(self):
+        messages = [_failed("sms", "timeout", 10, f"m{i}") for i in range(3)]
+        nacked = []
+
+        async def broken_ack():
+            raise ConnectionError("canal cerrado")
+
+        messages[1].ack = broken_ack
+        for message in messages:
+            original = message.nack
+
+            async def nack(requeue=True, message=message, original=original):
+                nacked.append(message.message_id)
+                await original(requeue)
+
+            message.nack = nack
+
+        with pytest.raises(ConnectionError):
+            asyncio.run(dlq.replay_dlq(FakeChannel(messages), rate=1000))
+        # m0 ya tenía ack: sólo se devuelven a la cola el del ack fallido y el pendiente
+        assert messages[0].state == "acked"
+        assert nacked == ["m1", "m2"]
+
+    def test_dry_run_publishes_nothing(self):
+        messages = [_failed("sms", "timeout", 10, f"m{i}") for i in range(3)]
+        channel = FakeChannel(messages)
+        progress = asyncio.run(dlq.replay_dlq(channel, dry_run=True))
+        assert progress.matched == 3 and progress.replayed == 0
+        assert channel.exchange.published == []
+        assert all(m.state == "requeued" for m in messages)
+
+    def test_limit_and_rate_pace_batches(self):
+        messages = [_failed("sms", "timeout", 10, f"m{i}") for i in range(10)]
+        channel = FakeChannel(messages)
+        reports = []
+
+        async def run():
+            started = time.monotonic()
+            await dlq.replay_dlq(channel, limit=8, batch_size=4, rate=40, on_progress=lambda p: reports.append(p.replayed))
+            return time.monotonic() - started
+
+        elapsed = asyncio.run(run())
+        # El primer lote sale con la ráfaga del bucket; el segundo espera 4/40 s
+        assert elapsed >= 0.09
+        assert len(channel.exchange.published) == 8
+        assert reports[:2] == [4, 8]
+        assert [m.state for m in messages[8:]] == ["held", "held"]
@@ -0,0 +1,117 @@
+"""
+Pruebas del envío de emails en lote agrupado por dominio, contra un servidor SMTP local.
+"""
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app import worker
+from app.batching import Coalescer
+from app.channels.email import EmailChannel
+from app.channels.smtp_pool import close_smtp_pools
+from app.models import NotificationChannel
+from app.tracing import MessageTrace
+from benchmarks.smtp_throughput import StandInSMTPServer
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTPServer().start()
+    yield server
+    server.stop()
+
+
+def _channel(server, **config):
+    return EmailChannel({"smtp_host": "127.0.0.1", "smtp_port": server.port, "smtp_starttls": False, **config})
+
+
+def _run(coro):
+    """Ejecuta `coro` y cierra las sesiones SMTP de ese event loop"""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_smtp_pools()
+    return asyncio.run(_main())
+
+
+def _emails(*destinations):
+    return [(destination, "<p>hola</p>", "Campaña") for destination in destinations]
+
+
+class TestSendBatch:
+    """Tests de EmailChannel.send_batch"""
+
+    def test_groups_by_domain_with_one_session_each(self, smtp_server):
+        emails = _emails("a@uno.com", "b@dos.com", "c@uno.com", "d@dos.com", "e@uno.com")
+        results = _run(_channel(smtp_server).send_batch(emails))
+        assert [r.destination for r in results] == [e[0] for e in emails]
+        assert all(r.success for r in results)
+        assert smtp_server.messages == 5
+        assert smtp_server.connections == 2
+
+    def test_invalid_and_rejected_recipients_do_not_stop_the_batch(self, smtp_server):
+        emails = _emails("no-es-un-email", "rechazado@uno.com", "ok@uno.com")
+        results = _run(_channel(smtp_server).send_batch(emails))
+        assert [r.success for r in results] == [False, False, True]
+        assert results[0].permanent and results[1].permanent
+        with pytest.raises(ValueError):
+            results[1].raise_for_error()
+        assert smtp_server.connections == 1
+
+    def test_domain_concurrency_limits_parallel_sessions(self, smtp_server):
+        emails = _emails(*(f"u{i}@uno.com" for i in range(6)))
+        _run(_channel(smtp_server, smtp_batch_session_size=2, smtp_domain_concurrency=1).send_batch(emails))
+        assert smtp_server.connections == 1
+
+        smtp_server.connections = 0
+        _run(_channel(smtp_server, smtp_batch_session_size=2, smtp_domain_concurrency=3).send_batch(emails))
+        assert smtp_server.connections == 3
+
+    def test_domain_rate_paces_sends(self, smtp_server):
+        emails = _emails(*(f"u{i}@uno.com" for i in range(6)))
+        started = time.monotonic()
+        _run(_channel(smtp_server, smtp_domain_rate=4).send_batch(emails))
+        # 4 de ráfaga y 2 más a 4 por segundo
+        assert time.monotonic() - started >= 0.45
+
+    def test_dropped_session_continues_on_a_new_one(self, smtp_server):
+        smtp_server.drop_after = 2
+        results = _run(_channel(smtp_server).send_batch(_emails(*(f"u{i}@uno.com" for i in range(4)))))
+        assert all(r.success for r in results)
+        assert smtp_server.messages == 4
+
+
+class TestWorkerEmailAggregation:
+    """Tests del worker: emails simultáneos al mismo relay salen en un solo lote"""
+
+    def test_concurrent_sends_share_a_batch(self, smtp_server, worker_db):
+        from app.worker_metrics import metrics
+
+        def batches():
+            return metrics.snapshot()["counters"].get("email_batches_total", 0)
+
+        before = batches()
+
+        async def run():
+            # La agrupación es opt-in (ventana 0 por defecto); aquí se activa
+            batcher = Coalescer(worker._flush_email, max_batch=200, window=0.05, name="email")
+            with patch.object(worker, "EMAIL_BATCH_WINDOW", 0.05), patch.object(worker, "email_batcher", batcher):
+                await asyncio.gather(*(
+                    worker._throttle_and_send(
+                        NotificationChannel.EMAIL,
+                        _channel(smtp_server),
+                        f"cliente{i}@example.com",
+                        "<p>hola</p>",
+                        "Prueba",
+                        MessageTrace(),
+                    )
+                    for i in range(4)
+                ))
+
+        _run(run())
+        assert batches() == before + 1
+        assert smtp_server.messages == 4
+        assert smtp_server.connections == 1
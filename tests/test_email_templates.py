@@ -0,0 +1,68 @@
+"""
+Pruebas del Environment compartido de plantillas de email.
+"""
+import pytest
+
+from app.channels import email_templates
+from app.channels.email import EmailChannel
+
+
+@pytest.fixture(autouse=True)
+def fresh_environments():
+    email_templates.reset()
+    yield
+    email_templates.reset()
+
+
+def _write_template(tmp_path, name, body):
+    (tmp_path / f"{name}.html").write_text(body, encoding="utf-8")
+
+
+class TestEmailTemplates:
+    """Tests de compilación única, precompilado y resolución del directorio"""
+
+    def test_environment_is_shared_per_directory(self, tmp_path):
+        assert email_templates.get_environment(str(tmp_path)) is email_templates.get_environment(str(tmp_path))
+        assert email_templates.get_environment(str(tmp_path)) is not email_templates.get_environment()
+
+    def test_template_is_compiled_once(self, tmp_path):
+        _write_template(tmp_path, "saludo", "Hola {{ name }}")
+        first = email_templates.get_template("saludo", str(tmp_path))
+        assert email_templates.get_template("saludo.html", str(tmp_path)) is first
+        assert email_templates.render("saludo", {"name": "Ana"}, str(tmp_path)) == "Hola Ana"
+
+    def test_precompile_loads_every_shipped_template(self):
+        loaded = email_templates.precompile()
+        assert len(loaded) == 6
+        assert "welcome.html" in loaded
+
+    def test_precompile_skips_broken_templates(self, tmp_path):
+        _write_template(tmp_path, "ok", "{{ a }}")
+        _write_template(tmp_path, "roto", "{% if %}")
+        assert email_templates.precompile(str(tmp_path)) == ["ok.html"]
+
+    def test_templates_are_built_with_inline_css(self):
+        html = email_templates.render("security_alert", {"name": "Ana", "message": "Nuevo acceso"})
+        assert 'class="header" style="background:' in html
+        assert "<style>" not in html and "\n" not in html
+
+    def test_build_runs_once_per_template_version(self, tmp_path):
+        for version in ("a", "b"):  # otro Environment con la misma fuente
+            (tmp_path / version).mkdir()
+            _write_template(tmp_path / version, "v", "<style>p { color: red }</style><p>{{ n }}</p>")
+            email_templates.precompile(str(tmp_path / version))
+        assert email_templates.build_source.cache_info().hits == 1
+        assert email_templates.render("v", {"n": 1}, str(tmp_path / "a")) == '<p style="color:red">1</p>'
+
+    def test_relative_dir_from_channel_config_is_resolved(self):
+        assert email_templates.resolve_template_dir("app/templates") == email_templates.resolve_template_dir()
+
+    def test_channel_renders_through_shared_environment(self):
+        channel = EmailChannel({"smtp_host": "localhost", "template_dir": "app/templates"})
+        html = channel._render_template("welcome", {"name": "Ana", "message": "hola", "subject": "Hi"})
+        assert "¡Bienvenido Ana!" in html
+        assert email_templates.get_environment("app/templates").cache
+
+    def test_channel_falls_back_to_message_for_unknown_template(self):
+        channel = EmailChannel({"smtp_host": "localhost"})
+        assert channel._render_template("no_existe", {"message": "texto"}) == "texto"
@@ -153,6 +153,31 @@ class TestNotificationsEndpoint:
         response = client.post("/v1/notifications", json=payload)
         assert response.status_code == 200
 
+    def test_notify_template_without_message(self, client, mock_publish):
+        """Test que acepta plantilla + contexto en lugar del HTML (lo renderiza el worker)"""
+        payload = {
+            "channel": "email",
+            "destination": "test@example.com",
+            "template": "welcome",
+            "context": {"name": "Ana"}
+        }
+
+        response = client.post("/v1/notifications", json=payload)
+        assert response.status_code == 200
+        assert mock_publish.await_args.kwargs["payload"]["template"] == "welcome"
+
+    def test_notify_template_only_for_email(self, client):
+        """Test que rechaza plantillas en canales que no son email"""
+        payload = {
+            "channel": "sms",
+            "destination": "+573001234567",
+            "template": "welcome"
+        }
+
+        response = client.post("/v1/notifications", json=payload)
+        assert response.status_code == 400
+        assert "template" in response.json()["detail"]
+
 
 class TestMultiNotificationsEndpoint:
     """Tests para el endpoint /v1/notifications/multi"""
@@ -270,6 +295,47 @@ class TestErrorHandling:
         assert response.status_code >= 400
 
 
+
+class TestDLQAdmin:
+    """Tests de los endpoints /v1/admin/dlq: sólo administradores y registro de replays acotado"""
+
+    @pytest.fixture
+    def as_user(self):
+        from app import auth
+
+        def _login(username):
+            app.dependency_overrides[auth.verify_token] = lambda: username
+        yield _login
+        app.dependency_overrides.clear()
+
+    def test_non_admin_is_forbidden(self, client, as_user):
+        as_user("operador")
+        assert client.get("/v1/admin/dlq").status_code == 403
+        assert client.post("/v1/admin/dlq/replay", json={}).status_code == 403
+        assert client.get("/v1/admin/dlq/replay/abc").status_code == 403
+
+    def test_admin_can_inspect(self, client, as_user):
+        as_user("admin")
+        with patch('app.main.dlq.inspect', new_callable=AsyncMock, return_value=[]):
+            response = client.get("/v1/admin/dlq")
+        assert response.status_code == 200
+        assert response.json()["count"] == 0
+
+    def test_finished_replays_are_evicted(self):
+        import time
+        from app import dlq, main
+
+        old, recent, running = dlq.ReplayProgress(), dlq.ReplayProgress(), dlq.ReplayProgress()
+        old.finished, old.finished_at = True, time.time() - main.DLQ_REPLAY_TTL - 1
+        recent.finished, recent.finished_at = True, time.time()
+        with patch.dict(main._dlq_replays, {"old": old, "recent": recent, "running": running}, clear=True):
+            main._prune_dlq_replays()
+            assert set(main._dlq_replays) == {"recent", "running"}
+            with patch.object(main, "DLQ_REPLAY_MAX", 2):
+                main._prune_dlq_replays()
+                assert set(main._dlq_replays) == {"running"}
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
@@ -0,0 +1,63 @@
+"""
+Pruebas de los esqueletos MIME reutilizables.
+"""
+import email
+from email.header import decode_header, make_header
+
+import pytest
+
+from app.channels import mime_cache
+from app.channels.email import EmailChannel
+
+HTML = "<p>Oferta de temporada: ¡50% en todo!</p>" * 20
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    mime_cache.clear()
+    yield
+    mime_cache.clear()
+
+
+def _parse(data):
+    return email.message_from_bytes(data)
+
+
+class TestPreparedMessage:
+    """Tests del mensaje preparado una vez y estampado por destinatario"""
+
+    def test_wire_bytes_round_trip(self):
+        prepared = mime_cache.get_prepared("Servicio <noreply@example.com>", "Campaña", HTML, "example.com")
+        msg = _parse(prepared.for_recipient("ana@example.com"))
+        assert msg["To"] == "ana@example.com"
+        assert msg["From"] == "Servicio <noreply@example.com>"
+        assert str(make_header(decode_header(msg["Subject"]))) == "Campaña"
+        assert msg["Message-ID"].endswith("@example.com>")
+        part = msg.get_payload()[0]
+        assert part.get_content_type() == "text/html"
+        assert part.get_payload(decode=True).decode("utf-8") == HTML
+
+    def test_only_recipient_headers_change(self):
+        prepared = mime_cache.get_prepared("a <a@example.com>", "Hola", HTML)
+        first, second = prepared.for_recipient("uno@example.com"), prepared.for_recipient("dos@example.com")
+        assert first.split(b"\r\nTo: ")[0] == second.split(b"\r\nTo: ")[0]
+        assert first.partition(b"\r\n\r\n")[2] == second.partition(b"\r\n\r\n")[2]
+        assert _parse(first)["Message-ID"] != _parse(second)["Message-ID"]
+        assert b"\n" not in first.replace(b"\r\n", b"")
+
+    def test_same_body_and_subject_are_prepared_once(self):
+        first = mime_cache.get_prepared("a <a@example.com>", "Hola", HTML)
+        assert mime_cache.get_prepared("a <a@example.com>", "Hola", HTML) is first
+        assert mime_cache.get_prepared("a <a@example.com>", "Otro", HTML) is not first
+
+    def test_header_injection_is_rejected(self):
+        prepared = mime_cache.get_prepared("a <a@example.com>", "Hola", HTML)
+        with pytest.raises(ValueError):
+            prepared.for_recipient("ana@example.com\r\nBcc: otro@example.com")
+
+    def test_channel_builds_from_shared_skeleton(self):
+        channel = EmailChannel({"smtp_host": "localhost", "from_email": "noreply@example.com", "from_name": "Servicio"})
+        data = channel._build_message("ana@example.com", HTML, "Campaña")
+        channel._build_message("luis@example.com", HTML, "Campaña")
+        assert len(mime_cache._prepared) == 1
+        assert _parse(data)["To"] == "ana@example.com"
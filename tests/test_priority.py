@@ -0,0 +1,89 @@
+"""
+Pruebas de prioridades: mapeo del campo `priority` y propagación a los mensajes AMQP.
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from app import retry_router
+from app.priority import PRIORITY_LEVELS, resolve_priority
+
+
+@pytest.fixture(autouse=True)
+def priorities_enabled():
+    """Las prioridades son opt-in (AMQP_MAX_PRIORITY=0 por defecto); aquí se activan"""
+    with patch("app.priority.MAX_PRIORITY", 10):
+        yield
+
+
+class TestResolvePriority:
+    """Tests del mapeo payload -> prioridad AMQP"""
+
+    def test_named_levels(self):
+        assert resolve_priority({"priority": "high"}) == PRIORITY_LEVELS["high"]
+        assert resolve_priority({"priority": "LOW"}) == PRIORITY_LEVELS["low"]
+
+    def test_default_is_normal(self):
+        assert resolve_priority({}) == PRIORITY_LEVELS["normal"]
+
+    def test_template_default(self):
+        assert resolve_priority({"template": "security_alert.html"}) == PRIORITY_LEVELS["high"]
+        assert resolve_priority({"template": "promotion"}) == PRIORITY_LEVELS["low"]
+        # Un `priority` explícito manda sobre la plantilla
+        assert resolve_priority({"template": "promotion", "priority": "high"}) == PRIORITY_LEVELS["high"]
+
+    def test_integer_is_capped(self):
+        with patch("app.priority.MAX_PRIORITY", 10):
+            assert resolve_priority({"priority": 3}) == 3
+            assert resolve_priority({"priority": 200}) == 10
+
+    def test_invalid_priority(self):
+        with pytest.raises(ValueError):
+            resolve_priority({"priority": "urgente"})
+        with pytest.raises(ValueError):
+            resolve_priority({"priority": -1})
+
+    def test_disabled(self):
+        with patch("app.priority.MAX_PRIORITY", 0):
+            assert resolve_priority({"priority": "high"}) is None
+
+
+    def test_opt_in_by_default(self, monkeypatch):
+        # Una cola existente sin x-max-priority no se redeclara con el argumento
+        import importlib
+        from app import priority
+
+        monkeypatch.delenv("AMQP_MAX_PRIORITY", raising=False)
+        try:
+            assert importlib.reload(priority).MAX_PRIORITY == 0
+        finally:
+            importlib.reload(priority)
+
+
+class TestMessagePriority:
+    """Tests de la prioridad en los mensajes que publica el worker"""
+
+    def test_retry_keeps_priority(self):
+        with patch.object(retry_router.aio_pika, "Message") as message_cls:
+            retry_router.build_message({"priority": "high"}, {"x-retry-count": 1})
+        assert message_cls.call_args.kwargs["priority"] == PRIORITY_LEVELS["high"]
+
+    def test_invalid_priority_does_not_block_dlq(self):
+        with patch.object(retry_router.aio_pika, "Message") as message_cls:
+            retry_router.build_message({"priority": "urgente"}, {"x-final-failure": True})
+        assert message_cls.call_args.kwargs["priority"] is None
+
+
+class TestPriorityLanesBenchmark:
+    """La simulación del benchmark: las alertas no esperan al backlog de la campaña"""
+
+    def test_priority_latency_is_bounded(self):
+        from benchmarks.priority_lanes import simulate
+
+        # aio_pika está simulado en los tests: el mensaje conserva las propiedades que recibe
+        with patch.object(retry_router.aio_pika, "Message", lambda **kwargs: SimpleNamespace(**kwargs)):
+            fifo, _ = simulate(0, 20000, concurrency=10, prefetch=10, service=0.02, high_every=1.0, high_count=10)
+            prio, _ = simulate(10, 20000, concurrency=10, prefetch=10, service=0.02, high_every=1.0, high_count=10)
+        assert max(prio) < 0.1
+        assert min(fifo) > 10 * max(prio)
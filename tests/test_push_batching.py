@@ -0,0 +1,269 @@
+"""
+Pruebas del envío push en lotes: API HTTP v1 de FCM contra un servidor falso local y agrupación en el worker.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+from app import worker
+from app.batching import Coalescer
+from app.channels import fcm_auth
+from app.channels.http_pool import close_http_clients
+from app.channels.push import PushChannel
+
+
+class _FakeFCMHandler(BaseHTTPRequestHandler):
+    """Responde como la API HTTP v1 de FCM (un token por petición) y su endpoint de tokens"""
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/token":
+            form = parse_qs(raw.decode("ascii"))
+            self.server.assertions.append(form["assertion"][0])
+            return self._reply(200, {"access_token": f"oauth-{len(self.server.assertions)}", "expires_in": 3600})
+
+        body = json.loads(raw)
+        self.server.requests.append({"path": self.path, "auth": self.headers.get("Authorization"), "body": body})
+        if self.server.fail_status:
+            return self._reply(self.server.fail_status, None)
+        token = body["message"]["token"]
+        if token.startswith("bad"):
+            self._reply(404, _fcm_error(404, "NOT_FOUND", "UNREGISTERED"))
+        elif token.startswith("flaky"):
+            self._reply(503, _fcm_error(503, "UNAVAILABLE", "UNAVAILABLE"))
+        elif token.startswith("garbled"):
+            self._reply(200, b"<html>proxy</html>")
+        else:
+            self._reply(200, {"name": f"projects/demo/messages/{token}"})
+
+    def _reply(self, status, content):
+        data = content if isinstance(content, bytes) else json.dumps(content).encode("utf-8") if content else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _fcm_error(code, status, error_code):
+    return {"error": {"code": code, "status": status, "details": [
+        {"@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError", "errorCode": error_code},
+    ]}}
+
+
+@pytest.fixture
+def fake_fcm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeFCMHandler)
+    server.request_queue_size = 128
+    server.requests = []
+    server.assertions = []
+    server.fail_status = None
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    server.url = f"{base}/v1/projects/demo/messages:send"
+    server.token_uri = f"{base}/token"
+    yield server
+    server.shutdown()
+    server.server_close()
+    fcm_auth.clear_cache()
+
+
+def _push_channel(fake_fcm, **config):
+    return PushChannel({"fcm_url": fake_fcm.url, "fcm_access_token": "test-token", "firebase_project_id": "demo", **config})
+
+
+def _run(coro):
+    """Ejecuta `coro` y cierra los clientes HTTP compartidos de ese event loop"""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_http_clients()
+    return asyncio.run(_main())
+
+
+def _tokens(n, prefix="token"):
+    return [f"{prefix}-{i:06d}" for i in range(n)]
+
+
+class TestPushFanOut:
+    """Tests de PushChannel.send_multicast contra el FCM v1 falso"""
+
+    def test_one_request_per_token(self, fake_fcm):
+        tokens = _tokens(120)
+        results = _run(_push_channel(fake_fcm, max_concurrent_requests=10).send_multicast(tokens, {"title": "t", "body": "b"}))
+
+        assert len(fake_fcm.requests) == 120
+        assert {r["path"] for r in fake_fcm.requests} == {"/v1/projects/demo/messages:send"}
+        assert {r["auth"] for r in fake_fcm.requests} == {"Bearer test-token"}
+        assert sorted(r["body"]["message"]["token"] for r in fake_fcm.requests) == tokens
+        assert [r.token for r in results] == tokens
+        assert all(r.success for r in results)
+        assert results[0].message_id == "projects/demo/messages/token-000000"
+
+    def test_default_url_is_v1(self):
+        channel = PushChannel({"firebase_project_id": "mi-proyecto"})
+        assert channel.fcm_url == "https://fcm.googleapis.com/v1/projects/mi-proyecto/messages:send"
+
+    def test_per_token_errors_are_mapped(self, fake_fcm):
+        tokens = ["token-ok-000001", "bad-token-00001", "flaky-token-001", "garbled-token-1"]
+        results = _run(_push_channel(fake_fcm).send_multicast(tokens, {"title": "t", "body": "b"}))
+
+        assert [r.success for r in results] == [True, False, False, False]
+        assert results[1].error == "UNREGISTERED"
+        with pytest.raises(ValueError):
+            results[1].raise_for_error()
+        # 5xx y un 200 ilegible son transitorios
+        for result in results[2:]:
+            with pytest.raises(ConnectionError):
+                result.raise_for_error()
+
+    def test_http_error_without_body(self, fake_fcm):
+        fake_fcm.fail_status = 503
+        results = _run(_push_channel(fake_fcm).send_multicast(_tokens(3), {"title": "t", "body": "b"}))
+        assert all(not r.success and r.error == "HTTP 503" for r in results)
+
+    def test_data_values_are_strings(self, fake_fcm):
+        payload = {"title": "t", "body": "b", "data": {"order": 42, "tag": "x"}}
+        _run(_push_channel(fake_fcm).send_multicast(_tokens(1), payload))
+        assert fake_fcm.requests[0]["body"]["message"]["data"] == {"order": "42", "tag": "x"}
+
+    def test_send_to_multiple_fans_out(self, fake_fcm):
+        results = _run(_push_channel(fake_fcm).send_to_multiple(_tokens(10), "t", "b"))
+        assert len(fake_fcm.requests) == 10
+        assert len(results) == 10
+
+
+class TestServiceAccountAuth:
+    """Tests del token OAuth2 obtenido de la cuenta de servicio"""
+
+    @pytest.fixture
+    def service_account(self, fake_fcm):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode("ascii")
+        public = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode("ascii")
+        info = {"client_email": "push@demo.iam.gserviceaccount.com", "private_key": pem, "token_uri": fake_fcm.token_uri}
+        return json.dumps(info), public
+
+    def test_token_is_signed_and_cached(self, fake_fcm, service_account):
+        key, public = service_account
+        channel = _push_channel(fake_fcm, fcm_access_token="", firebase_service_account_key=key)
+
+        async def run():
+            await channel.send_multicast(_tokens(3), {"title": "t", "body": "b"})
+            await channel.send_multicast(_tokens(2), {"title": "t", "body": "b"})
+
+        _run(run())
+        assert len(fake_fcm.assertions) == 1
+        claims = jwt.decode(fake_fcm.assertions[0], public, algorithms=["RS256"], audience=fake_fcm.token_uri)
+        assert claims["iss"] == "push@demo.iam.gserviceaccount.com"
+        assert claims["scope"] == fcm_auth.FCM_SCOPE
+        assert {r["auth"] for r in fake_fcm.requests} == {"Bearer oauth-1"}
+
+    def test_invalid_service_account(self):
+        with pytest.raises(ValueError):
+            fcm_auth.service_account_token('{"type": "service_account"}')
+
+
+class TestCoalescer:
+    """Tests del agrupador genérico de envíos"""
+
+    def test_concurrent_submits_share_one_flush(self):
+        calls = []
+
+        async def flush(key, items):
+            calls.append((key, list(items)))
+            return [item * 2 for item in items]
+
+        async def run():
+            coalescer = Coalescer(flush, max_batch=100, window=0.02)
+            return await asyncio.gather(*(coalescer.submit("k", i) for i in range(30)))
+
+        assert asyncio.run(run()) == [i * 2 for i in range(30)]
+        assert len(calls) == 1
+
+    def test_max_batch_and_group_keys(self):
+        calls = []
+
+        async def flush(key, items):
+            calls.append((key, len(items)))
+            return items
+
+        async def run():
+            coalescer = Coalescer(flush, max_batch=10, window=0.02)
+            await asyncio.gather(
+                *(coalescer.submit("a", i) for i in range(25)),
+                *(coalescer.submit("b", i) for i in range(3)),
+            )
+
+        asyncio.run(run())
+        assert sorted(calls) == [("a", 5), ("a", 10), ("a", 10), ("b", 3)]
+
+    def test_flush_error_reaches_every_caller(self):
+        async def flush(key, items):
+            raise ConnectionError("proveedor caído")
+
+        async def run():
+            coalescer = Coalescer(flush, window=0.01)
+            return await asyncio.gather(*(coalescer.submit("k", i) for i in range(3)), return_exceptions=True)
+
+        assert all(isinstance(r, ConnectionError) for r in asyncio.run(run()))
+
+
+class TestWorkerPushAggregation:
+    """Tests del worker: mensajes push individuales se despachan en un solo lote"""
+
+    def test_individual_messages_are_coalesced(self, worker_db, fake_fcm):
+        from app.models import Notification, NotificationStatus
+
+        channel = _push_channel(fake_fcm)
+        tokens = _tokens(20) + ["bad-token-00001"]
+
+        flushes = []
+
+        async def flush(key, items):
+            flushes.append(len(items))
+            return await worker._flush_push(key, items)
+
+        async def run():
+            # Las filas se insertan en hilos: el lote sale al llegar el mensaje 21 y la ventana
+            # larga sólo evita que la BD lenta lo parta en dos
+            batcher = Coalescer(flush, max_batch=len(tokens), window=5.0, name="push")
+            with patch.object(worker, "create_channel", lambda _: channel), \
+                 patch.object(worker, "PUSH_BATCH_WINDOW", 5.0), \
+                 patch.object(worker, "push_batcher", batcher):
+                return await asyncio.gather(
+                    *(
+                        worker._process_one({"channel": "push", "destination": t, "message": "hola", "subject": "Aviso"}, f"push-{i}")
+                        for i, t in enumerate(tokens)
+                    ),
+                    return_exceptions=True,
+                )
+
+        outcomes = _run(run())
+        assert flushes == [21]
+        assert len(fake_fcm.requests) == 21
+        assert isinstance(outcomes[-1], ValueError)
+        assert all(o is None for o in outcomes[:-1])
+
+        db = worker_db()
+        statuses = {row.destination: row.status for row in db.query(Notification).all()}
+        db.close()
+        assert statuses["bad-token-00001"] == NotificationStatus.FAILED
+        assert sum(1 for s in statuses.values() if s == NotificationStatus.SENT) == 20
@@ -0,0 +1,93 @@
+"""
+Pruebas del token bucket usado por el worker para respetar los límites de los proveedores.
+"""
+import asyncio
+
+import pytest
+
+from app import rate_limiter
+from app.rate_limiter import TokenBucket, RateLimiterRegistry
+from app.worker_metrics import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Tests del bucket individual"""
+
+    def test_burst_is_available_immediately(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=3, clock=clock)
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    def test_waits_are_spaced_at_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=4, capacity=1, clock=clock)
+        assert bucket.reserve() == 0.0
+        assert bucket.reserve() == pytest.approx(0.25)
+        assert bucket.reserve() == pytest.approx(0.5)
+
+    def test_refill_caps_at_capacity(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=10, capacity=5, clock=clock)
+        bucket.reserve(5)
+        clock.now = 100.0
+        assert bucket.tokens == pytest.approx(5)
+
+    def test_rejects_non_positive_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestRateLimiterRegistry:
+    """Tests del registro por proveedor/remitente"""
+
+    def test_unconfigured_provider_is_not_throttled(self):
+        registry = RateLimiterRegistry()
+        waited = asyncio.run(registry.acquire("sms:twilio", {}, sender="+111"))
+        assert waited == 0.0
+
+    def test_sender_limit_paces_sends(self):
+        metrics.reset()
+        registry = RateLimiterRegistry()
+        config = {"sender_rate_limit_per_second": 50, "sender_rate_limit_burst": 1}
+
+        async def run():
+            return [await registry.acquire("sms:twilio", config, sender="+111") for _ in range(3)]
+
+        waits = asyncio.run(run())
+        assert waits[0] == 0.0
+        assert sum(waits) > 0
+        snapshot = metrics.snapshot()
+        assert any(k.startswith("rate_limiter_wait_seconds") for k in snapshot["histograms"])
+        assert any(k.startswith("rate_limiter_tokens_available") for k in snapshot["gauges"])
+
+    def test_multi_segment_sms_costs_more_tokens(self):
+        registry = RateLimiterRegistry()
+        config = {"rate_limit_per_second": 100, "rate_limit_burst": 3}
+
+        async def run():
+            first = await registry.acquire("sms:twilio", config, tokens=3)
+            return first, await registry.acquire("sms:twilio", config, tokens=1)
+
+        first, second = asyncio.run(run())
+        assert first == 0.0
+        assert second > 0
+
+    def test_limit_is_split_between_processes(self, monkeypatch):
+        monkeypatch.setattr(rate_limiter, "RATE_LIMIT_PROCESSES", 4)
+        registry = RateLimiterRegistry()
+        config = {"rate_limit_per_second": 100, "rate_limit_burst": 8, "sender_rate_limit_per_second": 20}
+
+        asyncio.run(registry.acquire("sms:twilio", config, sender="+111"))
+
+        provider = registry._buckets["provider:sms:twilio"]
+        assert (provider.rate, provider.capacity) == (25, 2)
+        sender = registry._buckets["sender:sms:twilio:+111"]
+        assert (sender.rate, sender.capacity) == (5, 5)
@@ -0,0 +1,95 @@
+"""
+Pruebas del scheduler de reintentos diferidos usado en modo compatibilidad
+(WORKER_DECLARE_INFRA=false).
+"""
+import asyncio
+from unittest.mock import patch
+
+from app.retry_router import RetryRouter
+from app.retry_scheduler import DelayedRetryScheduler
+
+
+class TestDelayedRetryScheduler:
+    """Tests de retención y republicación sin bloquear"""
+
+    def test_schedule_does_not_block_and_releases_in_order(self):
+        published = []
+
+        async def publish(payload, headers):
+            published.append(payload["id"])
+
+        async def run():
+            scheduler = DelayedRetryScheduler(publish, max_held=10)
+            scheduler.start()
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            assert scheduler.schedule(0.05, {"id": "late"}, {})
+            assert scheduler.schedule(0.01, {"id": "early"}, {})
+            # schedule() retorna al instante; el consumo no espera el retraso
+            assert loop.time() - started < 0.01
+            await asyncio.sleep(0.1)
+            await scheduler.stop()
+            return scheduler.held
+
+        held = asyncio.run(run())
+        assert published == ["early", "late"]
+        assert held == 0
+
+    def test_refuses_when_cap_reached(self):
+        async def publish(payload, headers):
+            pass
+
+        async def run():
+            scheduler = DelayedRetryScheduler(publish, max_held=1)
+            first = scheduler.schedule(60, {"id": 1}, {})
+            second = scheduler.schedule(60, {"id": 2}, {})
+            return first, second
+
+        assert asyncio.run(run()) == (True, False)
+
+    def test_stop_flushes_held_messages(self):
+        published = []
+
+        async def publish(payload, headers):
+            published.append((payload["id"], headers["x-retry-count"]))
+
+        async def run():
+            scheduler = DelayedRetryScheduler(publish, max_held=10)
+            scheduler.start()
+            scheduler.schedule(120, {"id": "a"}, {"x-retry-count": 3})
+            await scheduler.stop()
+
+        asyncio.run(run())
+        assert published == [("a", 3)]
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append(message)
+
+
+class TestRetryRouterSpill:
+    """Tests del reintento con el scheduler lleno (modo compatibilidad)"""
+
+    def test_spilled_retry_does_not_consume_an_attempt(self):
+        async def publish(payload, headers):
+            pass
+
+        async def run():
+            main = FakeExchange()
+            scheduler = DelayedRetryScheduler(publish, max_held=1)
+            router = RetryRouter(main, FakeExchange(), "notifications.key", [5, 15], scheduler=scheduler)
+            headers = {"x-retry-count": 2, "x-message-id": "m1"}
+            with patch("app.retry_router.build_message", lambda payload, headers: (payload, headers)):
+                await router.publish_retry(1, {"id": "retenido"}, {"x-retry-count": 1})
+                await router.publish_retry(2, {"id": "spill"}, headers)
+            return main.published, scheduler.held, headers
+
+        published, held, headers = asyncio.run(run())
+        assert held == 1
+        assert published == [({"id": "spill"}, {"x-retry-count": 1, "x-message-id": "m1"})]
+        # Las cabeceras del llamador no se modifican
+        assert headers["x-retry-count"] == 2
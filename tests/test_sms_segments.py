@@ -0,0 +1,108 @@
+"""
+Pruebas del cálculo de codificación, segmentos y costo de SMS.
+"""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app import worker
+from app.channels import sms_segments
+from app.channels.sms import SMSChannel
+from app.channels.whatsapp import WhatsAppChannel
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    sms_segments.clear_cache()
+    yield
+    sms_segments.clear_cache()
+
+
+class TestSegmentInfo:
+    """Tests de segment_info"""
+
+    @pytest.mark.parametrize("body, expected", [
+        ("", ("GSM-7", 0, 1)),
+        ("a" * 160, ("GSM-7", 160, 1)),
+        ("a" * 161, ("GSM-7", 161, 2)),
+        ("a" * 307, ("GSM-7", 307, 3)),
+        ("¿Está listo?", ("UCS-2", 12, 1)),  # `Á` no está en GSM-7
+        ("ñ¿Ü" * 53, ("GSM-7", 159, 1)),
+        ("á" * 70, ("UCS-2", 70, 1)),
+        ("á" * 71, ("UCS-2", 71, 2)),
+        ("😀" * 36, ("UCS-2", 72, 2)),
+        ("Precio: 5€", ("GSM-7", 11, 1)),
+        ("`hola`", ("UCS-2", 6, 1)),
+    ])
+    def test_encoding_units_and_segments(self, body, expected):
+        assert tuple(sms_segments.segment_info(body)) == expected
+
+    def test_extension_chars_are_not_split(self):
+        # 152 septetos + `{` (2) no caben en un segmento de 153: el escape pasa al segundo
+        assert sms_segments.segment_info("a" * 152 + "{" + "a" * 10).segments == 2
+        assert sms_segments.segment_info("a" * 151 + "{" + "a" * 153).segments == 2
+        assert sms_segments.segment_info("a" * 159 + "{").segments == 2
+
+    def test_ascii_fast_path_matches_general_path(self):
+        for body in ("a" * 300 + "[x]", "x^2 {y} | ~z \\ " * 15, "linea\r\nsalto\f" * 20):
+            fast = sms_segments.segment_info(body)
+            costs = [2 if char in sms_segments.GSM_EXTENSION else 1 for char in body]
+            assert fast.units == sum(costs)
+            assert fast.segments == sms_segments._split(costs, 153 if fast.units > 160 else 160)
+
+    def test_computed_once_per_body(self):
+        for _ in range(3):
+            sms_segments.segment_info("Tu código es 1234")
+        assert sms_segments.segment_info.cache_info().misses == 1
+
+    def test_estimate_cost(self):
+        assert sms_segments.estimate_cost(3, "0.0079") == "0.0237"
+        assert sms_segments.estimate_cost(1, 0.005) == "0.0050"
+
+
+class TestChannelEstimate:
+    """Tests de SMSChannel.estimate / WhatsAppChannel.estimate"""
+
+    def test_sms_charges_per_segment(self):
+        channel = SMSChannel({"cost_per_segment": "0.01"})
+        estimate = channel.estimate("á" * 100)
+        assert (estimate.encoding, estimate.segments, estimate.cost) == ("UCS-2", 2, "0.0200")
+
+    def test_whatsapp_is_one_message(self):
+        channel = WhatsAppChannel({"cost_per_message": "0.005"})
+        estimate = channel.estimate("á" * 500)
+        assert (estimate.segments, estimate.cost) == (1, "0.0050")
+
+
+class _FakeSMS(SMSChannel):
+    """SMSChannel real (validación y estimación) sin llamar a Twilio"""
+
+    def __init__(self):
+        super().__init__({"account_sid": "AC1", "auth_token": "t", "cost_per_segment": "0.0079"})
+        self.sent = []
+
+    async def send(self, destination, message, subject=None):
+        self.sent.append((destination, message))
+
+
+class TestWorkerCost:
+    """El worker guarda el costo estimado y cuenta segmentos por canal"""
+
+    def test_cost_is_stored_and_segments_counted(self, worker_db):
+        from app.models import Notification
+        from app.worker_metrics import metrics
+
+        def segments():
+            return metrics.snapshot()["counters"].get('message_segments_total{channel="sms",encoding="UCS-2"}', 0)
+
+        before = segments()
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "Código de verificación: " + "1" * 60}
+        with patch.object(worker, "create_channel", lambda _: _FakeSMS()):
+            asyncio.run(worker._process_one(payload, "sms-cost"))
+
+        db = worker_db()
+        row = db.query(Notification).one()
+        db.close()
+        assert row.cost == "0.0158"
+        assert segments() - before == 2
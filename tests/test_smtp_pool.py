@@ -0,0 +1,106 @@
+"""
+Pruebas del pool de sesiones SMTP contra un servidor SMTP local.
+"""
+import asyncio
+import smtplib
+from email.mime.text import MIMEText
+
+import pytest
+
+from app.channels.email import EmailChannel
+from app.channels.smtp_pool import SMTPPool, close_smtp_pools
+from benchmarks.smtp_throughput import StandInSMTPServer
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTPServer().start()
+    yield server
+    server.stop()
+
+
+def _message(to="cliente@example.com"):
+    msg = MIMEText("<p>hola</p>", "html")
+    msg["From"] = "noreply@example.com"
+    msg["To"] = to
+    msg["Subject"] = "Prueba"
+    return msg
+
+
+def _pool(server, **options):
+    return SMTPPool("127.0.0.1", server.port, "user", "secret", starttls=False, **options)
+
+
+def _send_all(pool, count, concurrent=False):
+    async def run():
+        try:
+            if concurrent:
+                await asyncio.gather(*(pool.send_message(_message()) for _ in range(count)))
+            else:
+                for _ in range(count):
+                    await pool.send_message(_message())
+        finally:
+            await pool.close()
+
+    asyncio.run(run())
+
+
+class TestSMTPPool:
+    """Tests de reutilización, reciclado y reconexión de sesiones"""
+
+    def test_sessions_are_reused_across_sends(self, smtp_server):
+        _send_all(_pool(smtp_server, max_size=2), 20, concurrent=True)
+        assert smtp_server.messages == 20
+        assert smtp_server.connections <= 2
+
+    def test_sessions_are_recycled_after_max_messages(self, smtp_server):
+        _send_all(_pool(smtp_server, max_size=1, max_messages=3), 7)
+        assert smtp_server.messages == 7
+        assert smtp_server.connections == 3
+
+    def test_reconnects_when_server_drops_session(self, smtp_server):
+        smtp_server.drop_after = 2
+        _send_all(_pool(smtp_server, max_size=1), 5)
+        assert smtp_server.messages == 5
+        assert smtp_server.connections == 3
+
+    def test_noop_detects_stale_session_before_sending(self, smtp_server):
+        from app.worker_metrics import metrics
+
+        smtp_server.drop_after = 1
+        before = metrics.snapshot()["counters"].get('smtp_stale_sessions_total{host="127.0.0.1"}', 0)
+        _send_all(_pool(smtp_server, max_size=1, check_after=0), 2)
+        after = metrics.snapshot()["counters"].get('smtp_stale_sessions_total{host="127.0.0.1"}', 0)
+        assert smtp_server.messages == 2
+        assert after == before + 1
+
+    def test_rejected_recipient_keeps_session(self, smtp_server):
+        pool = _pool(smtp_server, max_size=1)
+
+        async def run():
+            with pytest.raises(smtplib.SMTPRecipientsRefused):
+                await pool.send_message(_message("rechazado@example.com"))
+            await pool.send_message(_message())
+            await pool.close()
+
+        asyncio.run(run())
+        assert smtp_server.connections == 1
+        assert smtp_server.messages == 1
+
+
+class TestEmailChannelPool:
+    """Tests de EmailChannel: los envíos comparten sesiones del pool"""
+
+    def test_send_reuses_one_session(self, smtp_server):
+        config = {"smtp_host": "127.0.0.1", "smtp_port": smtp_server.port, "smtp_starttls": "false"}
+
+        async def run():
+            try:
+                for i in range(3):
+                    await EmailChannel(config).send(f"cliente{i}@example.com", "<p>hola</p>", "Prueba")
+            finally:
+                await close_smtp_pools()
+
+        asyncio.run(run())
+        assert smtp_server.messages == 3
+        assert smtp_server.connections == 1
@@ -0,0 +1,110 @@
+"""
+Pruebas del supervisor multi-proceso con hijos triviales (sin AMQP ni BD): reinicio con
+backoff, reenvío de SIGTERM y métricas combinadas.
+
+Los hijos se lanzan con `spawn`, así que sus funciones tienen que ser importables desde
+este módulo.
+"""
+import asyncio
+import os
+import signal
+import sys
+import time
+from unittest.mock import patch
+
+from app import supervisor
+from app.supervisor import Supervisor
+
+
+def _snapshot(processed: float, concurrency: float) -> dict:
+    return {
+        "counters": {'messages_processed_total{channel="sms"}': processed},
+        "gauges": {"worker_concurrency_limit": concurrency},
+        "histograms": {},
+    }
+
+
+def _crash(index, snapshots, processes):
+    sys.exit(3)
+
+
+def _report_and_crash(index, snapshots, processes):
+    snapshots.put((index, os.getpid(), _snapshot(5, 10)))
+    sys.exit(1)
+
+
+def _drain_on_sigterm(index, snapshots, processes):
+    def stop(signum, frame):
+        # Cierre ordenado: reporta las métricas finales y sale con código 0
+        snapshots.put((index, os.getpid(), _snapshot(1, 0)))
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    snapshots.put((index, os.getpid(), None))
+    while True:
+        time.sleep(0.05)
+
+
+def _wait_exit(sup):
+    for child in sup._children:
+        if child.process is not None:
+            child.process.join(timeout=30)
+
+
+class TestSupervisor:
+    """Tests del ciclo de vida de los hijos"""
+
+    def test_crashing_child_is_restarted_with_growing_backoff(self):
+        sup = Supervisor(1, target=_crash)
+        child = sup._children[0]
+        with patch.object(supervisor, "RESTART_BACKOFF_BASE", 0.2):
+            sup._start(child)
+            _wait_exit(sup)
+            sup._check_children()
+            assert child.process is None
+            assert child.consecutive_failures == 1
+            first_delay = child.restart_at - time.monotonic()
+            assert 0 < first_delay <= 0.2
+
+            time.sleep(first_delay + 0.01)
+            sup._check_children()
+            assert child.restarts == 1 and child.process is not None
+            _wait_exit(sup)
+            sup._check_children()
+        assert child.consecutive_failures == 2
+        assert child.restart_at - time.monotonic() > 0.2  # 0.2 * 2
+        assert child.process is None
+
+    def test_sigterm_is_forwarded_and_children_exit_cleanly(self):
+        sup = Supervisor(2, target=_drain_on_sigterm)
+        for child in sup._children:
+            sup._start(child)
+        # Esperar a que los dos hijos hayan instalado su manejador de SIGTERM
+        for _ in sup._children:
+            sup._snapshots.get(timeout=30)
+
+        asyncio.run(sup._shutdown())
+
+        assert [child.process.exitcode for child in sup._children] == [0, 0]
+        sup._drain_snapshots()
+        assert len(sup._latest) == 2
+
+    def test_metrics_keep_counters_of_restarted_children(self):
+        sup = Supervisor(1, target=_report_and_crash)
+        child = sup._children[0]
+        with patch.object(supervisor, "RESTART_BACKOFF_BASE", 0.0):
+            sup._start(child)
+            for _ in range(2):
+                _wait_exit(sup)
+                sup._check_children()  # retira al hijo muerto y lanza el siguiente
+        _wait_exit(sup)
+        with patch.object(supervisor, "RESTART_BACKOFF_BASE", 60.0):
+            sup._check_children()  # el tercero también terminó; no se relanza todavía
+
+        status, merged = asyncio.run(sup._metrics_route())
+        assert status == 200
+        # Tres hijos que reportaron 5 cada uno: los totales no retroceden al reiniciar
+        assert merged["counters"]['messages_processed_total{channel="sms"}'] == 15
+        assert merged["counters"]["supervisor_restarts_total"] == 2
+        # Los gauges de los hijos muertos no quedan pegados en las métricas combinadas
+        assert "worker_concurrency_limit" not in merged["gauges"]
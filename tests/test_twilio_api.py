@@ -0,0 +1,130 @@
+"""
+Pruebas del cliente Twilio compartido (SMS y WhatsApp) contra una API falsa local.
+"""
+import asyncio
+import base64
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.channels import twilio_api
+from app.channels.http_pool import close_http_clients
+from app.channels.sms import SMSChannel
+from app.channels.whatsapp import WhatsAppChannel
+from benchmarks.twilio_throughput import ACCOUNT_SID, AUTH_TOKEN, FakeTwilioServer
+
+
+@pytest.fixture
+def fake_twilio():
+    server = FakeTwilioServer().start()
+    yield server
+    server.stop()
+
+
+def _run(coro):
+    """Ejecuta `coro` y cierra los clientes HTTP compartidos de ese event loop"""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_http_clients()
+    return asyncio.run(_main())
+
+
+def _config(server, **extra):
+    return {"account_sid": ACCOUNT_SID, "auth_token": AUTH_TOKEN, "api_url": server.url, **extra}
+
+
+class TestTwilioCreateMessage:
+    """Tests de twilio_api.create_message"""
+
+    def test_posts_form_with_basic_auth(self, fake_twilio):
+        result = _run(twilio_api.create_message(
+            ACCOUNT_SID, AUTH_TOKEN, "+15005550006", "+573001234567", body="Hola ñandú", api_url=fake_twilio.url
+        ))
+        assert result["sid"].startswith("SM")
+        request = fake_twilio.requests[0]
+        assert request["path"] == f"/2010-04-01/Accounts/{ACCOUNT_SID}/Messages.json"
+        assert request["auth"] == "Basic " + base64.b64encode(f"{ACCOUNT_SID}:{AUTH_TOKEN}".encode()).decode()
+        assert request["form"] == {"From": ["+15005550006"], "To": ["+573001234567"], "Body": ["Hola ñandú"]}
+
+    def test_connections_are_reused(self, fake_twilio):
+        async def send_many():
+            for i in range(10):
+                await twilio_api.create_message(
+                    ACCOUNT_SID, AUTH_TOKEN, "+15005550006", f"+1555000{i:04d}", body="x", api_url=fake_twilio.url
+                )
+        _run(send_many())
+        assert len(fake_twilio.requests) == 10
+        assert fake_twilio.connections == 1
+
+    def test_concurrent_sends_overlap_latency(self, fake_twilio):
+        fake_twilio.latency = 0.2
+
+        async def send_many():
+            await asyncio.gather(*(
+                twilio_api.create_message(
+                    ACCOUNT_SID, AUTH_TOKEN, "+15005550006", f"+1555000{i:04d}", body="x", api_url=fake_twilio.url
+                )
+                for i in range(10)
+            ))
+        started = time.perf_counter()
+        _run(send_many())
+        assert time.perf_counter() - started < 1.0  # en serie serían ~2 s
+        assert len(fake_twilio.requests) == 10
+
+    def test_client_error_is_permanent(self, fake_twilio):
+        with pytest.raises(ValueError, match="21211"):
+            _run(twilio_api.create_message(
+                ACCOUNT_SID, AUTH_TOKEN, "+15005550006", "+1rechazado", body="x", api_url=fake_twilio.url
+            ))
+
+    def test_server_error_is_transient(self, fake_twilio):
+        fake_twilio.fail_status = 503
+        with pytest.raises(ConnectionError):
+            _run(twilio_api.create_message(
+                ACCOUNT_SID, AUTH_TOKEN, "+15005550006", "+573001234567", body="x", api_url=fake_twilio.url
+            ))
+
+    def test_unreadable_success_is_transient(self):
+        # Un proxy que responde 201 con HTML: no se sabe si Twilio aceptó el mensaje
+        transport = httpx.MockTransport(lambda request: httpx.Response(201, text="<html>ok</html>"))
+
+        async def send():
+            async with httpx.AsyncClient(base_url="https://api.twilio.test", transport=transport) as client:
+                with patch.object(twilio_api, "get_http_client", lambda base_url: client):
+                    await twilio_api.create_message(ACCOUNT_SID, AUTH_TOKEN, "+15005550006", "+573001234567", body="x")
+
+        with pytest.raises(ConnectionError, match="ilegible"):
+            asyncio.run(send())
+
+    def test_missing_credentials(self, fake_twilio):
+        with pytest.raises(ValueError):
+            _run(twilio_api.create_message("", "", "+15005550006", "+573001234567", body="x", api_url=fake_twilio.url))
+        assert fake_twilio.requests == []
+
+
+class TestTwilioChannels:
+    """Tests de SMSChannel y WhatsAppChannel sobre el cliente compartido"""
+
+    def test_sms_send(self, fake_twilio):
+        channel = SMSChannel(_config(fake_twilio, from_number="+15005550006"))
+        _run(channel.send("+57 300 123 4567", "Tu código es 1234"))
+        form = fake_twilio.requests[0]["form"]
+        assert form["From"] == ["+15005550006"]
+        assert form["Body"] == ["Tu código es 1234"]
+
+    def test_whatsapp_media_with_caption(self, fake_twilio):
+        channel = WhatsAppChannel(_config(fake_twilio, from_number="whatsapp:+15005550006"))
+        _run(channel.send_image("+573001234567", "https://example.com/a.png", caption="Factura"))
+        form = fake_twilio.requests[0]["form"]
+        assert form["To"] == ["whatsapp:+573001234567"]
+        assert form["MediaUrl"] == ["https://example.com/a.png"]
+        assert form["Body"] == ["Factura"]
+
+    def test_whatsapp_document_without_caption(self, fake_twilio):
+        channel = WhatsAppChannel(_config(fake_twilio))
+        _run(channel.send_document("+573001234567", "https://example.com/a.pdf"))
+        assert "Body" not in fake_twilio.requests[0]["form"]
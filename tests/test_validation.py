@@ -0,0 +1,100 @@
+"""
+Pruebas de la validación y normalización de destinos.
+"""
+from unittest.mock import patch
+
+import pytest
+
+from app.channels import validation
+from app.channels.email import EmailChannel
+from app.channels.sms import SMSChannel
+from app.channels.whatsapp import WhatsAppChannel
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    validation.clear_cache()
+    yield
+    validation.clear_cache()
+
+
+class TestNormalizers:
+    """Tests de normalize_email / normalize_phone / normalize_whatsapp"""
+
+    @pytest.mark.parametrize("raw, expected", [
+        ("+573001234567", "+573001234567"),
+        ("+57 300-123-4567", "+573001234567"),
+        ("0057 300 123 4567", "+573001234567"),
+    ])
+    def test_phone_to_e164(self, raw, expected):
+        assert validation.normalize_phone(raw) == expected
+
+    @pytest.mark.parametrize("raw", ["", "abc", "+0123456", "+1", "+1234567890123456", "12+34", "00"])
+    def test_invalid_phone(self, raw):
+        assert validation.normalize_phone(raw) is None
+
+    @pytest.mark.parametrize("raw", ["3001234567", "(300) 123-4567", "15551234567"])
+    def test_national_number_is_rejected_without_country_code(self, raw):
+        # Anteponer sólo "+" lo convertiría en un número de otro país (+300...)
+        assert validation.normalize_phone(raw) is None
+
+    @pytest.mark.parametrize("raw, expected", [
+        ("300 123 4567", "+573001234567"),
+        ("0300 123 4567", "+573001234567"),
+        ("+1 555 123 4567", "+15551234567"),
+    ])
+    def test_national_number_uses_default_country_code(self, raw, expected):
+        with patch.object(validation, "DEFAULT_PHONE_COUNTRY_CODE", "57"):
+            assert validation.normalize_phone(raw) == expected
+
+    @pytest.mark.parametrize("raw", ["+57 300 123 4567", "whatsapp:+573001234567", "WhatsApp:+573001234567"])
+    def test_whatsapp_prefix(self, raw):
+        assert validation.normalize_whatsapp(raw) == "whatsapp:+573001234567"
+
+    def test_email(self):
+        assert validation.normalize_email(" Ana.Perez@Example.COM ") == "Ana.Perez@example.com"
+        assert validation.normalize_email("ana@example.com\n") == "ana@example.com"
+        assert validation.normalize_email("ana@example.com\nBcc: x@example.com") is None
+        assert validation.normalize_email("sin-arroba.example.com") is None
+
+    def test_results_are_cached(self):
+        validation.normalize_phone("+57 300 123 4567")
+        validation.normalize_phone("+57 300 123 4567")
+        validation.normalize_phone("abc")
+        validation.normalize_phone("abc")
+        assert validation.normalize_phone.cache_info().hits == 2
+
+
+class TestValidateBatch:
+    """Tests del validador por lotes"""
+
+    def test_aligned_with_input(self):
+        result = validation.validate_batch("sms", ["+57 300 123 4567", "abc", "+573001234567", "+57 300 123 4567"])
+        assert result == ["+573001234567", None, "+573001234567", "+573001234567"]
+
+    def test_does_not_fill_the_lru(self):
+        validation.validate_batch("whatsapp", [f"+1555{i:07d}" for i in range(100)])
+        assert validation.normalize_whatsapp.cache_info().currsize == 0
+        assert validation.normalize_phone.cache_info().currsize == 0
+
+
+class TestChannelValidation:
+    """Los canales validan con el módulo compartido y retornan el destino normalizado"""
+
+    def test_sms(self):
+        channel = SMSChannel({"account_sid": "AC1", "auth_token": "t"})
+        assert channel.validate_destination("+57 300-123-4567") == "+573001234567"
+        with pytest.raises(ValueError, match="Número de teléfono inválido"):
+            channel.validate_destination("+0 300 123")
+
+    def test_whatsapp(self):
+        channel = WhatsAppChannel({"account_sid": "AC1", "auth_token": "t"})
+        assert channel.validate_destination("+573001234567") == "whatsapp:+573001234567"
+        with pytest.raises(ValueError, match="Número de WhatsApp inválido"):
+            channel.validate_destination("whatsapp:+0")
+
+    def test_email(self):
+        channel = EmailChannel({"smtp_host": "localhost"})
+        assert channel.validate_destination("ana@EXAMPLE.com") == "ana@example.com"
+        with pytest.raises(ValueError, match="Email invalido"):
+            channel.validate_destination("ana@")
@@ -0,0 +1,566 @@
+"""
+Pruebas del worker: ruteo de fallos (reintento/DLQ) sin broker real.
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app import worker
+from app.concurrency import AdaptiveConcurrency
+from app.retry_router import RetryRouter
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        self.published.append(routing_key)
+
+
+class FakeIncoming:
+    def __init__(self, payload, headers=None):
+        self.body = json.dumps(payload).encode("utf-8")
+        self.headers = headers or {}
+        self.acked = False
+
+    async def ack(self):
+        self.acked = True
+
+
+def _router():
+    retry_exchanges = {idx: FakeExchange() for idx in range(1, 4)}
+    return RetryRouter(FakeExchange(), FakeExchange(), "notifications.key", [5, 30, 120], retry_exchanges)
+
+
+SMS_PAYLOAD = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+
+
+async def _failing_process(payload, message_id=None):
+    raise ConnectionError("proveedor caído")
+
+
+class TestFailureRouting:
+    """Tests de la ruta de fallos con exchanges ya resueltos"""
+
+    def test_failure_goes_to_next_retry_exchange(self):
+        router = _router()
+        incoming = FakeIncoming(SMS_PAYLOAD, {"x-retry-count": 1})
+        with patch.object(worker, "_process_one", _failing_process):
+            asyncio.run(worker._handle_message(incoming, router))
+        assert incoming.acked
+        assert router.retry_exchanges[2].published == ["notifications.key"]
+        assert router.dlx.published == []
+
+    def test_exhausted_retries_go_to_dlq(self):
+        router = _router()
+        incoming = FakeIncoming(SMS_PAYLOAD, {"x-retry-count": worker.MAX_RETRIES})
+        with patch.object(worker, "_process_one", _failing_process):
+            asyncio.run(worker._handle_message(incoming, router))
+        assert router.dlx.published == [""]
+
+
+class FakeQueueIterator:
+    def __init__(self, messages):
+        self._messages = asyncio.Queue()
+        for m in messages:
+            self._messages.put_nowait(m)
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    async def __anext__(self):
+        return await self._messages.get()
+
+
+class FakeQueue:
+    def __init__(self, messages):
+        self.iter = FakeQueueIterator(messages)
+
+    def iterator(self):
+        return self.iter
+
+
+class TestGracefulDrain:
+    """Tests del apagado ordenado: termina lo que está en vuelo y deja de consumir"""
+
+    def test_stop_lets_inflight_message_finish(self):
+        processed = []
+
+        async def slow_handler(incoming, router):
+            await asyncio.sleep(0.05)
+            processed.append(incoming)
+
+        async def run():
+            stop = asyncio.Event()
+            queue = FakeQueue([FakeIncoming({"id": 1}), FakeIncoming({"id": 2})])
+            with patch.object(worker, "_handle_message_inner", slow_handler), \
+                 patch.object(worker, "concurrency", AdaptiveConcurrency(initial=1, adaptive=False)):
+                consumer = asyncio.create_task(worker._consume(queue, _router(), stop))
+                await asyncio.sleep(0.01)
+                assert worker.inflight.count == 1
+                stop.set()
+                assert await worker.inflight.wait_idle(1)
+                await asyncio.wait_for(consumer, 1)
+            return queue
+
+        queue = asyncio.run(run())
+        # El primer mensaje terminó; el segundo (prefetch) no se procesó
+        assert len(processed) == 1
+        assert queue.iter.closed
+
+    def test_messages_are_processed_concurrently(self):
+        async def slow_handler(incoming, router):
+            await asyncio.sleep(0.1)
+
+        async def run():
+            stop = asyncio.Event()
+            queue = FakeQueue([FakeIncoming({"id": i}) for i in range(5)])
+            with patch.object(worker, "_handle_message_inner", slow_handler), \
+                 patch.object(worker, "concurrency", AdaptiveConcurrency(initial=3, adaptive=False)):
+                consumer = asyncio.create_task(worker._consume(queue, _router(), stop))
+                await asyncio.sleep(0.03)
+                in_flight = worker.inflight.count
+                stop.set()
+                await asyncio.wait_for(consumer, 1)
+            return in_flight
+
+        # Nunca más del límite de concurrencia a la vez
+        assert asyncio.run(run()) == 3
+
+    def test_idle_consumer_stops_immediately(self):
+        async def run():
+            stop = asyncio.Event()
+            queue = FakeQueue([])
+            consumer = asyncio.create_task(worker._consume(queue, _router(), stop))
+            await asyncio.sleep(0.01)
+            stop.set()
+            await asyncio.wait_for(consumer, 1)
+            return queue
+
+        assert asyncio.run(run()).iter.closed
+
+
+class FakeChannel:
+    """Canal falso: registra envíos, puede fallar y simular latencia"""
+
+    name = "fake"
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.sent = []
+
+    def validate_destination(self, destination):
+        return None
+
+    async def send(self, destination, message, subject=None):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("proveedor caído")
+        self.sent.append((destination, message))
+
+
+class TestDeduplication:
+    """Tests de reentregas: misma fila y un solo envío por message_id"""
+
+    def test_redelivery_of_sent_message_is_skipped(self, worker_db):
+        from app.models import Notification
+
+        channel = FakeChannel()
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+        with patch.object(worker, "create_channel", lambda _: channel):
+            asyncio.run(worker._process_one(payload, "msg-1"))
+            asyncio.run(worker._process_one(payload, "msg-1"))
+
+        db = worker_db()
+        assert db.query(Notification).count() == 1
+        assert len(channel.sent) == 1
+        db.close()
+
+    def test_retry_reuses_existing_row(self, worker_db):
+        from app.models import Notification, NotificationStatus
+
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+        with patch.object(worker, "create_channel", lambda _: FakeChannel(fail=True)):
+            with pytest.raises(ConnectionError):
+                asyncio.run(worker._process_one(payload, "msg-2"))
+        with patch.object(worker, "create_channel", lambda _: FakeChannel()):
+            asyncio.run(worker._process_one(payload, "msg-2"))
+
+        db = worker_db()
+        rows = db.query(Notification).all()
+        assert len(rows) == 1
+        assert rows[0].status == NotificationStatus.SENT
+        assert rows[0].retry_count == 1
+        db.close()
+
+    def test_concurrent_deliveries_send_once(self, worker_db):
+        from app.dedup import NotificationInProgress
+        from app.models import Notification, NotificationStatus
+
+        channel = FakeChannel(delay=0.2)
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+
+        async def run():
+            return await asyncio.gather(
+                worker._process_one(payload, "msg-3"),
+                worker._process_one(payload, "msg-3"),
+                return_exceptions=True,
+            )
+
+        with patch.object(worker, "create_channel", lambda _: channel):
+            outcomes = asyncio.run(run())
+
+        assert len(channel.sent) == 1
+        assert sum(isinstance(o, NotificationInProgress) for o in outcomes) == 1
+        db = worker_db()
+        assert [row.status for row in db.query(Notification).all()] == [NotificationStatus.SENT]
+        db.close()
+
+    def test_row_being_sent_is_not_resent(self, worker_db):
+        from datetime import datetime
+        from app.dedup import NotificationInProgress
+        from app.models import Notification, NotificationChannel, NotificationStatus
+
+        db = worker_db()
+        db.add(Notification(
+            user_id="u", channel=NotificationChannel.SMS, destination="+573001234567", message="hola",
+            status=NotificationStatus.PROCESSING, claimed_at=datetime.utcnow(), dedup_key="msg-4:sms",
+        ))
+        db.commit()
+        db.close()
+
+        channel = FakeChannel()
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+        with patch.object(worker, "create_channel", lambda _: channel):
+            with pytest.raises(NotificationInProgress):
+                asyncio.run(worker._process_one(payload, "msg-4"))
+        assert channel.sent == []
+
+    def test_abandoned_claim_is_taken_over(self, worker_db):
+        from datetime import datetime, timedelta
+        from app.models import Notification, NotificationChannel, NotificationStatus
+
+        db = worker_db()
+        db.add(Notification(
+            user_id="u", channel=NotificationChannel.SMS, destination="+573001234567", message="hola",
+            status=NotificationStatus.PROCESSING, dedup_key="msg-5:sms",
+            claimed_at=datetime.utcnow() - timedelta(seconds=worker.CLAIM_STALE_SECONDS + 5),
+        ))
+        db.commit()
+        db.close()
+
+        channel = FakeChannel()
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+        with patch.object(worker, "create_channel", lambda _: channel):
+            asyncio.run(worker._process_one(payload, "msg-5"))
+
+        assert len(channel.sent) == 1
+        db = worker_db()
+        assert db.query(Notification).one().status == NotificationStatus.SENT
+        db.close()
+
+
+class TestMultiChannelFanOut:
+    """Tests del envío multi-canal en paralelo"""
+
+    PAYLOAD = {
+        "destination": {"email": "a@example.com", "sms": "+573001234567", "push": "token-1234567890"},
+        "message": {"email": "<b>hola</b>", "sms": "hola", "push": "hola"},
+        "subject": "Prueba",
+    }
+
+    def test_latency_is_max_not_sum(self, worker_db):
+        channels = {
+            "email": FakeChannel(delay=0.2),
+            "sms": FakeChannel(delay=0.2),
+            "push": FakeChannel(delay=0.2),
+        }
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            with patch.object(worker, "create_channel", lambda c: channels[c.value]):
+                await worker._process_one(dict(self.PAYLOAD), "multi-1")
+            return loop.time() - started
+
+        elapsed = asyncio.run(run())
+        assert elapsed < 0.45
+        assert all(len(ch.sent) == 1 for ch in channels.values())
+
+    def test_failing_channel_is_isolated(self, worker_db):
+        from app.models import Notification, NotificationStatus
+
+        channels = {
+            "email": FakeChannel(delay=0.01),
+            "sms": FakeChannel(fail=True),
+            "push": FakeChannel(delay=0.01),
+        }
+        with patch.object(worker, "create_channel", lambda c: channels[c.value]):
+            asyncio.run(worker._process_one(dict(self.PAYLOAD), "multi-2"))
+
+        db = worker_db()
+        statuses = {row.channel.value: row.status for row in db.query(Notification).all()}
+        db.close()
+        assert statuses["sms"] == NotificationStatus.FAILED
+        assert statuses["email"] == NotificationStatus.SENT
+        assert statuses["push"] == NotificationStatus.SENT
+
+    def test_shared_timeout_budget(self, worker_db):
+        from app.models import Notification, NotificationStatus
+
+        channels = {
+            "email": FakeChannel(delay=0.01),
+            "sms": FakeChannel(delay=5),
+            "push": FakeChannel(delay=0.01),
+        }
+        with patch.object(worker, "MULTI_CHANNEL_TIMEOUT", 0.2), \
+             patch.object(worker, "create_channel", lambda c: channels[c.value]):
+            asyncio.run(worker._process_one(dict(self.PAYLOAD), "multi-3"))
+
+        db = worker_db()
+        sms = db.query(Notification).filter(Notification.dedup_key == "multi-3:sms").one()
+        db.close()
+        assert sms.status == NotificationStatus.FAILED
+        assert "Tiempo agotado" in sms.error_message
+
+
+    def test_open_breaker_sends_message_to_retry(self, worker_db):
+        from app.circuit_breaker import CircuitOpenError, CircuitState
+        from app.models import Notification, NotificationStatus
+
+        channels = {"email": FakeChannel(), "sms": FakeChannel()}
+        payload = {
+            "destination": {"email": "a@example.com", "sms": "+573001234567"},
+            "message": {"email": "<b>hola</b>", "sms": "hola"},
+        }
+        breaker = worker.circuit_breakers.get("sms:fake")
+        breaker._transition(CircuitState.OPEN)
+        with patch.object(worker, "create_channel", lambda c: channels[c.value]):
+            with pytest.raises(CircuitOpenError):
+                asyncio.run(worker._process_one(dict(payload), "multi-open"))
+            # El email ya salió; el SMS no tiene fila y queda para el reintento
+            assert len(channels["email"].sent) == 1 and channels["sms"].sent == []
+            db = worker_db()
+            assert {row.channel.value for row in db.query(Notification).all()} == {"email"}
+            db.close()
+
+            breaker._transition(CircuitState.CLOSED)
+            asyncio.run(worker._process_one(dict(payload), "multi-open"))
+
+        assert len(channels["email"].sent) == 1
+        assert len(channels["sms"].sent) == 1
+        db = worker_db()
+        statuses = {row.channel.value: row.status for row in db.query(Notification).all()}
+        db.close()
+        assert statuses == {"email": NotificationStatus.SENT, "sms": NotificationStatus.SENT}
+
+
+class TestDatabaseOffLoop:
+    """La BD se usa desde hilos: los mensajes en vuelo no se detienen entre sí"""
+
+    def test_single_channel_db_calls_do_not_block_loop(self, worker_db):
+        import time
+
+        real_claim = worker._claim_notification
+
+        def slow_claim(*args, **kwargs):
+            time.sleep(0.2)
+            return real_claim(*args, **kwargs)
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            await asyncio.gather(*(
+                worker._process_one(dict(SMS_PAYLOAD), f"off-loop-{i}") for i in range(3)
+            ))
+            return loop.time() - started
+
+        with patch.object(worker, "create_channel", lambda _: FakeChannel()), \
+             patch.object(worker, "_claim_notification", slow_claim):
+            elapsed = asyncio.run(run())
+        assert elapsed < 0.5  # en el event loop serían ~0.6 s
+
+
+class TestStageTracing:
+    """Tests de la traza por etapas: tiempos en la fila y en los histogramas"""
+
+    def test_timings_are_persisted_with_trace_id(self, worker_db):
+        import time
+        from app.models import Notification
+        from app.worker_metrics import metrics
+
+        payload = {"channel": "sms", "destination": "+573001234567", "message": "hola"}
+        headers = {"x-trace-id": "trace-123", "x-enqueued-at": time.time() - 2}
+        incoming = FakeIncoming(payload, headers)
+        with patch.object(worker, "create_channel", lambda _: FakeChannel(delay=0.05)):
+            asyncio.run(worker._handle_message(incoming, _router()))
+
+        db = worker_db()
+        row = db.query(Notification).one()
+        db.close()
+        timings = json.loads(row.timings)
+        assert row.trace_id == "trace-123"
+        assert timings["queue_wait"] >= 2
+        assert timings["provider_send"] >= 0.05
+        assert {"decode", "db_insert", "throttle"} <= set(timings)
+        assert timings["since_enqueue"] >= timings["queue_wait"]
+
+        histograms = metrics.snapshot()["histograms"]
+        assert any("notification_end_to_end_seconds" in name and "sms" in name for name in histograms)
+        assert 'notification_stage_seconds{channel="sms",stage="provider_send"}' in histograms
+
+
+class TestPoisonQuarantine:
+    """Tests de la cuarentena: los mensajes inválidos no pasan por los reintentos"""
+
+    @staticmethod
+    def _router():
+        router = _router()
+        router.quarantine = FakeExchange()
+        return router
+
+    @staticmethod
+    def _handle(incoming, router):
+        captured = []
+
+        def build(body, headers, **properties):
+            captured.append({"body": body, "headers": dict(headers)})
+            return body
+
+        with patch("app.retry_router.build_raw_message", build):
+            asyncio.run(worker._handle_message(incoming, router))
+        return captured
+
+    def _assert_quarantined_only(self, router):
+        assert router.quarantine.published == [""]
+        assert router.dlx.published == []
+        assert all(ex.published == [] for ex in router.retry_exchanges.values())
+
+    def test_bad_json_keeps_original_bytes(self):
+        router = self._router()
+        incoming = FakeIncoming({})
+        incoming.body = b'{"channel": "sms", roto'
+        captured = self._handle(incoming, router)
+
+        self._assert_quarantined_only(router)
+        assert incoming.acked
+        assert captured[0]["body"] == b'{"channel": "sms", roto'
+        assert captured[0]["headers"]["x-quarantine-reason"] == "invalid_json"
+        assert "x-retry-count" not in captured[0]["headers"]
+
+    def test_unknown_channel_is_quarantined(self):
+        router = self._router()
+        captured = self._handle(FakeIncoming({"channel": "fax", "destination": "123", "message": "hola"}), router)
+        self._assert_quarantined_only(router)
+        assert captured[0]["headers"]["x-quarantine-reason"] == "unknown_channel"
+
+    def test_invalid_destination_is_quarantined_and_row_failed(self, worker_db):
+        from app.models import Notification, NotificationStatus
+
+        class StrictChannel(FakeChannel):
+            def validate_destination(self, destination):
+                raise ValueError(f"Número de teléfono inválido: {destination}")
+
+        router = self._router()
+        payload = {"channel": "sms", "destination": "abc", "message": "hola"}
+        with patch.object(worker, "create_channel", lambda _: StrictChannel()):
+            captured = self._handle(FakeIncoming(payload), router)
+
+        self._assert_quarantined_only(router)
+        assert captured[0]["headers"]["x-quarantine-reason"] == "validation"
+        db = worker_db()
+        assert db.query(Notification).one().status == NotificationStatus.FAILED
+        db.close()
+
+    def test_transient_error_still_retries(self):
+        router = self._router()
+        with patch.object(worker, "_process_one", _failing_process):
+            self._handle(FakeIncoming(SMS_PAYLOAD), router)
+        assert router.quarantine.published == []
+        assert router.retry_exchanges[1].published == ["notifications.key"]
+
+
+class TestTemplateSends:
+    """Tests de los envíos con plantilla: el worker renderiza `template` + `context`"""
+
+    PAYLOAD = {
+        "channel": "email",
+        "destination": "ana@example.com",
+        "template": "welcome",
+        "context": {"name": "Ana", "message": "Tu cuenta está lista"},
+        "subject": "Bienvenida",
+    }
+
+    @pytest.fixture(autouse=True)
+    def fresh_templates(self):
+        from app.channels import email_templates
+
+        email_templates.reset()
+        yield
+        email_templates.reset()
+
+    def test_worker_renders_template_and_stores_html(self, worker_db):
+        from app.models import Notification
+
+        channel = FakeChannel()
+        with patch.object(worker, "create_channel", lambda _: channel):
+            asyncio.run(worker._handle_message(FakeIncoming(self.PAYLOAD, {"x-trace-id": "t-1"}), _router()))
+
+        html = channel.sent[0][1]
+        assert "¡Bienvenido Ana!" in html and "<title>Bienvenida</title>" in html
+        db = worker_db()
+        row = db.query(Notification).one()
+        db.close()
+        assert row.message == html
+        assert "render" in json.loads(row.timings)
+        assert len(json.dumps(self.PAYLOAD)) < 300
+
+    def test_campaign_with_shared_context_renders_once(self, worker_db):
+        from app.worker_metrics import metrics
+
+        def renders(cached):
+            return metrics.snapshot()["counters"].get(f'email_template_renders_total{{cached="{cached}"}}', 0)
+
+        before = renders("false"), renders("true")
+        channel = FakeChannel()
+        with patch.object(worker, "create_channel", lambda _: channel):
+            for i in range(3):
+                payload = dict(self.PAYLOAD, destination=f"cliente{i}@example.com")
+                asyncio.run(worker._process_one(payload, f"campaign-{i}"))
+
+        assert renders("false") - before[0] == 1
+        assert renders("true") - before[1] == 2
+        assert len({message for _, message in channel.sent}) == 1
+
+    def test_multi_channel_template_replaces_email_message(self, worker_db):
+        channels = {"email": FakeChannel(), "sms": FakeChannel()}
+        payload = {
+            "destination": {"email": "ana@example.com", "sms": "+573001234567"},
+            "message": {"sms": "hola"},
+            "template": "welcome",
+            "context": {"name": "Ana"},
+        }
+        with patch.object(worker, "create_channel", lambda c: channels[c.value]):
+            asyncio.run(worker._process_one(payload, "multi-template"))
+
+        assert "¡Bienvenido Ana!" in channels["email"].sent[0][1]
+        assert channels["sms"].sent == [("+573001234567", "hola")]
+
+    def test_unknown_template_is_quarantined(self):
+        router = TestPoisonQuarantine._router()
+        payload = dict(self.PAYLOAD, template="no_existe")
+        captured = TestPoisonQuarantine._handle(FakeIncoming(payload), router)
+        assert router.quarantine.published == [""]
+        assert captured[0]["headers"]["x-quarantine-reason"] == "invalid_template"
+
+    def test_template_on_sms_is_rejected(self):
+        with pytest.raises(worker.PoisonMessageError):
+            worker._validate_payload(dict(SMS_PAYLOAD, template="welcome"))
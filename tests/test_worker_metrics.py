@@ -0,0 +1,45 @@
+"""
+Pruebas de la combinación de métricas de varios procesos (supervisor).
+"""
+from app.worker_metrics import MetricsRegistry, merge_snapshots
+
+
+def _snapshot(**gauges):
+    registry = MetricsRegistry(buckets=(1.0,))
+    registry.inc("messages_processed_total", 2, channel="sms")
+    registry.observe("send_seconds", 0.5)
+    for name, (value, labels) in gauges.items():
+        registry.set_gauge(name, value, **labels)
+    return registry.snapshot()
+
+
+class TestMergeSnapshots:
+    """Tests de merge_snapshots"""
+
+    def test_counters_and_histograms_are_summed(self):
+        merged = merge_snapshots([_snapshot(), _snapshot(), _snapshot()])
+        assert merged["counters"]['messages_processed_total{channel="sms"}'] == 6
+        assert merged["histograms"]["send_seconds"]["count"] == 3
+        assert merged["histograms"]["send_seconds"]["buckets"]["1.0"] == 3
+
+    def test_only_additive_gauges_are_summed(self):
+        merged = merge_snapshots([
+            _snapshot(
+                retry_scheduler_held=(4, {}),
+                circuit_breaker_state=(0, {"provider": "sms:twilio"}),
+                worker_send_latency_p90_seconds=(0.2, {}),
+                worker_concurrency_limit=(10, {}),
+            ),
+            _snapshot(
+                retry_scheduler_held=(6, {}),
+                circuit_breaker_state=(2, {"provider": "sms:twilio"}),
+                worker_send_latency_p90_seconds=(0.9, {}),
+                worker_concurrency_limit=(8, {}),
+            ),
+        ])
+        gauges = merged["gauges"]
+        assert gauges["retry_scheduler_held"] == 10
+        # Peor estado (OPEN=2), no la suma
+        assert gauges['circuit_breaker_state{provider="sms:twilio"}'] == 2
+        assert gauges["worker_send_latency_p90_seconds"] == 0.9
+        assert gauges["worker_concurrency_limit"] == 10